@@ -5,6 +5,16 @@ from dify_plugin.config.logger_format import plugin_logger_handler
 from dify_plugin import ToolProvider
 from dify_plugin.errors.tool import ToolProviderCredentialValidationError
 
+# Import the shared HTTP transport
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+from bilibili_http import get_http_client, build_cookie_header
+from bilibili_enhanced_tool import NAV_URL, credential_fingerprint, parse_account_list, parse_wbi_keys, wbi_key_cache
+from credential_pool import POOL_STRATEGIES
+from memory_cache import NEGATIVE_TTL, credential_cache
+from singleflight import request_flight, request_key
+
 # Configure logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -40,6 +50,9 @@ class BilibiliSubtitlePluginProvider(ToolProvider):
         self._validate_credentials_with_api(sessdata, bili_jct, buvid3)
         logger.info("✓ API credential validation passed")
         
+        # 4. Validate the optional extra accounts of the credential pool
+        self._validate_extra_accounts(credentials)
+        
         logger.info("Bilibili credential validation completed, all checks passed")
     
     def _validate_credentials_completeness(self, sessdata: str, bili_jct: str, buvid3: str) -> None:
@@ -94,6 +107,35 @@ class BilibiliSubtitlePluginProvider(ToolProvider):
             # Other unexpected errors
             raise ToolProviderCredentialValidationError(f"Credential validation failed: unknown error occurred - {str(e)}")
     
+    def _validate_extra_accounts(self, credentials: dict[str, Any]) -> None:
+        """
+        Validate the extra accounts and the account selection strategy
+        
+        Args:
+            credentials: Dictionary containing credential information
+            
+        Raises:
+            ToolProviderCredentialValidationError: An extra account is malformed or invalid
+        """
+        strategy = credentials.get("account_strategy") or POOL_STRATEGIES[0]
+        if strategy not in POOL_STRATEGIES:
+            raise ToolProviderCredentialValidationError(f"Invalid account selection strategy: {strategy}")
+        
+        try:
+            accounts = parse_account_list(credentials.get("extra_accounts"))
+        except ValueError as e:
+            raise ToolProviderCredentialValidationError(f"Invalid extra accounts: {str(e)}")
+        if not accounts:
+            return
+        
+        logger.info(f"Step 3: Validating {len(accounts)} extra accounts via API")
+        for number, account in enumerate(accounts, 1):
+            try:
+                self._validate_credentials_with_api(account["SESSDATA"], account["bili_jct"], account["buvid3"])
+            except ToolProviderCredentialValidationError as e:
+                raise ToolProviderCredentialValidationError(f"Extra account #{number}: {str(e)}")
+        logger.info("✓ Extra account validation passed")
+    
     def _has_sessdata(self, sessdata: str) -> bool:
         """Check if valid SESSDATA is provided"""
         return sessdata is not None and sessdata.strip() != ""
@@ -110,7 +152,10 @@ class BilibiliSubtitlePluginProvider(ToolProvider):
     
     def _check_credentials_with_api(self, sessdata: str, bili_jct: str, buvid3: str) -> bool:
         """
-        Validate credentials via Bilibili API
+        Validate credentials via Bilibili API, reusing a recent result for the same credentials
+        
+        Results are cached per credential fingerprint (a hash, never the raw cookie).
+        Concurrent validations of the same credentials share a single nav request.
         
         Args:
             sessdata: Bilibili session data
@@ -124,8 +169,40 @@ class BilibiliSubtitlePluginProvider(ToolProvider):
             ValueError: API response error or invalid credentials
             httpx.RequestError: Network request error
         """
-        url = "https://api.bilibili.com/x/web-interface/nav"
+        fingerprint = credential_fingerprint(sessdata, bili_jct, buvid3)
+        hit, error = credential_cache.get(fingerprint)
+        if hit:
+            logger.info(f"Using cached validation result for credentials {fingerprint}")
+            if error:
+                raise ValueError(error)
+            return True
+        
+        return request_flight.do(
+            request_key(fingerprint, NAV_URL),
+            lambda: self._request_credentials_check(fingerprint, sessdata, bili_jct, buvid3)
+        )
+    
+    def _request_credentials_check(self, fingerprint: str, sessdata: str, bili_jct: str, buvid3: str) -> bool:
+        """
+        Call the nav API and cache the validation result
+        
+        Only definite answers are cached: a successful login for CREDENTIAL_TTL and a
+        not-logged-in response for NEGATIVE_TTL. Throttling and network errors are not cached.
+        The WBI keys in the response are stored in the shared key cache used by the tools.
         
+        Args:
+            fingerprint: Credential fingerprint used as the cache key
+            sessdata: Bilibili session data
+            bili_jct: Bilibili CSRF token
+            buvid3: Bilibili user identifier
+            
+        Returns:
+            bool: Whether credentials are valid
+            
+        Raises:
+            ValueError: API response error or invalid credentials
+            httpx.RequestError: Network request error
+        """
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
             "Accept": "application/json, text/plain, */*",
@@ -138,9 +215,11 @@ class BilibiliSubtitlePluginProvider(ToolProvider):
             "bili_jct": bili_jct,
             "buvid3": buvid3
         }
+        headers.update(build_cookie_header(cookies))
         
         try:
-            response = httpx.get(url, headers=headers, cookies=cookies, timeout=15)
+            # Reuse the pooled client shared with the tool to avoid a fresh TLS handshake
+            response = get_http_client().get(NAV_URL, headers=headers, timeout=15)
             response.raise_for_status()
             
             try:
@@ -148,6 +227,12 @@ class BilibiliSubtitlePluginProvider(ToolProvider):
             except ValueError as e:
                 raise ValueError(f"API response format error, unable to parse JSON: {str(e)}")
             
+            # The nav response also carries the current WBI keys, sparing the tools a refresh
+            try:
+                wbi_key_cache.set(parse_wbi_keys(data))
+            except (KeyError, IndexError, AttributeError, TypeError):
+                logger.warning("WBI keys not found in nav response")
+            
             # Check API response
             code = data.get("code", -1)
             message = data.get("message", "")
@@ -157,11 +242,16 @@ class BilibiliSubtitlePluginProvider(ToolProvider):
                 user_data = data.get("data", {})
                 is_login = user_data.get("isLogin", False)
                 if user_data and is_login:
+                    credential_cache.set(fingerprint, "")
                     return True
                 else:
-                    raise ValueError("User not logged in or login status invalid")
+                    error = "User not logged in or login status invalid"
+                    credential_cache.set(fingerprint, error, NEGATIVE_TTL)
+                    raise ValueError(error)
             elif code == -101:
-                raise ValueError("Account not logged in, please check if SESSDATA is correct")
+                error = "Account not logged in, please check if SESSDATA is correct"
+                credential_cache.set(fingerprint, error, NEGATIVE_TTL)
+                raise ValueError(error)
             elif code == -111:
                 raise ValueError("CSRF validation failed, please check if bili_jct is correct")
             elif code == -400:
@@ -0,0 +1,190 @@
+from collections.abc import Generator
+import re
+from typing import Any
+import traceback
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+# Import the async client for Bilibili API operations
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+from bilibili_async_client import AsyncBilibiliClient, DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT
+from bilibili_enhanced_tool import clamp_int, normalize_video_id, parse_tool_credentials
+from deadline import deadline_exceeded, deadline_scope
+from invocation_metrics import track_invocation
+from subtitle_cache import get_default_cache
+from transcript_index import get_default_index
+
+# Set up logger with custom handler
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+
+
+class BilibiliBatchSubtitleTool(Tool):
+    """
+    哔哩哔哩批量字幕提取工具
+    """
+
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Extract subtitles from multiple Bilibili videos concurrently
+
+        Args:
+            tool_parameters: Dictionary containing tool input parameters:
+                - video_ids (str): Bilibili video IDs separated by commas, spaces or new lines
+                - max_workers (int): Number of videos processed at the same time
+
+        Yields:
+            ToolInvokeMessage: Messages containing the per-video results
+
+        Raises:
+            Exception: If credentials or input parameters are invalid
+        """
+        # 1. Get credentials from runtime; optional extra accounts form a credential pool that shares the request load
+        try:
+            logger.info("Retrieving Bilibili credentials")
+            credentials = parse_tool_credentials(self.runtime.credentials)
+            logger.info(f"Bilibili credentials retrieved successfully ({1 + len(credentials['extra_accounts'])} accounts)")
+        except ValueError as e:
+            logger.error(f"Invalid credentials: {str(e)}")
+            raise Exception(f"Bilibili credentials not configured or invalid: {str(e)}. Please check SESSDATA, BILI_JCT, BUVID3 and the extra accounts in plugin settings.")
+
+        # 2. Get tool input parameters
+        logger.info("Getting tool input parameters")
+        raw_ids = [item for item in re.split(r"[\s,，;；]+", tool_parameters.get("video_ids") or "") if item]
+        if not raw_ids:
+            logger.error("Video ID list is empty")
+            raise Exception("Video ID list cannot be empty.")
+
+        max_workers = clamp_int(tool_parameters.get("max_workers"), DEFAULT_MAX_WORKERS, 1, MAX_WORKERS_LIMIT)
+        logger.info(f"Received {len(raw_ids)} video IDs, max_workers={max_workers}")
+
+        # 3. Initialize the async client with credentials
+        try:
+            client = AsyncBilibiliClient(
+                **credentials, max_concurrency=max_workers * 2, cache=get_default_cache(), index=get_default_index()
+            )
+        except ValueError as e:
+            logger.error(f"Failed to initialize client: {str(e)}")
+            raise Exception(f"Bilibili credentials not configured or invalid: {str(e)}")
+
+        # 4. Normalize and dedupe video IDs, keeping the input order
+        results = []
+        video_ids = []
+        seen = set()
+        for raw_id in raw_ids:
+            video_id = normalize_video_id(raw_id)
+            if not video_id:
+                logger.warning(f"Invalid video ID format: {raw_id}")
+                results.append(self._error_result(raw_id, "Invalid video ID format."))
+                continue
+
+            try:
+                bvid = client.tool.resolve_video_id(video_id)[0]
+            except ValueError as e:
+                logger.warning(f"Invalid video ID: {raw_id} - {str(e)}")
+                results.append(self._error_result(raw_id, str(e)))
+                continue
+            if bvid in seen:
+                logger.info(f"Skipping duplicate video ID: {raw_id}")
+                continue
+            seen.add(bvid)
+            video_ids.append(video_id)
+            results.append(None)
+        logger.info(f"{len(video_ids)} unique video IDs to extract")
+
+        # 5. Extract all videos concurrently within the time budget; videos not finished
+        # when it runs out are reported as timed out. The invocation metrics are logged as one line
+        with track_invocation("bilibili_batch_subtitle", logger, videos=len(video_ids)) as metrics, deadline_scope():
+            try:
+                extracted = client.run(client.extract_subtitles, video_ids, max_workers) if video_ids else []
+            except Exception as e:
+                logger.error(f"Batch extraction failed: {type(e).__name__} - {str(e)}")
+                logger.error(f"Exception traceback: \n{traceback.format_exc()}")
+                metrics.fail(type(e).__name__)
+                extracted = [e] * len(video_ids)
+            timed_out = deadline_exceeded()
+            if timed_out:
+                logger.warning("Time budget exhausted, returning partial batch results")
+                metrics.status = "partial"
+
+        slots = [index for index, result in enumerate(results) if result is None]
+        for index, video_id, result in zip(slots, video_ids, extracted):
+            results[index] = self._build_result(video_id, result, timed_out)
+
+        succeeded = sum(1 for result in results if not result["error"])
+        logger.info(f"Batch extraction finished: {succeeded}/{len(results)} succeeded")
+
+        yield self.create_variable_message("results", results)
+        yield self.create_json_message({"results": results})
+        yield self.create_text_message(
+            f"Extracted subtitles for {succeeded} of {len(results)} videos."
+        )
+
+    def _build_result(self, video_id: str, result: Any, timed_out: bool = False) -> dict[str, Any]:
+        """
+        Convert an extraction result into the per-video output record
+
+        Args:
+            video_id: Normalized video ID
+            result: Return value of extract_subtitle, or the exception it raised
+            timed_out: Whether the time budget ran out, in which case missing data is reported as a timeout
+
+        Returns:
+            Per-video result dictionary
+        """
+        if isinstance(result, Exception):
+            logger.error(f"Failed to get subtitles for {video_id}: {type(result).__name__} - {str(result)}")
+            return self._error_result(video_id, f"{type(result).__name__} - {str(result)}")
+
+        if not result:
+            if timed_out:
+                return self._error_result(video_id, f"Timed out while getting video information for {video_id}")
+            return self._error_result(video_id, f"Failed to get video information for {video_id}")
+
+        video_info = result["video"]
+        record = {
+            "video_id": video_id,
+            "bvid": video_info.get("bvid") or "",
+            "video_title": video_info.get("title") or "",
+            "video_author": video_info.get("owner", {}).get("name") or "",
+            "subtitle_language": "",
+            "subtitles": "",
+            "error": "",
+        }
+        if not result["text"]:
+            if timed_out and result["body"] is None:
+                record["error"] = f"Timed out before the subtitles of video '{record['video_title']}' were fetched."
+            else:
+                record["error"] = f"Video '{record['video_title']}' has no available subtitles."
+            return record
+
+        record["subtitle_language"] = result["subtitle"].get("lan_doc", "Unknown Language")
+        record["subtitles"] = result["text"]
+        return record
+
+    def _error_result(self, video_id: str, error: str) -> dict[str, Any]:
+        """
+        Build the output record of a video that failed
+
+        Args:
+            video_id: Video ID as provided or normalized
+            error: Error description
+
+        Returns:
+            Per-video result dictionary with empty content fields
+        """
+        return {
+            "video_id": video_id,
+            "bvid": "",
+            "video_title": "",
+            "video_author": "",
+            "subtitle_language": "",
+            "subtitles": "",
+            "error": error,
+        }
@@ -0,0 +1,202 @@
+from collections.abc import Generator
+from typing import Any
+import traceback
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+# Import the async client for Bilibili API operations
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+from bilibili_async_client import AsyncBilibiliClient, DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT
+from bilibili_enhanced_tool import clamp_int, normalize_mid, parse_tool_credentials
+from deadline import deadline_exceeded, deadline_scope
+from invocation_metrics import track_invocation
+from subtitle_cache import get_default_cache
+from subtitle_format import FORMAT_PLAIN, OUTPUT_FORMATS, format_subtitles
+from transcript_index import get_default_index
+
+# Set up logger with custom handler
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+# Default and upper bound for the number of uploads extracted per call
+DEFAULT_MAX_VIDEOS = 20
+MAX_VIDEOS_LIMIT = 100
+
+
+class BilibiliChannelSubtitleTool(Tool):
+    """
+    哔哩哔哩UP主投稿字幕同步工具
+    """
+
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Extract the subtitles of an uploader's new videos since the last sync
+
+        Args:
+            tool_parameters: Dictionary containing tool input parameters:
+                - mid (str): Uploader UID, "UID:123" or space URL
+                - max_videos (int): Maximum number of new uploads extracted in this call
+                - full_sync (bool): Ignore the stored watermark and start from the latest uploads
+                - output_format (str): Optional subtitle format: plain, srt, vtt or jsonl
+                - max_workers (int): Number of videos processed at the same time
+
+        Yields:
+            ToolInvokeMessage: Messages containing the per-video results and the new watermark
+
+        Raises:
+            Exception: If credentials or input parameters are invalid
+        """
+        # 1. Get credentials from runtime; optional extra accounts form a credential pool that shares the request load
+        try:
+            logger.info("Retrieving Bilibili credentials")
+            credentials = parse_tool_credentials(self.runtime.credentials)
+            logger.info(f"Bilibili credentials retrieved successfully ({1 + len(credentials['extra_accounts'])} accounts)")
+        except ValueError as e:
+            logger.error(f"Invalid credentials: {str(e)}")
+            raise Exception(f"Bilibili credentials not configured or invalid: {str(e)}. Please check SESSDATA, BILI_JCT, BUVID3 and the extra accounts in plugin settings.")
+
+        # 2. Get tool input parameters
+        logger.info("Getting tool input parameters")
+        mid = normalize_mid(tool_parameters.get("mid"))
+        if not mid:
+            logger.error(f"Invalid uploader ID: {tool_parameters.get('mid')}")
+            raise Exception("Invalid uploader ID. Please provide the numeric UID (mid) of the uploader, e.g. '546195'.")
+
+        output_format = (tool_parameters.get("output_format") or FORMAT_PLAIN).strip().lower()
+        if output_format not in OUTPUT_FORMATS:
+            logger.error(f"Invalid output format: {output_format}")
+            raise Exception(f"Invalid output format '{output_format}'. Supported formats: {', '.join(OUTPUT_FORMATS)}.")
+
+        max_videos = clamp_int(tool_parameters.get("max_videos"), DEFAULT_MAX_VIDEOS, 1, MAX_VIDEOS_LIMIT)
+        max_workers = clamp_int(tool_parameters.get("max_workers"), DEFAULT_MAX_WORKERS, 1, MAX_WORKERS_LIMIT)
+        full_sync = bool(tool_parameters.get("full_sync"))
+        logger.info(f"Uploader {mid}, max_videos={max_videos}, max_workers={max_workers}, full_sync={full_sync}")
+
+        # 3. Load the watermark of the last sync; without the persistent cache every call is a first sync
+        cache = get_default_cache()
+        since = None
+        if cache is not None and not full_sync:
+            try:
+                since = cache.get_watermark(mid)
+            except Exception as e:
+                logger.warning(f"Failed to read the sync watermark: {str(e)}")
+        logger.info(f"Sync watermark: {since}")
+
+        # 4. List the uploads newer than the watermark and extract the oldest ones first, so the
+        # watermark only ever moves over videos that were processed
+        with track_invocation("bilibili_channel_subtitle", logger, mid=mid) as metrics, deadline_scope():
+            try:
+                client = AsyncBilibiliClient(
+                    **credentials, max_concurrency=max_workers * 2, cache=cache, index=get_default_index()
+                )
+                uploads = list(reversed(client.run(client.list_new_uploads, mid, since, max_videos)))
+                batch, pending = uploads[:max_videos], len(uploads) - min(len(uploads), max_videos)
+                logger.info(f"{len(uploads)} new uploads, extracting {len(batch)}")
+                bvids = [upload['bvid'] for upload in batch]
+                extracted = client.run(client.extract_subtitles, bvids, max_workers) if bvids else []
+            except Exception as e:
+                error_type = type(e).__name__
+                logger.error(f"Failed to sync uploader {mid}: {error_type} - {str(e)}")
+                logger.error(f"Exception traceback: \n{traceback.format_exc()}")
+                metrics.fail(error_type)
+                yield self.create_variable_message("videos", [])
+                yield self.create_variable_message("watermark", self._watermark(since))
+                yield self.create_variable_message("pending", 0)
+                yield self.create_text_message(f"Failed to sync uploader {mid}: {error_type} - {str(e)}")
+                return
+            timed_out = deadline_exceeded()
+            if timed_out:
+                logger.warning("Time budget exhausted, returning partial sync results")
+                metrics.status = "partial"
+
+        videos = []
+        watermark = since
+        synced = 0
+        for upload, result in zip(batch, extracted):
+            video, done = self._build_result(upload, result, output_format, timed_out)
+            videos.append(video)
+            # Stop at the first video that has to be retried; everything after it stays new
+            if done and synced == len(videos) - 1:
+                synced += 1
+                watermark = max(watermark or (0, 0), (upload['pubdate'], upload['aid']))
+        pending += len(videos) - synced
+
+        if cache is not None and watermark and watermark != since:
+            try:
+                cache.set_watermark(mid, *watermark)
+            except Exception as e:
+                logger.warning(f"Failed to save the sync watermark: {str(e)}")
+
+        succeeded = sum(1 for video in videos if video["subtitles"])
+        logger.info(f"Uploader sync finished: {succeeded}/{len(videos)} videos with subtitles, watermark={watermark}")
+
+        yield self.create_variable_message("videos", videos)
+        yield self.create_variable_message("watermark", self._watermark(watermark))
+        yield self.create_variable_message("pending", pending)
+        yield self.create_json_message({"mid": mid, "videos": videos, "watermark": self._watermark(watermark), "pending": pending})
+        summary_text = f"Found {len(uploads)} new uploads of uploader {mid}; extracted subtitles for {succeeded} of {len(videos)} videos."
+        if pending:
+            summary_text += f" {pending} uploads are left for the next sync."
+        if timed_out:
+            summary_text += " Time budget exhausted before all videos were processed."
+        yield self.create_text_message(summary_text)
+
+    def _watermark(self, watermark: tuple[int, int] | None) -> dict[str, int]:
+        """
+        Convert a watermark into its output record
+
+        Args:
+            watermark: (pubdate, aid) of the newest processed upload, or None
+
+        Returns:
+            Dictionary with pubdate and aid, both 0 when nothing was synced yet
+        """
+        pubdate, aid = watermark or (0, 0)
+        return {"pubdate": pubdate, "aid": aid}
+
+    def _build_result(self, upload: dict[str, Any], result: Any, output_format: str,
+                      timed_out: bool) -> tuple[dict[str, Any], bool]:
+        """
+        Convert an extraction result into the per-video output record
+
+        Args:
+            upload: Upload listed by AsyncBilibiliClient.list_new_uploads
+            result: Return value of extract_subtitle, or the exception it raised
+            output_format: Subtitle output format (plain, srt, vtt or jsonl)
+            timed_out: Whether the time budget ran out
+
+        Returns:
+            Tuple of the per-video result and whether the video is done; videos without
+            subtitles are done, failed or timed out ones are retried by the next sync
+        """
+        video = {
+            "bvid": upload["bvid"] or "",
+            "video_title": upload["title"],
+            "pubdate": upload["pubdate"],
+            "subtitle_language": "",
+            "subtitles": "",
+            "error": "",
+        }
+        if isinstance(result, Exception):
+            logger.error(f"Failed to get subtitles for {video['bvid']}: {type(result).__name__} - {str(result)}")
+            video["error"] = f"{type(result).__name__} - {str(result)}"
+            return video, False
+        if not result:
+            video["error"] = ("Timed out while getting video information." if timed_out
+                              else "Failed to get video information.")
+            return video, False
+        if not result["body"]:
+            if timed_out and result["body"] is None:
+                video["error"] = "Timed out before the subtitles of this video were fetched."
+                return video, False
+            video["error"] = "This video has no available subtitles."
+            return video, True
+
+        video["subtitle_language"] = result["subtitle"].get("lan_doc", "Unknown Language")
+        video["subtitles"] = format_subtitles(result["body"], output_format)
+        return video, True
@@ -0,0 +1,150 @@
+from collections.abc import Generator
+from typing import Any
+import traceback
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+# Import the async client for Bilibili API operations
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+from bilibili_async_client import AsyncBilibiliClient, DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT
+from bilibili_enhanced_tool import clamp_int, normalize_video_id, parse_tool_credentials
+from deadline import deadline_exceeded, deadline_scope
+from invocation_metrics import track_invocation
+from subtitle_cache import get_default_cache
+from subtitle_format import FORMAT_PLAIN, OUTPUT_FORMATS, format_subtitles
+from transcript_index import get_default_index
+
+# Set up logger with custom handler
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+
+
+class BilibiliCollectionSubtitleTool(Tool):
+    """
+    哔哩哔哩合集字幕提取工具
+    """
+
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Extract the subtitles of every episode in the collection (合集) a Bilibili video belongs to
+
+        Args:
+            tool_parameters: Dictionary containing tool input parameters:
+                - video_id (str): Any video of the collection, BV or AV number
+                - output_format (str): Optional subtitle format: plain, srt, vtt or jsonl
+                - max_workers (int): Number of episodes processed at the same time
+
+        Yields:
+            ToolInvokeMessage: One JSON message per episode in collection order, then the output variables
+
+        Raises:
+            Exception: If credentials or input parameters are invalid
+        """
+        # 1. Get credentials from runtime; optional extra accounts form a credential pool that shares the request load
+        try:
+            logger.info("Retrieving Bilibili credentials")
+            credentials = parse_tool_credentials(self.runtime.credentials)
+            logger.info(f"Bilibili credentials retrieved successfully ({1 + len(credentials['extra_accounts'])} accounts)")
+        except ValueError as e:
+            logger.error(f"Invalid credentials: {str(e)}")
+            raise Exception(f"Bilibili credentials not configured or invalid: {str(e)}. Please check SESSDATA, BILI_JCT, BUVID3 and the extra accounts in plugin settings.")
+
+        # 2. Get tool input parameters
+        logger.info("Getting tool input parameters")
+        raw_id = (tool_parameters.get("video_id") or "").strip()
+        if not raw_id:
+            logger.error("Video ID is empty")
+            raise Exception("Video ID cannot be empty.")
+        video_id = normalize_video_id(raw_id)
+        if not video_id:
+            logger.error(f"Invalid video ID format: {raw_id}")
+            raise Exception("Invalid video ID format. Please provide a valid BV number (e.g., 'BV1GJ411x7h7') or AV number (e.g., 'av170001').")
+
+        output_format = (tool_parameters.get("output_format") or FORMAT_PLAIN).strip().lower()
+        if output_format not in OUTPUT_FORMATS:
+            logger.error(f"Invalid output format: {output_format}")
+            raise Exception(f"Invalid output format '{output_format}'. Supported formats: {', '.join(OUTPUT_FORMATS)}.")
+
+        max_workers = clamp_int(tool_parameters.get("max_workers"), DEFAULT_MAX_WORKERS, 1, MAX_WORKERS_LIMIT)
+        logger.info(f"Collection of {video_id}, output_format={output_format}, max_workers={max_workers}")
+
+        # 3. Enumerate the collection and extract its episodes concurrently within the time budget;
+        # episodes are emitted in collection order as soon as each one and its predecessors are done
+        with track_invocation("bilibili_collection_subtitle", logger, video_id=video_id) as metrics, deadline_scope():
+            collection_title = ""
+            episodes = []
+            try:
+                client = AsyncBilibiliClient(
+                    **credentials, max_concurrency=max_workers * 2, cache=get_default_cache(), index=get_default_index()
+                )
+                for result in client.iter(client.iter_season, video_id, max_workers):
+                    collection_title = result['season']['title']
+                    with metrics.stage('format'):
+                        episode = self._build_episode(result, output_format)
+                    episodes.append(episode)
+                    logger.info(f"Episode {episode['index']} processed: {len(episode['subtitles'])} characters")
+                    yield self.create_json_message(episode)
+            except Exception as e:
+                error_type = type(e).__name__
+                logger.error(f"Failed to extract collection: {error_type} - {str(e)}")
+                logger.error(f"Exception traceback: \n{traceback.format_exc()}")
+                if not episodes and not deadline_exceeded():
+                    metrics.fail(error_type)
+                    yield self.create_variable_message("collection_title", "")
+                    yield self.create_variable_message("episodes", [])
+                    yield self.create_text_message(f"Failed to get collection subtitles: {error_type} - {str(e)}")
+                    return
+
+            timed_out = deadline_exceeded()
+            if timed_out:
+                # Return the episodes that finished instead of failing the call
+                logger.warning(f"Time budget exhausted after {len(episodes)} episodes of collection '{collection_title}'")
+                metrics.status = "partial"
+
+        succeeded = sum(1 for episode in episodes if episode["subtitles"])
+        logger.info(f"Collection extraction finished: {succeeded}/{len(episodes)} episodes with subtitles")
+
+        yield self.create_variable_message("collection_title", collection_title)
+        yield self.create_variable_message("episodes", episodes)
+        if timed_out and not episodes:
+            summary_text = f"The time budget ran out before any episode of the collection of {video_id} was extracted."
+        else:
+            summary_text = f"Extracted subtitles for {succeeded} of {len(episodes)} episodes of collection '{collection_title}'."
+            if timed_out:
+                summary_text += " Time budget exhausted: the remaining episodes were not fetched."
+        yield self.create_text_message(summary_text)
+
+    def _build_episode(self, result: dict[str, Any], output_format: str = FORMAT_PLAIN) -> dict[str, Any]:
+        """
+        Convert the result of one collection episode into its output record
+
+        Args:
+            result: Episode result yielded by AsyncBilibiliClient.iter_season
+            output_format: Subtitle output format (plain, srt, vtt or jsonl)
+
+        Returns:
+            Per-episode result dictionary
+        """
+        episode_info = result['episode']
+        episode = {
+            "index": episode_info['index'],
+            "section": episode_info['section'],
+            "bvid": episode_info['bvid'] or "",
+            "title": episode_info['title'],
+            "subtitle_language": "",
+            "subtitles": format_subtitles(result['body'], output_format) if result['body'] else "",
+            "error": "",
+        }
+        if episode["subtitles"]:
+            episode["subtitle_language"] = result['subtitle'].get('lan_doc', 'Unknown Language')
+        elif result['body'] is None and deadline_exceeded():
+            episode["error"] = "Timed out before the subtitles of this episode were fetched."
+        else:
+            episode["error"] = "No available subtitles for this episode."
+        return episode
@@ -0,0 +1,155 @@
+from collections.abc import Generator
+from typing import Any
+import traceback
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+# Import the async client for Bilibili API operations
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+from bilibili_async_client import AsyncBilibiliClient, DEFAULT_MAX_WORKERS, MAX_WORKERS_LIMIT
+from bilibili_enhanced_tool import clamp_int, parse_tool_credentials
+from deadline import deadline_exceeded, deadline_scope
+from invocation_metrics import track_invocation
+from subtitle_cache import get_default_cache
+from subtitle_format import FORMAT_PLAIN, OUTPUT_FORMATS, format_subtitles
+from transcript_index import get_default_index
+
+# Set up logger with custom handler
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+# Default and upper bound for the number of search results extracted
+DEFAULT_MAX_RESULTS = 5
+MAX_RESULTS_LIMIT = 50
+
+
+class BilibiliSearchSubtitleTool(Tool):
+    """
+    哔哩哔哩搜索字幕提取工具
+    """
+
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Search Bilibili videos by keyword and extract the subtitles of the top results
+
+        Args:
+            tool_parameters: Dictionary containing tool input parameters:
+                - keyword (str): Search keyword
+                - max_results (int): Number of top search results to extract
+                - output_format (str): Optional subtitle format: plain, srt, vtt or jsonl
+                - max_workers (int): Number of videos processed at the same time
+
+        Yields:
+            ToolInvokeMessage: One JSON message per result in search order, then the output variables
+
+        Raises:
+            Exception: If credentials or input parameters are invalid
+        """
+        # 1. Get credentials from runtime; optional extra accounts form a credential pool that shares the request load
+        try:
+            logger.info("Retrieving Bilibili credentials")
+            credentials = parse_tool_credentials(self.runtime.credentials)
+            logger.info(f"Bilibili credentials retrieved successfully ({1 + len(credentials['extra_accounts'])} accounts)")
+        except ValueError as e:
+            logger.error(f"Invalid credentials: {str(e)}")
+            raise Exception(f"Bilibili credentials not configured or invalid: {str(e)}. Please check SESSDATA, BILI_JCT, BUVID3 and the extra accounts in plugin settings.")
+
+        # 2. Get tool input parameters
+        logger.info("Getting tool input parameters")
+        keyword = (tool_parameters.get("keyword") or "").strip()
+        if not keyword:
+            logger.error("Search keyword is empty")
+            raise Exception("Search keyword cannot be empty.")
+
+        output_format = (tool_parameters.get("output_format") or FORMAT_PLAIN).strip().lower()
+        if output_format not in OUTPUT_FORMATS:
+            logger.error(f"Invalid output format: {output_format}")
+            raise Exception(f"Invalid output format '{output_format}'. Supported formats: {', '.join(OUTPUT_FORMATS)}.")
+
+        max_results = clamp_int(tool_parameters.get("max_results"), DEFAULT_MAX_RESULTS, 1, MAX_RESULTS_LIMIT)
+        max_workers = clamp_int(tool_parameters.get("max_workers"), DEFAULT_MAX_WORKERS, 1, MAX_WORKERS_LIMIT)
+        logger.info(f"Search '{keyword}', max_results={max_results}, output_format={output_format}, max_workers={max_workers}")
+
+        # 3. Search and extract the top results concurrently within the time budget; results are
+        # emitted in search order as soon as each one and the higher ranked ones are done
+        with track_invocation("bilibili_search_subtitle", logger, keyword=keyword) as metrics, deadline_scope():
+            results = []
+            try:
+                client = AsyncBilibiliClient(
+                    **credentials, max_concurrency=max_workers * 2, cache=get_default_cache(), index=get_default_index()
+                )
+                for item in client.iter(client.iter_search, keyword, max_results, max_workers):
+                    with metrics.stage('format'):
+                        result = self._build_result(item, output_format)
+                    results.append(result)
+                    logger.info(f"Result {result['rank']} processed: {len(result['subtitles'])} characters")
+                    yield self.create_json_message(result)
+            except Exception as e:
+                error_type = type(e).__name__
+                logger.error(f"Failed to search videos: {error_type} - {str(e)}")
+                logger.error(f"Exception traceback: \n{traceback.format_exc()}")
+                if not results and not deadline_exceeded():
+                    metrics.fail(error_type)
+                    yield self.create_variable_message("results", [])
+                    yield self.create_text_message(f"Failed to search videos: {error_type} - {str(e)}")
+                    return
+
+            timed_out = deadline_exceeded()
+            if timed_out:
+                # Return the results that finished instead of failing the call
+                logger.warning(f"Time budget exhausted after {len(results)} search results")
+                metrics.status = "partial"
+
+        succeeded = sum(1 for result in results if result["subtitles"])
+        logger.info(f"Search extraction finished: {succeeded}/{len(results)} results with subtitles")
+
+        yield self.create_variable_message("results", results)
+        if not results:
+            summary_text = (f"The time budget ran out before any result for '{keyword}' was extracted." if timed_out
+                            else f"No videos found for '{keyword}'.")
+        else:
+            summary_text = f"Extracted subtitles for {succeeded} of the top {len(results)} results for '{keyword}'."
+            if timed_out:
+                summary_text += " Time budget exhausted: the remaining results were not fetched."
+        yield self.create_text_message(summary_text)
+
+    def _build_result(self, item: dict[str, Any], output_format: str = FORMAT_PLAIN) -> dict[str, Any]:
+        """
+        Convert the extraction of one search result into its output record
+
+        Args:
+            item: Item yielded by AsyncBilibiliClient.iter_search
+            output_format: Subtitle output format (plain, srt, vtt or jsonl)
+
+        Returns:
+            Per-result dictionary
+        """
+        hit, extracted = item['hit'], item['result']
+        result = {
+            "rank": item['rank'],
+            "bvid": hit['bvid'],
+            "video_title": hit['title'],
+            "video_author": hit['author'],
+            "subtitle_language": "",
+            "subtitles": "",
+            "error": "",
+        }
+        if isinstance(extracted, Exception):
+            logger.error(f"Failed to get subtitles for {hit['bvid']}: {type(extracted).__name__} - {str(extracted)}")
+            result["error"] = f"{type(extracted).__name__} - {str(extracted)}"
+        elif not extracted:
+            result["error"] = ("Timed out while getting video information." if deadline_exceeded()
+                               else "Failed to get video information.")
+        elif extracted['body']:
+            result["subtitle_language"] = extracted['subtitle'].get('lan_doc', 'Unknown Language')
+            result["subtitles"] = format_subtitles(extracted['body'], output_format)
+        elif extracted['body'] is None and deadline_exceeded():
+            result["error"] = "Timed out before the subtitles of this video were fetched."
+        else:
+            result["error"] = "This video has no available subtitles."
+        return result
@@ -1,5 +1,4 @@
-from collections.abc import Generator
-import re
+from collections.abc import Generator, Iterable
 from typing import Any
 import traceback
 import logging
@@ -11,13 +10,24 @@ from dify_plugin.entities.tool import ToolInvokeMessage
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
-from bilibili_enhanced_tool import BilibiliEnhancedTool
+from bilibili_async_client import AsyncBilibiliClient
+from bilibili_enhanced_tool import normalize_video_id, parse_page_selection, parse_tool_credentials
+from deadline import deadline_exceeded, deadline_scope
+from invocation_metrics import track_invocation
+from subtitle_cache import get_default_cache
+from subtitle_format import FORMAT_PLAIN, OUTPUT_FORMATS, SubtitleWriter
+from subtitle_chunk import CHUNK_UNIT_TOKENS, CHUNK_UNITS, SubtitleChunker, parse_chunk_size
+from subtitle_window import cue_overlaps, parse_time_position
+from transcript_index import get_default_index
 
 # Set up logger with custom handler
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 logger.addHandler(plugin_logger_handler)
 
+# Number of cues serialized between two streamed chunks of the subtitles variable
+STREAM_FLUSH_CUES = 200
+
 
 class BilibiliSubtitlePluginTool(Tool):
     """
@@ -26,11 +36,18 @@ class BilibiliSubtitlePluginTool(Tool):
 
     def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
         """
-        Extract subtitles from Bilibili videos using BilibiliEnhancedTool
+        Extract subtitles from Bilibili videos using AsyncBilibiliClient
 
         Args:
             tool_parameters: Dictionary containing tool input parameters:
                 - video_id (str): Bilibili video ID (BV number or AV number)
+                - pages (str): Optional part selection, "all" or ranges such as "1-3,5"
+                - output_format (str): Optional subtitle format: plain, srt, vtt or jsonl
+                - start (str): Optional start of the time range, in seconds or MM:SS / HH:MM:SS
+                - end (str): Optional end of the time range, in seconds or MM:SS / HH:MM:SS
+                - chunk_size (int): Optional chunk budget; when set, subtitles are only returned as chunks, one JSON message each
+                - chunk_unit (str): Optional chunk budget unit: tokens (default) or chars
+                - chunk_overlap (int): Optional budget repeated between adjacent chunks
 
         Yields:
             ToolInvokeMessage: Message containing the extracted subtitle content
@@ -38,16 +55,14 @@ class BilibiliSubtitlePluginTool(Tool):
         Raises:
             Exception: If subtitle extraction fails, an exception with error information is thrown
         """
-        # 1. Get credentials from runtime
+        # 1. Get credentials from runtime; optional extra accounts form a credential pool that shares the request load
         try:
             logger.info("Retrieving Bilibili credentials")
-            sessdata = self.runtime.credentials["sessdata"]
-            bili_jct = self.runtime.credentials["bili_jct"]
-            buvid3 = self.runtime.credentials["buvid3"]
-            logger.info("Bilibili credentials retrieved successfully")
-        except KeyError as e:
-            logger.error(f"Failed to get credentials: {str(e)}")
-            raise Exception("Bilibili credentials not configured or invalid. Please provide SESSDATA, BILI_JCT and BUVID3 in plugin settings.")
+            credentials = parse_tool_credentials(self.runtime.credentials)
+            logger.info(f"Bilibili credentials retrieved successfully ({1 + len(credentials['extra_accounts'])} accounts)")
+        except ValueError as e:
+            logger.error(f"Invalid credentials: {str(e)}")
+            raise Exception(f"Bilibili credentials not configured or invalid: {str(e)}. Please check SESSDATA, BILI_JCT, BUVID3 and the extra accounts in plugin settings.")
 
         # 2. Get tool input parameters
         logger.info("Getting tool input parameters")
@@ -66,75 +81,289 @@ class BilibiliSubtitlePluginTool(Tool):
             raise Exception(f"Invalid video ID format. Please provide a valid BV number (e.g., 'BV1GJ411x7h7') or AV number (e.g., 'av170001' or '170001').")
         logger.info(f"Normalized video ID: {video_id}")
 
-        # 4. Use BilibiliEnhancedTool to get subtitles
+        page_selection = (tool_parameters.get("pages") or "").strip()
+        logger.info(f"Page selection: {page_selection or 'first part'}")
+
+        output_format = (tool_parameters.get("output_format") or FORMAT_PLAIN).strip().lower()
+        if output_format not in OUTPUT_FORMATS:
+            logger.error(f"Invalid output format: {output_format}")
+            raise Exception(f"Invalid output format '{output_format}'. Supported formats: {', '.join(OUTPUT_FORMATS)}.")
+        logger.info(f"Output format: {output_format}")
+
+        try:
+            start = parse_time_position(tool_parameters.get("start"))
+            end = parse_time_position(tool_parameters.get("end"))
+        except ValueError as e:
+            logger.error(f"Invalid time range: {str(e)}")
+            raise Exception("Invalid time range. Please provide start and end as seconds (e.g., '90') or as 'MM:SS' / 'HH:MM:SS'.")
+        if start is not None and end is not None and end <= start:
+            logger.error(f"Invalid time range: start={start}, end={end}")
+            raise Exception("Invalid time range: end must be later than start.")
+        if start is not None or end is not None:
+            logger.info(f"Time range: start={start}, end={end}")
+
+        chunk_unit = (tool_parameters.get("chunk_unit") or CHUNK_UNIT_TOKENS).strip().lower()
         try:
-            # Initialize the enhanced tool with credentials
-            logger.info("Initializing BilibiliEnhancedTool")
-            enhanced_tool = BilibiliEnhancedTool(sessdata, bili_jct, buvid3)
+            chunk_size = parse_chunk_size(tool_parameters.get("chunk_size"))
+            chunk_overlap = parse_chunk_size(tool_parameters.get("chunk_overlap")) or 0
+        except ValueError as e:
+            logger.error(f"Invalid chunk settings: {str(e)}")
+            raise Exception("Invalid chunk settings. chunk_size and chunk_overlap must be non-negative integers.")
+        if chunk_unit not in CHUNK_UNITS:
+            logger.error(f"Invalid chunk unit: {chunk_unit}")
+            raise Exception(f"Invalid chunk unit '{chunk_unit}'. Supported units: {', '.join(CHUNK_UNITS)}.")
+        if chunk_size and chunk_overlap >= chunk_size:
+            logger.error(f"Invalid chunk overlap: size={chunk_size}, overlap={chunk_overlap}")
+            raise Exception("Invalid chunk settings: chunk_overlap must be smaller than chunk_size.")
+        if chunk_size:
+            logger.info(f"Chunking: size={chunk_size} {chunk_unit}, overlap={chunk_overlap}")
+
+        # 4. Use AsyncBilibiliClient to get subtitles; stage timings and upstream requests
+        # are collected for the whole invocation and logged as one line when it ends.
+        # Upstream calls share a time budget below MAX_REQUEST_TIMEOUT so that whatever
+        # was fetched before it runs out is still returned.
+        with track_invocation("bilibili_subtitle_plugin", logger, video_id=video_id) as metrics, deadline_scope():
+            try:
+                # Initialize the async client with credentials
+                logger.info("Initializing AsyncBilibiliClient")
+                client = AsyncBilibiliClient(
+                    **credentials, cache=get_default_cache(), index=get_default_index()
+                )
             
-            # Get video information
-            logger.info("Getting video information")
-            video_info = enhanced_tool.get_video_info(video_id)
-            if not video_info:
-                logger.error(f"Failed to get video information for {video_id}")
-                raise Exception(f"Failed to get video information for {video_id}")
+                # Fetch the selected parts concurrently and receive them in page order; the cues of the
+                # part being returned arrive while its subtitle file is still downloading
+                logger.info("Extracting video information and subtitles")
+                video_info = None
+                parts = []
+                has_body = False
+                # Metadata of the emitted chunks; their text only goes out in the per-chunk JSON messages
+                chunks = []
+                # Subtitles of all parts are serialized in a single pass into one document that is streamed
+                # as the cues arrive. With chunking the transcript is only returned as chunks, cut from the
+                # same stream and emitted as soon as each one is full, so nothing else carries its text
+                writer = None if chunk_size else SubtitleWriter(output_format)
+                multi_part = None
+                current = None
+                subtitle_length = 0
+                for event in client.iter(client.iter_video_parts, video_id, page_selection, stream_cues=True):
+                    video_info = event['video']
+                    if multi_part is None:
+                        page_count = len(video_info.get('pages') or [])
+                        multi_part = bool(page_selection) and len(parse_page_selection(page_selection, page_count)) > 1
+                    if current is None:
+                        # Only several selected parts return their own text in parts, built in the same pass
+                        current = {
+                            "lines": 0,
+                            "writer": SubtitleWriter(output_format) if multi_part and writer else None,
+                            # Chunks never span two parts
+                            "chunker": SubtitleChunker(chunk_size, chunk_overlap, chunk_unit, output_format) if chunk_size else None,
+                        }
+                    page_info = event['page'] or {}
+
+                    if 'cues' in event:
+                        with metrics.stage('format'):
+                            texts, cut = self._write_cues(writer, current, page_info, event['cues'], start, end, multi_part)
+                        for text in texts:
+                            subtitle_length += len(text)
+                            yield self.create_stream_variable_message("subtitles", text)
+                        for chunk in cut:
+                            yield self._emit_chunk(chunks, page_info, chunk)
+                        continue
+
+                    # The part is complete: write the cues that were not streamed while it downloaded
+                    body = event['body']
+                    with metrics.stage('format'):
+                        texts, cut = self._write_cues(writer, current, page_info, body[event['streamed']:] if body else [],
+                                                      start, end, multi_part)
+                        if current['chunker'] is not None:
+                            last = current['chunker'].finish()
+                            if last is not None:
+                                cut.append(last)
+                    for text in texts:
+                        subtitle_length += len(text)
+                        yield self.create_stream_variable_message("subtitles", text)
+                    for chunk in cut:
+                        yield self._emit_chunk(chunks, page_info, chunk)
+                    part = self._build_part(event, current)
+                    parts.append(part)
+                    has_body = has_body or body is not None
+                    logger.info(f"Part {part['page']} processed: {current['lines']} subtitle lines")
+                    current = None
             
-            video_title = video_info.get('title', 'Unknown Title')
-            video_author = video_info.get('owner', {}).get('name', 'Unknown Author')
-            logger.info(f"Video info: title='{video_title}', author='{video_author}'")
+                if not video_info:
+                    if deadline_exceeded():
+                        logger.error(f"Time budget exhausted before video information was fetched for {video_id}")
+                        raise Exception(f"Timed out while getting video information for {video_id}")
+                    logger.error(f"Failed to get video information for {video_id}")
+                    raise Exception(f"Failed to get video information for {video_id}")
             
-            # Get subtitle text using the enhanced tool
-            logger.info("Getting video subtitle")
-            subtitle_text = enhanced_tool.get_video_subtitle(video_id)
+                video_title = video_info.get('title', 'Unknown Title')
+                video_author = video_info.get('owner', {}).get('name', 'Unknown Author')
+                logger.info(f"Video info: title='{video_title}', author='{video_author}'")
             
-            if not subtitle_text:
-                logger.warning(f"No available subtitles found for video '{video_title}'")
-                raise Exception(f"Video '{video_title}' has no available subtitles.")
+                extracted_parts = [part for part in parts if part['subtitle_language']]
+                timed_out = deadline_exceeded()
+                if timed_out:
+                    # Return the metadata and whatever subtitles arrived instead of failing the call
+                    logger.warning(f"Time budget exhausted, returning partial results for video '{video_title}'")
+                    metrics.status = "partial"
+                elif not extracted_parts:
+                    if has_body:
+                        logger.warning(f"No subtitles in the selected time range for video '{video_title}'")
+                        raise Exception(f"Video '{video_title}' has no subtitles in the selected time range.")
+                    logger.warning(f"No available subtitles found for video '{video_title}'")
+                    raise Exception(f"Video '{video_title}' has no available subtitles.")
             
-            # Get subtitle info to determine language
-            pages = enhanced_tool.get_video_pages(video_id)
-            if pages and len(pages) > 0:
-                cid = pages[0].get('cid')
-                subtitle_info = enhanced_tool.get_subtitle_info(video_id, cid)
-                subtitle_language = "Unknown Language"
-                if subtitle_info and len(subtitle_info) > 0:
-                    subtitle_language = subtitle_info[0].get('lan_doc', 'Unknown Language')
-            else:
-                subtitle_language = "Unknown Language"
+                # Report the language of the track that was actually used
+                subtitle_language = extracted_parts[0]['subtitle_language'] if extracted_parts else ""
             
-            logger.info(f"Subtitle content processed: {len(subtitle_text)} characters")
+                logger.info(f"Subtitle content processed: {subtitle_length} characters")
             
-            # Return result using variable messages for declared output schema
-            logger.info("Preparing subtitle results for response")
-            logger.info(f"Subtitles successfully retrieved for video '{video_title}'")
+                # Return result using variable messages for declared output schema
+                logger.info("Preparing subtitle results for response")
+                logger.info(f"Subtitles successfully retrieved for video '{video_title}'")
             
-            # Return each declared output variable separately
-            yield self.create_variable_message("subtitles", subtitle_text)
-            yield self.create_variable_message("video_title", video_title)
-            yield self.create_variable_message("video_author", video_author)
-            yield self.create_variable_message("subtitle_language", subtitle_language)
+                # Return each declared output variable separately; subtitles has already been streamed
+                if not subtitle_length:
+                    yield self.create_variable_message("subtitles", "")
+                yield self.create_variable_message("video_title", video_title)
+                yield self.create_variable_message("video_author", video_author)
+                yield self.create_variable_message("subtitle_language", subtitle_language)
+                yield self.create_variable_message("parts", parts)
+                yield self.create_variable_message("chunks", chunks)
             
-            # Also provide a summary text message for user
-            summary_text = f"Successfully extracted subtitles from video '{video_title}' by {video_author}. Language: {subtitle_language}. Subtitle length: {len(subtitle_text)} characters."
-            yield self.create_text_message(summary_text)
+                # Also provide a summary text message for user
+                if extracted_parts:
+                    summary_text = f"Successfully extracted subtitles from video '{video_title}' by {video_author}. Language: {subtitle_language}."
+                    if not chunk_size:
+                        summary_text += f" Subtitle length: {subtitle_length} characters."
+                else:
+                    summary_text = f"Got video '{video_title}' by {video_author}, but the time budget ran out before its subtitles were fetched."
+                if len(parts) > 1:
+                    summary_text += f" Parts with subtitles: {len(extracted_parts)} of {len(parts)}."
+                if chunks:
+                    summary_text += f" Chunks: {len(chunks)} (up to {chunk_size} {chunk_unit} each)."
+                if timed_out and extracted_parts:
+                    summary_text += f" Time budget exhausted: only {len(extracted_parts)} of {len(parts)} parts have subtitles."
+                yield self.create_text_message(summary_text)
             
-        except Exception as e:
-            error_type = type(e).__name__
-            error_msg = str(e)
-            error_traceback = traceback.format_exc()
+            except Exception as e:
+                error_type = type(e).__name__
+                error_msg = str(e)
+                error_traceback = traceback.format_exc()
+                metrics.fail(error_type)
             
-            # Log detailed exception information
-            logger.error(f"Failed to get subtitles: {error_type} - {error_msg}")
-            logger.error(f"Exception traceback: \n{error_traceback}")
+                # Log detailed exception information
+                logger.error(f"Failed to get subtitles: {error_type} - {error_msg}")
+                logger.error(f"Exception traceback: \n{error_traceback}")
             
-            # Return empty output variables for declared output schema
-            yield self.create_variable_message("subtitles", "")
-            yield self.create_variable_message("video_title", "")
-            yield self.create_variable_message("video_author", "")
-            yield self.create_variable_message("subtitle_language", "")
+                # Return empty output variables for declared output schema
+                yield self.create_variable_message("subtitles", "")
+                yield self.create_variable_message("video_title", "")
+                yield self.create_variable_message("video_author", "")
+                yield self.create_variable_message("subtitle_language", "")
+                yield self.create_variable_message("parts", [])
+                yield self.create_variable_message("chunks", [])
             
-            # Return error message to user
-            yield self.create_text_message(f"Failed to get subtitles: {error_type} - {error_msg}")
+                # Return error message to user
+                yield self.create_text_message(f"Failed to get subtitles: {error_type} - {error_msg}")
+
+    def _write_cues(self, writer: SubtitleWriter | None, current: dict[str, Any], page_info: dict[str, Any],
+                    cues: Iterable[dict[str, Any]], start: float | None, end: float | None,
+                    multi_part: bool) -> tuple[list[str], list[dict[str, Any]]]:
+        """
+        Serialize cues of the current part into the shared writer, or cut them into chunks
+
+        Args:
+            writer: Writer shared by all parts of the invocation, None when only chunks are returned
+            current: State of the current part: number of lines written, its own writer and its chunker, if any
+            page_info: Page of the part the cues belong to
+            cues: Cues in time order, either streamed during the download or the rest of the part
+            start: Start of the requested time range, None for the beginning
+            end: End of the requested time range, None for the end
+            multi_part: Whether several parts were selected, in which case each part gets a heading
+
+        Returns:
+            Serialized text in pieces of about STREAM_FLUSH_CUES cues, which joined together over all
+            calls form the complete document, and the chunks that were completed by these cues
+        """
+        texts = []
+        chunks = []
+        for cue in cues:
+            if not (cue.get('content') or '').strip() or not cue_overlaps(cue, start, end):
+                continue
+            current['lines'] += 1
+            if current['chunker'] is not None:
+                chunk = current['chunker'].add(cue)
+                if chunk is not None:
+                    chunks.append(chunk)
+            if writer is None:
+                continue
+            if multi_part and current['lines'] == 1:
+                writer.begin_part(page_info.get('page'), page_info.get('part') or '')
+            writer.write_cue(cue)
+            if current['writer'] is not None:
+                current['writer'].write_cue(cue)
+            if writer.count % STREAM_FLUSH_CUES == 0:
+                text = writer.drain()
+                if text:
+                    texts.append(text)
+        if writer is not None:
+            text = writer.drain()
+            if text:
+                texts.append(text)
+        return texts, chunks
+
+    def _emit_chunk(self, chunks: list[dict[str, Any]], page_info: dict[str, Any],
+                    chunk: dict[str, Any]) -> ToolInvokeMessage:
+        """
+        Number a completed chunk across all parts and build its message
+
+        Args:
+            chunks: Metadata of the chunks emitted so far; the new chunk is appended without its text
+            page_info: Page of the part the chunk belongs to
+            chunk: Chunk produced by SubtitleChunker
+
+        Returns:
+            JSON message carrying the chunk with its text
+        """
+        chunk = {"page": page_info.get('page'), **chunk, "index": len(chunks)}
+        chunks.append({key: value for key, value in chunk.items() if key != "text"})
+        return self.create_json_message(chunk)
+
+    def _build_part(self, result: dict[str, Any], current: dict[str, Any]) -> dict[str, Any]:
+        """
+        Convert the result of one video part into its output record
+
+        Args:
+            result: Part result yielded by AsyncBilibiliClient.iter_video_parts
+            current: State of the part after all of its cues were written
+
+        Returns:
+            Per-part result dictionary; it only holds the subtitle text when the part has its own writer
+        """
+        page_info = result['page'] or {}
+        part = {
+            "page": page_info.get('page'),
+            "part": page_info.get('part') or "",
+            "cid": page_info.get('cid'),
+            "subtitle_language": "",
+        }
+        if current['writer'] is not None:
+            part["subtitles"] = current['writer'].getvalue()
+        part["error"] = ""
+        if current['lines']:
+            part["subtitle_language"] = result['subtitle'].get('lan_doc', 'Unknown Language')
+            if result['body'] is None:
+                # The download failed after some of its lines were already returned
+                part["error"] = "The subtitle download was interrupted; the subtitles of this part are incomplete."
+        elif result['body'] is None and deadline_exceeded():
+            part["error"] = "Timed out before the subtitles of this part were fetched."
+        elif result['body'] is not None:
+            part["error"] = "No subtitles in the selected time range for this part."
+        else:
+            part["error"] = "No available subtitles for this part."
+        return part
 
     def _normalize_video_id(self, video_id: str) -> str:
         """
@@ -148,30 +377,9 @@ class BilibiliSubtitlePluginTool(Tool):
         """
         logger.info(f"Normalizing video ID: {video_id}")
         
-        # Remove whitespace
-        video_id = video_id.strip()
-        
-        # Check if it's a BV number
-        bv_pattern = r'^BV([a-zA-Z0-9]{10})$'
-        bv_match = re.match(bv_pattern, video_id)
-        if bv_match:
-            logger.info(f"Valid BV number: {video_id}")
-            return video_id
-            
-        # Check if it's an AV number with 'av' prefix
-        av_pattern = r'^av([0-9]+)$'
-        av_match = re.match(av_pattern, video_id)
-        if av_match:
-            logger.info(f"Valid AV number: {video_id}")
-            return video_id
-            
-        # Check if it's just a number (treat as AV number)
-        number_pattern = r'^([0-9]+)$'
-        number_match = re.match(number_pattern, video_id)
-        if number_match:
-            normalized_id = f"av{video_id}"
-            logger.info(f"Normalized number to AV format: {normalized_id}")
-            return normalized_id
-        
-        logger.warning(f"Invalid video ID format: {video_id}")
-        return ""
\ No newline at end of file
+        normalized_id = normalize_video_id(video_id)
+        if normalized_id:
+            logger.info(f"Normalized video ID: {normalized_id}")
+        else:
+            logger.warning(f"Invalid video ID format: {video_id}")
+        return normalized_id
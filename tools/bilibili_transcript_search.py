@@ -0,0 +1,130 @@
+from collections.abc import Generator
+from typing import Any
+import logging
+from dify_plugin.config.logger_format import plugin_logger_handler
+from dify_plugin import Tool
+from dify_plugin.entities.tool import ToolInvokeMessage
+
+# Import the local transcript index
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
+from bilibili_enhanced_tool import clamp_int, normalize_video_id, resolve_video_id
+from invocation_metrics import track_invocation
+from subtitle_format import format_timestamp
+from transcript_index import get_default_index
+
+# Set up logger with custom handler
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(plugin_logger_handler)
+
+# Default and upper bound for the number of hits returned
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+# Default and upper bound for the number of cues of context on each side of a hit
+DEFAULT_CONTEXT = 1
+MAX_CONTEXT = 5
+
+
+class BilibiliTranscriptSearchTool(Tool):
+    """
+    哔哩哔哩字幕全文检索工具
+    """
+
+    def _invoke(self, tool_parameters: dict[str, Any]) -> Generator[ToolInvokeMessage, None, None]:
+        """
+        Search the locally indexed subtitles for a phrase
+
+        Only subtitles that were extracted by the other tools of this plugin are searched;
+        no request is sent to Bilibili.
+
+        Args:
+            tool_parameters: Dictionary containing tool input parameters:
+                - query (str): Words or phrases that must appear in the same subtitle line
+                - video_id (str): Optional BV or AV number to search within a single video
+                - limit (int): Maximum number of hits
+                - context (int): Number of subtitle lines returned before and after each hit
+
+        Yields:
+            ToolInvokeMessage: Messages containing the timestamped hits
+
+        Raises:
+            Exception: If the index is unavailable or the input parameters are invalid
+        """
+        # 1. Get tool input parameters
+        logger.info("Getting tool input parameters")
+        query = (tool_parameters.get("query") or "").strip()
+        if not query:
+            logger.error("Query is empty")
+            raise Exception("Query cannot be empty.")
+
+        # The index is keyed by BV number; AV numbers are converted locally
+        raw_id = (tool_parameters.get("video_id") or "").strip()
+        bvid = None
+        if raw_id:
+            video_id = normalize_video_id(raw_id)
+            try:
+                bvid = resolve_video_id(video_id)[0] if video_id else None
+            except ValueError:
+                bvid = None
+            if not bvid:
+                logger.error(f"Invalid video ID format: {raw_id}")
+                raise Exception("Invalid video ID format. Please provide a valid BV number (e.g., 'BV1GJ411x7h7') or AV number (e.g., 'av170001'), or leave it empty to search all videos.")
+
+        limit = clamp_int(tool_parameters.get("limit"), DEFAULT_LIMIT, 1, MAX_LIMIT)
+        context = clamp_int(tool_parameters.get("context"), DEFAULT_CONTEXT, 0, MAX_CONTEXT)
+        logger.info(f"Searching transcripts for '{query}', video={bvid}, limit={limit}, context={context}")
+
+        # 2. Query the index
+        index = get_default_index()
+        if index is None:
+            logger.error("Transcript index is not available")
+            raise Exception("The transcript index is not available. It is disabled or its directory is not writable.")
+
+        with track_invocation("bilibili_transcript_search", logger, query=query) as metrics:
+            try:
+                with metrics.stage('index'):
+                    hits = index.search(query, limit, context, bvid)
+            except ValueError as e:
+                logger.error(f"Invalid query: {str(e)}")
+                metrics.fail(type(e).__name__)
+                raise Exception(f"Invalid query '{query}': it contains no searchable characters.")
+
+        results = [self._build_hit(hit) for hit in hits]
+        logger.info(f"Found {len(results)} matching subtitle lines")
+
+        yield self.create_variable_message("hits", results)
+        yield self.create_json_message({"hits": results})
+        if results:
+            videos = len({result["bvid"] for result in results})
+            yield self.create_text_message(f"Found {len(results)} matching subtitle lines in {videos} videos for '{query}'.")
+        else:
+            stats = index.stats()
+            yield self.create_text_message(
+                f"No subtitle lines match '{query}'. {stats['videos']} videos ({stats['cues']} subtitle lines) are indexed; "
+                "extract subtitles with the other tools to add videos to the index."
+            )
+
+    def _build_hit(self, hit: dict[str, Any]) -> dict[str, Any]:
+        """
+        Convert an index hit into its output record
+
+        Args:
+            hit: Hit returned by TranscriptIndex.search
+
+        Returns:
+            Per-hit dictionary; context holds the surrounding lines prefixed with their start time
+        """
+        lines = hit["before"] + [{"from": hit["from"], "to": hit["to"], "content": hit["content"]}] + hit["after"]
+        return {
+            "bvid": hit["bvid"],
+            "video_title": hit["title"],
+            "page": hit["page"] or 1,
+            "part": hit["part"],
+            "start": hit["from"],
+            "end": hit["to"],
+            "timestamp": format_timestamp(hit["from"], "."),
+            "content": hit["content"],
+            "context": "\n".join(f"[{format_timestamp(line['from'], '.')}] {line['content']}" for line in lines),
+        }
@@ -0,0 +1,963 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+B站异步客户端
+
+基于httpx.AsyncClient实现，与BilibiliEnhancedTool提供相同的方法，
+用于并发获取多个视频、多个分P的信息和字幕。
+同时提供同步外观（run/run_sync），工具类可以继续使用生成器接口。
+"""
+
+import asyncio
+import contextvars
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, List, Any, AsyncIterator, Awaitable, Callable, Iterator, TypeVar
+
+import httpx
+
+from bilibili_enhanced_tool import (
+    ApiRequest,
+    BilibiliEnhancedTool,
+    VIDEO_INFO_URL,
+    VIDEO_PAGES_URL,
+    PLAYER_WBI_URL,
+    PLAYER_URL,
+    SEARCH_PAGE_SIZE,
+    SEARCH_URL,
+    UPLOADER_PAGE_SIZE,
+    UPLOADER_VIDEOS_URL,
+    check_server_error,
+    normalize_subtitle_url,
+    parse_page_selection,
+    parse_search_results,
+    parse_uploader_videos,
+    request_error,
+    reserve_rate_limit,
+    transient_retry_delay,
+    uploader_query_params,
+    wbi_key_cache,
+)
+from bilibili_http import close_async_http_client, get_async_http_client
+from credential_pool import (
+    OUTCOME_ERROR,
+    OUTCOME_OK,
+    OUTCOME_THROTTLED,
+    STRATEGY_LEAST_LOADED,
+)
+from deadline import aiter_until_deadline, request_timeout
+from invocation_metrics import record_cache, record_request, timed
+from memory_cache import (
+    NEGATIVE_TTL,
+    NOT_FOUND_CODES,
+    player_info_cache,
+    video_info_cache,
+    video_pages_cache,
+)
+from rate_limiter import rate_limiters
+from singleflight import request_flight, request_key
+from subtitle_cache import SubtitleCache
+from subtitle_format import FORMAT_PLAIN, format_subtitles
+from subtitle_stream import aiter_subtitle_body
+from subtitle_track import SubtitleTrack, SubtitleTrackBuilder
+from transcript_index import TranscriptIndex
+
+
+# 单个客户端同时进行的上游请求数上限
+DEFAULT_MAX_CONCURRENCY = 8
+
+# 批量获取时同时处理的视频数
+DEFAULT_MAX_WORKERS = 4
+# 工具的max_workers参数上限
+MAX_WORKERS_LIMIT = 16
+
+# 流式返回字幕条目时每批的最大条数
+STREAM_BATCH_CUES = 500
+
+T = TypeVar('T')
+
+
+class _SharedLoop:
+    """gevent环境下进程共享的事件循环
+
+    dify_plugin会对threading进行monkey patch，此时线程实际是同一系统线程中的协程，
+    而asyncio按系统线程记录运行中的事件循环：一个调用的事件循环在等待IO时切换到
+    另一个调用，后者再启动事件循环会出现"Cannot run the event loop while another loop
+    is running"。因此在gevent环境下所有调用共用一个在后台协程中运行的事件循环，
+    调用方提交协程后以协作方式等待结果，多个调用的IO仍然可以并发进行。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @staticmethod
+    def enabled() -> bool:
+        """threading是否已被gevent替换"""
+        try:
+            from gevent import monkey
+        except ImportError:
+            return False
+        return monkey.is_module_patched('threading')
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="bilibili-asyncio", daemon=True).start()
+                self._loop = loop
+            return self._loop
+
+    def run(self, awaitable: Awaitable[T]) -> T:
+        """在共享事件循环中运行并等待结果
+
+        任务在事件循环所在的协程中创建，不会继承调用方的contextvars（如调用统计），需要显式带过去
+        """
+        context = contextvars.copy_context()
+
+        async def runner():
+            for var, value in context.items():
+                var.set(value)
+            return await awaitable
+        return asyncio.run_coroutine_threadsafe(runner(), self._get_loop()).result()
+
+
+_shared_loop = _SharedLoop()
+
+
+async def _closing_http_client(coro: Awaitable[T]) -> T:
+    """运行协程，结束后关闭事件循环的共享HTTP客户端（用于即将关闭的临时事件循环）"""
+    try:
+        return await coro
+    finally:
+        await close_async_http_client()
+
+
+def run_sync(coro: Awaitable[T]) -> T:
+    """在同步代码中运行协程
+
+    当前线程没有运行中的事件循环时直接使用asyncio.run，
+    否则在独立线程中运行，避免嵌套事件循环。
+    threading被gevent替换时在共享事件循环中运行
+    """
+    if _SharedLoop.enabled():
+        return _shared_loop.run(coro)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(_closing_http_client(coro))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(contextvars.copy_context().run, asyncio.run, _closing_http_client(coro)).result()
+
+
+class AsyncBilibiliClient:
+    """B站异步客户端
+
+    需要在 ``async with`` 中使用，进入时取得当前事件循环共享的HTTP客户端并创建并发信号量。
+    HTTP客户端在调用之间保留，keep-alive连接被后续调用复用，退出时不关闭。
+    凭证校验、BV/AV转换和字幕选择复用BilibiliEnhancedTool。
+
+    示例::
+
+        client = AsyncBilibiliClient(sessdata, bili_jct, buvid3)
+        result = client.run(client.extract_subtitle, 'BV1GJ411x7h7')
+    """
+
+    def __init__(self, sessdata, bili_jct, buvid3, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 cache: Optional[SubtitleCache] = None, extra_accounts: Optional[List[Dict[str, str]]] = None,
+                 account_strategy: str = STRATEGY_LEAST_LOADED, index: Optional[TranscriptIndex] = None):
+        """
+        初始化客户端
+
+        Args:
+            sessdata: 用户会话数据（必需）
+            bili_jct: 用户验证令牌（必需）
+            buvid3: 用户设备标识（必需）
+            max_concurrency: 同时进行的上游请求数上限
+            cache: 字幕持久化缓存，为None时不使用缓存
+            extra_accounts: 额外账号，与主账号组成凭证池分担请求
+            account_strategy: 凭证池选择账号的策略，least_loaded或round_robin
+            index: 字幕全文索引，获取到的字幕会增量写入，为None时不建立索引
+
+        Raises:
+            ValueError: 如果任何凭证参数为空或None
+        """
+        self.tool = BilibiliEnhancedTool(sessdata, bili_jct, buvid3, extra_accounts, account_strategy)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.cache = cache
+        self.index = index
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> 'AsyncBilibiliClient':
+        # 连接池和信号量绑定到当前事件循环；连接池由同一事件循环中的调用共享，信号量每次进入时重新创建
+        self._client = get_async_http_client()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        # 共享的连接池留给后续调用，只解除引用
+        self._client = None
+
+    def run(self, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """同步外观：打开客户端，执行协程方法并返回结果"""
+        async def runner():
+            async with self:
+                return await func(*args, **kwargs)
+        return run_sync(runner())
+
+    def iter(self, func: Callable[..., AsyncIterator[T]], *args, **kwargs) -> Iterator[T]:
+        """同步外观：打开客户端，逐个返回异步生成器产生的结果
+
+        新建事件循环并按需推进，已启动的并发任务在两次取值之间暂停，
+        调用方处理完一个结果后立即继续，事件循环关闭前关闭它的HTTP客户端。
+        不能在已有运行中事件循环的线程中使用。
+        threading被gevent替换时在共享事件循环中推进，已启动的任务在两次取值之间继续运行，
+        HTTP客户端在调用之间保留。
+        """
+        if _SharedLoop.enabled():
+            advance = _shared_loop.run
+            loop = None
+        else:
+            loop = asyncio.new_event_loop()
+            advance = loop.run_until_complete
+
+        agen = None
+        try:
+            advance(self.__aenter__())
+            agen = func(*args, **kwargs)
+            while True:
+                try:
+                    item = advance(agen.__anext__())
+                except StopAsyncIteration:
+                    break
+                yield item
+        finally:
+            try:
+                if agen is not None:
+                    advance(agen.aclose())
+                advance(self.__aexit__(None, None, None))
+                if loop is not None:
+                    loop.run_until_complete(close_async_http_client())
+                    loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                if loop is not None:
+                    loop.close()
+
+    async def _get_wbi_keys(self) -> tuple[str, str]:
+        """获取WBI密钥，缓存失效时在线程中刷新以免阻塞事件循环"""
+        keys = wbi_key_cache.peek()
+        if keys is None:
+            keys = await asyncio.to_thread(wbi_key_cache.get)
+        else:
+            record_cache('wbi_keys', True)
+        return keys
+
+    async def _make_request(self, url: str, params: dict = None, use_wbi: bool = True) -> dict:
+        """发起HTTP请求的辅助方法
+
+        与同步客户端共用请求合并表，相同账号对同一接口、同一参数的并发请求只发送一次
+        """
+        if self._client is None:
+            raise RuntimeError("AsyncBilibiliClient必须在async with中使用")
+
+        key = request_key(self.tool.account_key, url, params)
+        return await request_flight.do_async(key, lambda: self._send_request(url, params, use_wbi))
+
+    async def _send_request(self, url: str, params: dict = None, use_wbi: bool = True) -> dict:
+        """发送HTTP请求
+
+        与同步客户端共用凭证池、令牌桶和ApiRequest中的签名与重试决策，
+        只有取WBI密钥、发送请求和等待改为异步
+        """
+        try:
+            request = ApiRequest(url, params, use_wbi, self.tool.pool)
+            while True:
+                request_params = request.sign(await self._get_wbi_keys() if request.signed else None)
+                account = self.tool.pool.acquire()
+                outcome = OUTCOME_ERROR
+                try:
+                    delay = request.reserve(account)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    response = await self._http_get(url, request_params, account.headers, request.endpoint)
+                    outcome, data = request.read_response(response)
+                finally:
+                    self.tool.pool.release(account, outcome)
+
+                delay = request.next_delay(outcome, response)
+                if delay is None:
+                    return data
+                if delay > 0:
+                    await asyncio.sleep(delay)
+        except Exception as e:
+            raise request_error(e)
+
+    async def _http_get(self, url: str, params: Optional[dict], headers: Dict[str, str], endpoint: str) -> httpx.Response:
+        """发送一次GET请求，重试规则同BilibiliEnhancedTool._http_get"""
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    with timed(endpoint):
+                        response = await self._client.get(
+                            url=url,
+                            params=params,
+                            headers=headers,
+                            timeout=request_timeout(self._client.timeout)
+                        )
+                return check_server_error(response, endpoint)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                await asyncio.sleep(transient_retry_delay(e, attempt))
+                attempt += 1
+
+    async def get_video_info(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """获取视频基本信息
+
+        Args:
+            video_id: 视频ID，支持BV号或AV号
+
+        Returns:
+            Dict: 视频信息字典，失败返回None
+        """
+        try:
+            ids = self.tool.resolve_video_id(video_id)
+            if not ids:
+                print(f"无效的视频ID格式: {video_id}")
+                return None
+            bvid, aid = ids
+
+            # 优先使用进程内缓存（包括视频不存在的负缓存）
+            hit, video_info = video_info_cache.get(bvid)
+            record_cache('video_info', hit)
+            if hit:
+                return video_info
+
+            data = await self._make_request(VIDEO_INFO_URL, {'bvid': bvid})
+            if data.get('code') != 0:
+                print(f"API返回错误: {data.get('message', '未知错误')}")
+                if data.get('code') in NOT_FOUND_CODES:
+                    video_info_cache.set(bvid, None, NEGATIVE_TTL)
+                return None
+
+            video_info = self.tool.parse_video_info(data.get('data', {}))
+            video_info_cache.set(bvid, video_info)
+            return video_info
+
+        except Exception as e:
+            print(f"获取视频信息失败: {e}")
+            return None
+
+    async def get_uploader_videos(self, mid: int, pn: int = 1,
+                                  ps: int = UPLOADER_PAGE_SIZE) -> Optional[Dict[str, Any]]:
+        """获取UP主投稿列表的一页，按发布时间从新到旧排列
+
+        Args:
+            mid: UP主的mid
+            pn: 页码，从1开始
+            ps: 每页视频数
+
+        Returns:
+            Dict: parse_uploader_videos的结果，失败返回None
+        """
+        try:
+            data = await self._make_request(UPLOADER_VIDEOS_URL, uploader_query_params(mid, pn, ps))
+            if data.get('code') != 0:
+                print(f"API返回错误: {data.get('message', '未知错误')}")
+                return None
+            return parse_uploader_videos(data.get('data') or {})
+
+        except Exception as e:
+            print(f"获取投稿列表失败: {e}")
+            return None
+
+    async def list_new_uploads(self, mid: int, since: Optional[tuple[int, int]] = None,
+                               limit: int = UPLOADER_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """列出UP主在同步进度之后发布的投稿
+
+        从最新的投稿开始翻页，遇到不晚于since的投稿即停止，请求数只与新投稿数量有关。
+        没有同步进度时只列出最新的limit个投稿。
+
+        Args:
+            mid: UP主的mid
+            since: 已处理的最新投稿的(发布时间, aid)，None表示首次同步
+            limit: 首次同步时列出的投稿数
+
+        Returns:
+            List: 新投稿列表，按发布时间从新到旧排列
+
+        Raises:
+            ValueError: 获取投稿列表失败，此时无法确定哪些投稿是新的
+        """
+        uploads = []
+        seen = set()
+        pn = 1
+        while True:
+            page = await self.get_uploader_videos(mid, pn)
+            if page is None:
+                raise ValueError(f"获取UP主{mid}的投稿列表失败（第{pn}页）")
+            for video in page['videos']:
+                if since is not None and (video['pubdate'], video['aid']) <= tuple(since):
+                    return uploads
+                if video['aid'] in seen:
+                    # 翻页期间有新投稿时，前一页的视频会顺延到下一页
+                    continue
+                seen.add(video['aid'])
+                uploads.append(video)
+                if since is None and len(uploads) >= limit:
+                    return uploads
+            if not page['videos'] or pn * UPLOADER_PAGE_SIZE >= page['count']:
+                return uploads
+            pn += 1
+
+    async def search_videos(self, keyword: str, page: int = 1) -> Optional[Dict[str, Any]]:
+        """按关键词搜索视频，结果按综合排序
+
+        Args:
+            keyword: 搜索关键词
+            page: 页码，从1开始，每页SEARCH_PAGE_SIZE个结果
+
+        Returns:
+            Dict: parse_search_results的结果，失败返回None
+        """
+        try:
+            data = await self._make_request(SEARCH_URL, {'search_type': 'video', 'keyword': keyword, 'page': page})
+            if data.get('code') != 0:
+                print(f"API返回错误: {data.get('message', '未知错误')}")
+                return None
+            return parse_search_results(data.get('data') or {})
+
+        except Exception as e:
+            print(f"搜索视频失败: {e}")
+            return None
+
+    async def get_video_pages(self, video_id: str) -> Optional[List[Dict[str, Any]]]:
+        """获取视频分P信息
+
+        Args:
+            video_id: 视频ID，支持BV号或AV号
+
+        Returns:
+            List: 分P信息列表，失败返回None
+        """
+        try:
+            ids = self.tool.resolve_video_id(video_id)
+            if not ids:
+                print(f"无效的视频ID格式: {video_id}")
+                return None
+            bvid, aid = ids
+
+            hit, pages = video_pages_cache.get(bvid)
+            record_cache('video_pages', hit)
+            if hit:
+                return pages
+
+            data = await self._make_request(VIDEO_PAGES_URL, {'bvid': bvid}, use_wbi=False)
+            if data.get('code') != 0:
+                print(f"API返回错误: {data.get('message', '未知错误')}")
+                if data.get('code') in NOT_FOUND_CODES:
+                    video_pages_cache.set(bvid, None, NEGATIVE_TTL)
+                return None
+
+            pages = data.get('data', [])
+            video_pages_cache.set(bvid, pages)
+            return pages
+
+        except Exception as e:
+            print(f"获取分P信息失败: {e}")
+            return None
+
+    async def get_player_info(self, video_id: str, cid: int) -> Optional[Dict[str, Any]]:
+        """获取播放器信息（包含字幕链接）
+
+        Args:
+            video_id: 视频ID（BV号或AV号）
+            cid: 分P的cid
+
+        Returns:
+            Dict: 播放器信息，包含字幕链接等
+        """
+        ids = self.tool.resolve_video_id(video_id)
+        if not ids:
+            print(f"无效的视频ID格式: {video_id}")
+            return None
+        bvid, aid = ids
+
+        # 播放器信息与登录状态相关，缓存键包含凭证指纹
+        cache_key = (self.tool.account_key, bvid, cid)
+        hit, player_info = player_info_cache.get(cache_key)
+        record_cache('player_info', hit)
+        if hit:
+            return player_info
+
+        player_info = await self._fetch_player_info(bvid, aid, cid)
+        if player_info is not None:
+            # 没有字幕的结果只做短时间缓存
+            has_subtitles = bool(player_info.get('subtitle', {}).get('subtitles'))
+            player_info_cache.set(cache_key, player_info, None if has_subtitles else NEGATIVE_TTL)
+        return player_info
+
+    async def _fetch_player_info(self, bvid: str, aid: int, cid: int) -> Optional[Dict[str, Any]]:
+        """请求播放器接口，WBI接口失败时使用普通接口"""
+        try:
+            data = await self._make_request(PLAYER_WBI_URL, {'bvid': bvid, 'cid': cid})
+            if data.get('code') != 0:
+                print(f"WBI API返回错误: {data.get('message', '未知错误')}")
+                # 如果wbi接口失败，尝试普通接口
+                return await self._get_player_info_fallback(aid, cid)
+
+            return data.get('data', {})
+
+        except Exception as e:
+            print(f"获取播放器信息失败: {e}")
+            return await self._get_player_info_fallback(aid, cid)
+
+    async def _get_player_info_fallback(self, aid: int, cid: int) -> Optional[Dict[str, Any]]:
+        """备用的播放器信息获取方法"""
+        try:
+            data = await self._make_request(PLAYER_URL, {'aid': aid, 'cid': cid}, use_wbi=False)
+            if data.get('code') != 0:
+                print(f"备用API返回错误: {data.get('message', '未知错误')}")
+                return None
+
+            return data.get('data', {})
+
+        except Exception as e:
+            print(f"备用方法获取播放器信息失败: {e}")
+            return None
+
+    async def get_subtitle_info(self, video_id: str, cid: int) -> Optional[List[Dict[str, Any]]]:
+        """获取视频字幕信息
+
+        Args:
+            video_id: 视频ID，支持BV号或AV号
+            cid: 分P的cid
+
+        Returns:
+            List: 字幕信息列表，失败返回None
+        """
+        player_info = await self.get_player_info(video_id, cid)
+        if not player_info:
+            return None
+        return player_info.get('subtitle', {}).get('subtitles', [])
+
+    async def iter_subtitle_cues(self, subtitle_url: str) -> AsyncIterator[Dict[str, Any]]:
+        """流式下载字幕文件，逐条产出字幕条目，规则同BilibiliEnhancedTool.iter_subtitle_cues
+
+        Args:
+            subtitle_url: 字幕文件URL
+
+        Yields:
+            Dict: 字幕条目（from/to/content）
+
+        Raises:
+            Exception: 请求或解析失败
+        """
+        if self._client is None:
+            raise RuntimeError("AsyncBilibiliClient必须在async with中使用")
+
+        url = normalize_subtitle_url(subtitle_url)
+        account = self.tool.pool.acquire()
+        # 调用方提前停止迭代时不计入账号的请求结果
+        outcome = None
+        limiter = rate_limiters.get(account.key, urllib.parse.urlsplit(url).hostname)
+        try:
+            delay = reserve_rate_limit(limiter)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            attempt = 0
+            while True:
+                # 已经产出字幕条目后不能重试，否则调用方会收到重复的条目
+                started = False
+                try:
+                    async with self._semaphore:
+                        with timed('subtitle'):
+                            async with self._client.stream(
+                                "GET", url, headers=account.headers, timeout=request_timeout(self._client.timeout)
+                            ) as response:
+                                try:
+                                    if response.status_code == 412:
+                                        outcome = OUTCOME_THROTTLED
+                                        limiter.on_throttled()
+                                    response.raise_for_status()
+                                    chunks = aiter_until_deadline(response.aiter_bytes())
+                                    async for cue in aiter_subtitle_body(chunks):
+                                        started = True
+                                        yield cue
+                                finally:
+                                    record_request('subtitle', response.num_bytes_downloaded)
+                    break
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    await asyncio.sleep(transient_retry_delay(e, attempt, retryable=not started))
+                    attempt += 1
+            outcome = OUTCOME_OK
+        except httpx.HTTPStatusError as e:
+            outcome = outcome or OUTCOME_ERROR
+            raise Exception(f"HTTP错误 {e.response.status_code}")
+        except httpx.RequestError as e:
+            outcome = OUTCOME_ERROR
+            raise Exception(f"请求错误: {e}")
+        except ValueError as e:
+            outcome = OUTCOME_ERROR
+            raise Exception(f"字幕解析错误: {e}")
+        finally:
+            self.tool.pool.release(account, outcome)
+        limiter.on_success()
+
+    async def download_subtitle(self, subtitle_url: str,
+                                builder: Optional[SubtitleTrackBuilder] = None) -> Optional[SubtitleTrack]:
+        """下载字幕内容
+
+        Args:
+            subtitle_url: 字幕文件URL
+            builder: 收集字幕条目的构建器，调用方可以在下载过程中读取已解析的条目；
+                合并到其他调用方的同一下载时不会写入，只返回完整的字幕轨道
+
+        Returns:
+            SubtitleTrack: 字幕轨道，失败返回None
+        """
+        async def collect() -> SubtitleTrack:
+            target = builder if builder is not None else SubtitleTrackBuilder()
+            async for cue in self.iter_subtitle_cues(subtitle_url):
+                target.append(cue)
+            return target.build()
+
+        try:
+            # 与同步客户端共用请求合并表，同一字幕文件的并发下载只请求一次
+            key = request_key(self.tool.account_key, normalize_subtitle_url(subtitle_url))
+            return await request_flight.do_async(key, collect)
+
+        except Exception as e:
+            print(f"下载字幕失败: {e}")
+            return None
+
+    async def load_video_info(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """获取视频信息，优先读取持久化缓存（缓存读写在线程中进行，不阻塞事件循环）
+
+        Args:
+            video_id: 视频ID，支持BV号或AV号
+
+        Returns:
+            Dict: 视频信息字典，失败返回None
+        """
+        ids = self.tool.resolve_video_id(video_id)
+        if self.cache is not None and ids:
+            try:
+                video_info = await asyncio.to_thread(self.cache.get_video, ids[0])
+                record_cache('disk_video', bool(video_info))
+                if video_info:
+                    return video_info
+            except Exception as e:
+                print(f"读取视频信息缓存失败: {e}")
+
+        video_info = await self.get_video_info(video_id)
+        if self.cache is not None and video_info:
+            try:
+                await asyncio.to_thread(self.cache.put_video, video_info)
+            except Exception as e:
+                print(f"写入视频信息缓存失败: {e}")
+        return video_info
+
+    async def _index_track(self, bvid: str, page_info: Dict[str, Any], subtitle: Dict[str, Any],
+                           body: SubtitleTrack, title: str) -> None:
+        """将分P的字幕写入全文索引（在线程中写入），已索引的字幕轨道不会重复写入"""
+        if self.index is None:
+            return
+        try:
+            with timed('index'):
+                await asyncio.to_thread(self.index.add_track, bvid, page_info.get('cid'), subtitle, body, title,
+                                        page_info.get('page'), page_info.get('part') or '')
+        except Exception as e:
+            print(f"写入字幕索引失败: {e}")
+
+    async def extract_page_subtitle(self, bvid: str, page_info: Dict[str, Any], lang: str = 'zh-CN', title: str = '',
+                                    builder: Optional[SubtitleTrackBuilder] = None) -> Dict[str, Any]:
+        """获取单个分P的字幕，优先读取持久化缓存（缓存读写在线程中进行，不阻塞事件循环）
+
+        Args:
+            bvid: 视频BV号
+            page_info: 视频信息中pages列表的元素
+            lang: 字幕语言
+            title: 视频标题，写入全文索引
+            builder: 从网络下载字幕时收集字幕条目的构建器，见download_subtitle
+
+        Returns:
+            Dict: 包含page、subtitle、body、text字段，含义同extract_subtitle；不拼接文本，text为None
+        """
+        result = {
+            'page': page_info,
+            'subtitle': None,
+            'body': None,
+            'text': None
+        }
+        cid = page_info.get('cid')
+
+        if self.cache is not None:
+            try:
+                cached = await asyncio.to_thread(self.cache.get_subtitle, bvid, cid, lang)
+                record_cache('disk_subtitle', bool(cached))
+                if cached:
+                    result['subtitle'], result['body'] = cached
+                    await self._index_track(bvid, page_info, result['subtitle'], result['body'], title)
+                    return result
+            except Exception as e:
+                print(f"读取字幕缓存失败: {e}")
+
+        try:
+            subtitle_info = await self.get_subtitle_info(bvid, cid)
+            if not subtitle_info:
+                print("没有可用的字幕")
+                return result
+
+            target_subtitle = self.tool.select_subtitle(subtitle_info, lang)
+            subtitle_url = target_subtitle.get('subtitle_url')
+            if not subtitle_url:
+                print("字幕URL为空")
+                return result
+
+            result['subtitle'] = target_subtitle
+            subtitle_content = await self.download_subtitle(subtitle_url, builder)
+            if not subtitle_content:
+                return result
+
+            result['body'] = subtitle_content
+            if self.cache is not None:
+                try:
+                    await asyncio.to_thread(self.cache.put_subtitle, bvid, cid, target_subtitle, result['body'])
+                except Exception as e:
+                    print(f"写入字幕缓存失败: {e}")
+            await self._index_track(bvid, page_info, target_subtitle, result['body'], title)
+            return result
+
+        except Exception as e:
+            print(f"获取字幕文本失败: {e}")
+            return result
+
+    async def extract_subtitle(self, video_id: str, page: int = 1, lang: str = 'zh-CN') -> Optional[Dict[str, Any]]:
+        """单次遍历获取视频信息和字幕，返回值同BilibiliEnhancedTool.extract_subtitle
+
+        Args:
+            video_id: 视频ID，支持BV号或AV号
+            page: 分P页码，从1开始
+            lang: 字幕语言，默认中文
+
+        Returns:
+            Dict: 包含video、page、subtitle、text字段，获取视频信息失败返回None
+        """
+        video_info = await self.load_video_info(video_id)
+        if not video_info:
+            return None
+
+        pages = video_info.get('pages') or []
+        if page < 1 or page > len(pages):
+            print(f"无效的分P页码: {page}")
+            return {'video': video_info, 'page': None, 'subtitle': None, 'body': None, 'text': None}
+
+        result = await self.extract_page_subtitle(video_info.get('bvid') or video_id, pages[page - 1], lang,
+                                                  video_info.get('title') or '')
+        if result['body']:
+            result['text'] = self.tool.join_subtitle_text(result['body'])
+        return {'video': video_info, **result}
+
+    async def iter_video_parts(self, video_id: str, pages: Optional[str] = None, lang: str = 'zh-CN',
+                               stream_cues: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """获取多个分P的字幕
+
+        所选分P的播放器信息和字幕文件并发获取，结果按页码顺序逐个返回，
+        总耗时取决于最慢的分P而不是所有分P之和。
+
+        stream_cues为True时，轮到的分P在字幕文件下载过程中就把已解析的字幕条目以
+        {'video', 'page', 'cues'}分批返回，不必等整个文件下载完；从缓存读取或合并到
+        其他调用方下载的分P在完成后随结果一起返回。
+
+        Args:
+            video_id: 视频ID，支持BV号或AV号
+            pages: 分P选择，格式见parse_page_selection
+            lang: 字幕语言，默认中文
+            stream_cues: 是否在下载过程中分批返回字幕条目
+
+        Yields:
+            Dict: 每个分P的结果，字段同extract_subtitle（text为None），另有streamed字段，
+                表示body中前多少条已经以cues分批返回
+
+        Raises:
+            ValueError: 获取视频信息失败或分P选择无效
+        """
+        video_info = await self.load_video_info(video_id)
+        if not video_info:
+            raise ValueError(f"获取视频信息失败: {video_id}")
+
+        page_list = video_info.get('pages') or []
+        bvid = video_info.get('bvid') or video_id
+        title = video_info.get('title') or ''
+        selected = [page_list[page - 1] for page in parse_page_selection(pages, len(page_list))]
+        # 每个分P下载时写入各自的构建器，有新的字幕条目或分P完成时通知读取方
+        signals = [asyncio.Event() for _ in selected]
+        builders = [SubtitleTrackBuilder(signal.set) if stream_cues else None for signal in signals]
+        tasks = [
+            asyncio.ensure_future(self.extract_page_subtitle(bvid, page_info, lang, title, builder))
+            for page_info, builder in zip(selected, builders)
+        ]
+        try:
+            for page_info, signal, builder, task in zip(selected, signals, builders, tasks):
+                streamed = 0
+                if builder is not None:
+                    task.add_done_callback(lambda _, signal=signal: signal.set())
+                    while True:
+                        if len(builder) > streamed:
+                            last = min(len(builder), streamed + STREAM_BATCH_CUES)
+                            cues = [builder.cue(index) for index in range(streamed, last)]
+                            streamed = last
+                            yield {'video': video_info, 'page': page_info, 'cues': cues}
+                        elif task.done():
+                            break
+                        else:
+                            signal.clear()
+                            await signal.wait()
+                yield {'video': video_info, **(await task), 'streamed': streamed}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def iter_season(self, video_id: str, max_workers: int = DEFAULT_MAX_WORKERS,
+                          lang: str = 'zh-CN') -> AsyncIterator[Dict[str, Any]]:
+        """获取视频所在合集（ugc_season）中每一集的字幕
+
+        合集的分集信息（bvid、cid）来自成员视频的信息接口，每集只需请求播放器信息和字幕文件。
+        各集并发获取（同时处理max_workers集，仍受限流控制），结果按合集顺序逐个返回。
+
+        Args:
+            video_id: 合集中任意一个视频的ID，支持BV号或AV号
+            max_workers: 同时处理的集数
+            lang: 字幕语言，默认中文
+
+        Yields:
+            Dict: 每集的结果，包括season、episode以及page、subtitle、body、text（同extract_page_subtitle）
+
+        Raises:
+            ValueError: 获取视频信息失败或视频不属于合集
+        """
+        video_info = await self.load_video_info(video_id)
+        if video_info and 'season' not in video_info:
+            # 持久化缓存中的旧记录不含合集信息，重新请求
+            video_info = await self.get_video_info(video_id)
+        if not video_info:
+            raise ValueError(f"获取视频信息失败: {video_id}")
+        season = video_info.get('season')
+        if not season or not season['episodes']:
+            raise ValueError(f"视频不属于合集: {video_id}")
+
+        workers = asyncio.Semaphore(max(1, int(max_workers)))
+
+        async def extract_episode(episode: Dict[str, Any]) -> Dict[str, Any]:
+            page_info = {'cid': episode['cid'], 'page': 1, 'part': episode['title']}
+            async with workers:
+                return await self.extract_page_subtitle(episode['bvid'], page_info, lang, episode['title'])
+
+        tasks = [asyncio.ensure_future(extract_episode(episode)) for episode in season['episodes']]
+        try:
+            for episode, task in zip(season['episodes'], tasks):
+                yield {'season': season, 'episode': episode, **(await task)}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def iter_search(self, keyword: str, limit: int = SEARCH_PAGE_SIZE,
+                          max_workers: int = DEFAULT_MAX_WORKERS, lang: str = 'zh-CN') -> AsyncIterator[Dict[str, Any]]:
+        """搜索视频并获取排名前limit个结果的字幕
+
+        搜索结果全部取得后，各视频并发获取（同时处理max_workers个），结果按搜索排名逐个返回。
+
+        Args:
+            keyword: 搜索关键词
+            limit: 获取字幕的结果数
+            max_workers: 同时处理的视频数
+            lang: 字幕语言，默认中文
+
+        Yields:
+            Dict: 每个结果的rank（从1开始）、hit（搜索结果）、result（extract_subtitle的返回值，
+                处理过程中抛出的异常也放在这里）
+
+        Raises:
+            ValueError: 搜索失败
+        """
+        hits = []
+        seen = set()
+        page = 1
+        while len(hits) < limit:
+            found = await self.search_videos(keyword, page)
+            if found is None:
+                if not hits:
+                    raise ValueError(f"搜索视频失败: {keyword}")
+                break
+            for video in found['videos']:
+                if video['bvid'] not in seen and len(hits) < limit:
+                    seen.add(video['bvid'])
+                    hits.append(video)
+            if len(found['videos']) < SEARCH_PAGE_SIZE or page * SEARCH_PAGE_SIZE >= found['count']:
+                break
+            page += 1
+
+        workers = asyncio.Semaphore(max(1, int(max_workers)))
+
+        async def extract_hit(hit: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            async with workers:
+                return await self.extract_subtitle(hit['bvid'], lang=lang)
+
+        tasks = [asyncio.ensure_future(extract_hit(hit)) for hit in hits]
+        try:
+            for rank, (hit, task) in enumerate(zip(hits, tasks), 1):
+                try:
+                    result = await task
+                except Exception as e:
+                    result = e
+                yield {'rank': rank, 'hit': hit, 'result': result}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_video_subtitle(self, video_id: str, page: int = 1, lang: str = 'zh-CN',
+                                 fmt: str = FORMAT_PLAIN) -> Optional[str]:
+        """获取视频字幕文本
+
+        Args:
+            video_id: 视频ID，支持BV号或AV号
+            page: 分P页码，从1开始
+            lang: 字幕语言，默认中文
+            fmt: 输出格式，plain/srt/vtt/jsonl之一
+
+        Returns:
+            str: 字幕文本，失败返回None
+        """
+        result = await self.extract_subtitle(video_id, page, lang)
+        if not result or not result['body']:
+            return None
+        return format_subtitles(result['body'], fmt)
+
+    async def extract_subtitles(self, video_ids: List[str], max_workers: int = DEFAULT_MAX_WORKERS,
+                                page: int = 1, lang: str = 'zh-CN') -> List[Any]:
+        """并发获取多个视频的信息和字幕
+
+        单个视频失败不会影响其他视频。
+
+        Args:
+            video_ids: 视频ID列表，支持BV号或AV号
+            max_workers: 同时处理的视频数
+            page: 分P页码，从1开始
+            lang: 字幕语言，默认中文
+
+        Returns:
+            List: 与video_ids顺序一致，每项为extract_subtitle的返回值，
+                处理过程中抛出的异常会作为对应位置的元素返回
+        """
+        workers = asyncio.Semaphore(max(1, int(max_workers)))
+
+        async def extract_one(video_id: str) -> Optional[Dict[str, Any]]:
+            async with workers:
+                return await self.extract_subtitle(video_id, page, lang)
+
+        return await asyncio.gather(*(extract_one(video_id) for video_id in video_ids), return_exceptions=True)
@@ -7,18 +7,54 @@ B站视频信息和字幕获取增强工具
 支持有凭证和无凭证两种模式
 """
 
+import html
 import json
 import random
 import re
+import threading
 import time
 import urllib.parse
 from functools import reduce
-from hashlib import md5
+from hashlib import md5, sha256
 from http.cookies import SimpleCookie
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, Iterable, Iterator, List, Any, Mapping
 
 import httpx
 
+from bilibili_http import get_http_client, build_cookie_header
+from credential_pool import (
+    OUTCOME_ERROR,
+    OUTCOME_LOGGED_OUT,
+    OUTCOME_OK,
+    OUTCOME_THROTTLED,
+    STRATEGY_LEAST_LOADED,
+    PooledAccount,
+    classify_response,
+    credential_pools,
+)
+from deadline import (
+    DeadlineExceeded,
+    deadline_exceeded,
+    ensure_time_for,
+    is_transient_error,
+    iter_until_deadline,
+    request_timeout,
+    retry_delay,
+)
+from invocation_metrics import record_cache, record_request, record_retry, record_time, timed
+from memory_cache import (
+    NEGATIVE_TTL,
+    NOT_FOUND_CODES,
+    player_info_cache,
+    video_info_cache,
+    video_pages_cache,
+)
+from rate_limiter import MAX_THROTTLE_RETRIES, backoff_delay, rate_limiters
+from singleflight import request_flight, request_key
+from subtitle_format import FORMAT_PLAIN, format_subtitles
+from subtitle_stream import compact_cue, iter_subtitle_body
+from subtitle_track import SubtitleTrack
+
 
 # 现代化的请求头
 HEADERS = {
@@ -40,6 +76,31 @@ HEADERS = {
     "Referer": "https://www.bilibili.com/",
 }
 
+# B站API地址
+NAV_URL = "https://api.bilibili.com/x/web-interface/nav"
+VIDEO_INFO_URL = "https://api.bilibili.com/x/web-interface/view"
+VIDEO_PAGES_URL = "https://api.bilibili.com/x/player/pagelist"
+PLAYER_WBI_URL = "https://api.bilibili.com/x/player/wbi/v2"
+PLAYER_URL = "https://api.bilibili.com/x/player/v2"
+UPLOADER_VIDEOS_URL = "https://api.bilibili.com/x/space/wbi/arc/search"
+SEARCH_URL = "https://api.bilibili.com/x/web-interface/wbi/search/type"
+
+# 调用统计中各接口的名称，其余地址（字幕文件）统一记为subtitle
+ENDPOINT_NAMES = {
+    NAV_URL: 'wbi',
+    VIDEO_INFO_URL: 'view',
+    VIDEO_PAGES_URL: 'pagelist',
+    PLAYER_WBI_URL: 'player',
+    PLAYER_URL: 'player',
+    UPLOADER_VIDEOS_URL: 'space',
+    SEARCH_URL: 'search',
+}
+
+
+def endpoint_name(url: str) -> str:
+    """调用统计中使用的接口名称"""
+    return ENDPOINT_NAMES.get(url, 'subtitle')
+
 # WBI签名相关
 mixinKeyEncTab = [
     46, 47, 18, 2, 53, 8, 23, 32, 15, 50, 10, 31, 58, 3, 45, 35, 27, 43, 5, 49, 33, 9, 42, 19, 29, 28, 14, 39, 12, 38, 41, 13,
@@ -63,25 +124,553 @@ def encWbi(params: dict, img_key: str, sub_key: str) -> dict:
     params["w_rid"] = wbi_sign
     return params
 
-def getWbiKeys() -> tuple[str, str]:
-    resp = httpx.get("https://api.bilibili.com/x/web-interface/nav", headers=HEADERS)
-    resp.raise_for_status()
-    json_content = resp.json()
-    img_url: str = json_content["data"]["wbi_img"]["img_url"]
-    sub_url: str = json_content["data"]["wbi_img"]["sub_url"]
+def parse_wbi_keys(nav_data: dict) -> tuple[str, str]:
+    """从nav接口的响应中提取(img_key, sub_key)，未登录时响应中同样包含密钥
+
+    Raises:
+        KeyError: 响应中没有WBI密钥
+    """
+    wbi_img = (nav_data.get("data") or {}).get("wbi_img") or {}
+    img_url: str = wbi_img["img_url"]
+    sub_url: str = wbi_img["sub_url"]
     img_key = img_url.rsplit("/", 1)[1].split(".")[0]
     sub_key = sub_url.rsplit("/", 1)[1].split(".")[0]
     return img_key, sub_key
 
+def getWbiKeys() -> tuple[str, str]:
+    client = get_http_client()
+    with timed('wbi'):
+        resp = client.get(NAV_URL, headers=HEADERS, timeout=request_timeout(client.timeout))
+    record_request('wbi', len(resp.content))
+    resp.raise_for_status()
+    return parse_wbi_keys(resp.json())
+
+# WBI密钥缓存时长（秒），B站每天轮换一次img_key/sub_key
+WBI_KEYS_TTL = 24 * 60 * 60
+
+# 表示WBI签名被拒绝的业务错误码，遇到时需要刷新密钥后重试
+WBI_SIGN_ERROR_CODES = (-403, -352)
+
+
+class WbiKeyCache:
+    """进程级WBI密钥缓存
+
+    密钥在TTL内被所有调用方共享，避免每次签名请求前都访问nav接口。
+    刷新过程持有锁，并发调用只会触发一次nav请求。
+    """
+
+    def __init__(self, ttl: float = WBI_KEYS_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._keys: Optional[tuple[str, str]] = None
+        self._expires_at = 0.0
+
+    def get(self) -> tuple[str, str]:
+        """获取当前有效的(img_key, sub_key)，过期或缺失时从nav接口刷新"""
+        with self._lock:
+            expired = self._keys is None or time.monotonic() >= self._expires_at
+            record_cache('wbi_keys', not expired)
+            if expired:
+                self._keys = getWbiKeys()
+                self._expires_at = time.monotonic() + self.ttl
+            return self._keys
+
+    def peek(self) -> Optional[tuple[str, str]]:
+        """返回未过期的缓存密钥，不触发刷新（供异步调用方判断是否需要在线程中刷新）"""
+        with self._lock:
+            if self._keys is not None and time.monotonic() < self._expires_at:
+                return self._keys
+            return None
+
+    def set(self, keys: tuple[str, str]) -> None:
+        """写入从其他nav请求（如凭证校验）中得到的密钥，省去一次刷新请求"""
+        with self._lock:
+            self._keys = keys
+            self._expires_at = time.monotonic() + self.ttl
+
+    def set_ttl(self, ttl: float) -> None:
+        """修改缓存时长，已缓存的密钥按新的TTL重新计算过期时间"""
+        with self._lock:
+            if self._keys is not None:
+                self._expires_at += ttl - self.ttl
+            self.ttl = ttl
+
+    def invalidate(self, stale_keys: Optional[tuple[str, str]] = None) -> None:
+        """使缓存失效
+
+        Args:
+            stale_keys: 被B站拒绝的密钥。若缓存已被其他调用方刷新为新密钥则不再失效，
+                避免并发请求同时遇到签名错误时重复刷新
+        """
+        with self._lock:
+            if stale_keys is None or self._keys == stale_keys:
+                self._keys = None
+                self._expires_at = 0.0
+
+
+# 进程内共享的WBI密钥缓存
+wbi_key_cache = WbiKeyCache()
+
+
 def get_signed_params(params: dict) -> dict:
-    img_key, sub_key = getWbiKeys()
+    img_key, sub_key = wbi_key_cache.get()
     return encWbi(params, img_key, sub_key)
 
+def normalize_subtitle_url(subtitle_url: str) -> str:
+    """确保字幕URL是完整的"""
+    if subtitle_url.startswith('//'):
+        return 'https:' + subtitle_url
+    if subtitle_url.startswith('/'):
+        return 'https://api.bilibili.com' + subtitle_url
+    return subtitle_url
+
+def normalize_video_id(video_id: str) -> str:
+    """校验并规范化视频ID
+    
+    Args:
+        video_id: BV号、av号或纯数字
+        
+    Returns:
+        str: BV号或av号格式的视频ID，格式无效返回空字符串
+    """
+    video_id = video_id.strip()
+    
+    # BV号
+    if re.match(r'^BV([a-zA-Z0-9]{10})$', video_id):
+        return video_id
+    
+    # 带av前缀的AV号
+    if re.match(r'^av([0-9]+)$', video_id):
+        return video_id
+    
+    # 纯数字按AV号处理
+    if re.match(r'^([0-9]+)$', video_id):
+        return f"av{video_id}"
+    
+    return ""
+
+# BV号与AV号互转，基于bilibili_api项目的转换算法
+BV_XOR_CODE = 23442827791579
+BV_MASK_CODE = 2251799813685247
+BV_MAX_AID = 1 << 51
+BV_BASE = 58
+BV_ALPHABET = "FcwAPNKTMug3GV5Lj7EJnHpWsx4tb8haYeviqBz6rkCy12mUSDQX9RdoZf"
+# BV号中编码部分的字符位置，按58进制从高位到低位排列（已包含第3、9位和第4、7位的交换）
+BV_DIGIT_POSITIONS = (9, 7, 5, 6, 4, 8, 3, 10, 11)
+
+# 解码表：ASCII码 -> 58进制数位，不在编码表中的字符为-1
+_BV_DECODE = [-1] * 128
+for _digit, _char in enumerate(BV_ALPHABET):
+    _BV_DECODE[ord(_char)] = _digit
+del _digit, _char
+
+def bvid2aid(bvid: str) -> int:
+    """BV号转AV号
+
+    Raises:
+        ValueError: BV号长度或字符无效
+    """
+    if len(bvid) != 12:
+        raise ValueError(f"无效的BV号: {bvid}")
+    tmp = 0
+    try:
+        for position in BV_DIGIT_POSITIONS:
+            digit = _BV_DECODE[ord(bvid[position])]
+            if digit < 0:
+                raise ValueError(f"无效的BV号: {bvid}")
+            tmp = tmp * BV_BASE + digit
+    except IndexError:
+        raise ValueError(f"无效的BV号: {bvid}")
+    return (tmp & BV_MASK_CODE) ^ BV_XOR_CODE
+
+def aid2bvid(aid: int) -> str:
+    """AV号转BV号"""
+    tmp = (BV_MAX_AID | aid) ^ BV_XOR_CODE
+    chars = ["B", "V", "1", "0", "0", "0", "0", "0", "0", "0", "0", "0"]
+    position = 11
+    while tmp:
+        tmp, digit = divmod(tmp, BV_BASE)
+        chars[position] = BV_ALPHABET[digit]
+        position -= 1
+    chars[3], chars[9] = chars[9], chars[3]
+    chars[4], chars[7] = chars[7], chars[4]
+    return "".join(chars)
+
+def bvids_to_aids(bvids: Iterable[str]) -> List[int]:
+    """批量将BV号转为AV号，结果与输入顺序一致
+
+    Raises:
+        ValueError: 存在无效的BV号
+    """
+    return [bvid2aid(bvid) for bvid in bvids]
+
+def aids_to_bvids(aids: Iterable[int]) -> List[str]:
+    """批量将AV号转为BV号，结果与输入顺序一致"""
+    return [aid2bvid(aid) for aid in aids]
+
+def resolve_video_id(video_id: str) -> Optional[tuple[str, int]]:
+    """解析视频ID
+
+    Args:
+        video_id: 视频ID，支持BV号或AV号
+
+    Returns:
+        tuple: (bvid, aid)，格式无效返回None
+    """
+    if video_id.startswith('BV'):
+        return video_id, bvid2aid(video_id)
+    if video_id.startswith('av') or video_id.isdigit():
+        aid = int(video_id.replace('av', ''))
+        return aid2bvid(aid), aid
+    return None
+
+def parse_page_selection(selection: Optional[str], page_count: int) -> List[int]:
+    """解析分P选择
+    
+    Args:
+        selection: 为空表示第1P，"all"表示全部分P，
+            也可以是逗号分隔的页码和范围，例如"1-3,5"
+        page_count: 视频分P总数
+        
+    Returns:
+        List: 按顺序排列且去重的页码列表
+        
+    Raises:
+        ValueError: 格式无效或页码超出范围
+    """
+    selection = (selection or '').strip().lower()
+    if not selection:
+        return [1] if page_count >= 1 else []
+    if selection in ('all', '*'):
+        return list(range(1, page_count + 1))
+    
+    pages = set()
+    for item in re.split(r'[,，\s]+', selection):
+        if not item:
+            continue
+        match = re.match(r'^(\d+)(?:-(\d+))?$', item)
+        if not match:
+            raise ValueError(f"无效的分P选择: {item}")
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        if first < 1 or last < first or last > page_count:
+            raise ValueError(f"分P范围超出视频分P数({page_count}): {item}")
+        pages.update(range(first, last + 1))
+    return sorted(pages)
+
+def compact_subtitle_body(body: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """只保留字幕条目的时间和文本，丢弃sid、location等字段"""
+    return [compact_cue(item) for item in body]
+
+def parse_ugc_season(season_data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """从视频信息接口的ugc_season字段中提取合集信息
+    
+    Returns:
+        Dict: 合集的id、title和按合集顺序排列的episodes（每集的index、section、bvid、aid、cid、title），
+            视频不属于合集时返回None
+    """
+    if not season_data:
+        return None
+    episodes = []
+    for section in season_data.get('sections') or []:
+        for episode in section.get('episodes') or []:
+            episodes.append({
+                'index': len(episodes) + 1,
+                'section': section.get('title') or '',
+                'bvid': episode.get('bvid'),
+                'aid': episode.get('aid'),
+                'cid': episode.get('cid'),
+                'title': episode.get('title') or (episode.get('arc') or {}).get('title') or '',
+            })
+    return {
+        'id': season_data.get('id'),
+        'title': season_data.get('title') or '',
+        'episodes': episodes,
+    }
+
+# UP主投稿列表每页的视频数
+UPLOADER_PAGE_SIZE = 30
+# 投稿列表接口要求的浏览器环境参数，缺少时容易被风控拒绝（-352）
+UPLOADER_QUERY_PARAMS = {
+    'dm_img_list': '[]',
+    'dm_img_str': 'V2ViR0wgMS4wIChPcGVuR0wgRVMgMi4wIENocm9taXVtKQ',
+    'dm_cover_img_str': 'QU5HTEUgKEludGVsLCBJbnRlbChSKSBVSEQgR3JhcGhpY3MgNjMwICgweDAwMDAzRTlCKSBEaXJlY3QzRDExIHZzXzVfMCBwc181XzAsIEQzRDExKUdvb2dsZSBJbmMuIChJbnRlbCk',
+}
+
+def normalize_mid(mid: Any) -> Optional[int]:
+    """校验并规范化UP主的mid
+    
+    Args:
+        mid: 数字、"UID:123"或个人空间链接（space.bilibili.com/123）
+        
+    Returns:
+        int: mid，格式无效返回None
+    """
+    text = str(mid or '').strip()
+    match = re.match(r'^(?:uid[:：]?\s*)?([0-9]+)$', text, re.IGNORECASE)
+    if not match:
+        match = re.search(r'space\.bilibili\.com/([0-9]+)', text)
+    if not match or int(match.group(1)) <= 0:
+        return None
+    return int(match.group(1))
+
+def uploader_query_params(mid: int, pn: int, ps: int = UPLOADER_PAGE_SIZE) -> Dict[str, Any]:
+    """UP主投稿列表的请求参数，按发布时间从新到旧排列"""
+    return {'mid': mid, 'pn': pn, 'ps': ps, 'order': 'pubdate', 'tid': 0, 'keyword': '', **UPLOADER_QUERY_PARAMS}
+
+def parse_uploader_videos(list_data: Dict[str, Any]) -> Dict[str, Any]:
+    """从投稿列表接口的data字段中提取视频列表
+    
+    Returns:
+        Dict: videos（每个视频的aid、bvid、title、pubdate、length）和投稿总数count
+    """
+    videos = []
+    for item in (list_data.get('list') or {}).get('vlist') or []:
+        videos.append({
+            'aid': item.get('aid'),
+            'bvid': item.get('bvid'),
+            'title': item.get('title') or '',
+            'pubdate': item.get('created') or 0,
+            'length': item.get('length') or '',
+        })
+    return {'videos': videos, 'count': (list_data.get('page') or {}).get('count') or 0}
+
+# 视频搜索每页的结果数（接口固定值）
+SEARCH_PAGE_SIZE = 20
+
+def strip_search_markup(text: Optional[str]) -> str:
+    """去掉搜索结果标题中的关键词高亮标签并还原HTML转义字符"""
+    return html.unescape(re.sub(r'<[^>]+>', '', text or ''))
+
+def parse_search_results(search_data: Dict[str, Any]) -> Dict[str, Any]:
+    """从视频搜索接口的data字段中提取搜索结果
+    
+    Returns:
+        Dict: videos（每个结果的aid、bvid、title、author、mid、pubdate、duration、play）和结果总数count
+    """
+    videos = []
+    for item in search_data.get('result') or []:
+        if item.get('type', 'video') != 'video' or not item.get('bvid'):
+            continue
+        videos.append({
+            'aid': item.get('aid'),
+            'bvid': item.get('bvid'),
+            'title': strip_search_markup(item.get('title')),
+            'author': item.get('author') or '',
+            'mid': item.get('mid'),
+            'pubdate': item.get('pubdate') or 0,
+            'duration': item.get('duration') or '',
+            'play': item.get('play') or 0,
+        })
+    return {'videos': videos, 'count': search_data.get('numResults') or 0}
+
+def credential_fingerprint(sessdata: str, bili_jct: str, buvid3: str) -> str:
+    """计算凭证指纹（SHA-256摘要），用于缓存键和日志，不暴露原始Cookie"""
+    digest = sha256('\x00'.join((sessdata or '', bili_jct or '', buvid3 or '')).encode())
+    return digest.hexdigest()[:16]
+
 def parse_cookies(cookie_str):
     cookie = SimpleCookie()
     cookie.load(cookie_str)
     return {key: morsel.value for key, morsel in cookie.items()}
 
+def parse_account_list(text: Optional[str]) -> List[Dict[str, str]]:
+    """解析额外账号配置，账号之间用换行或|分隔，每个账号为Cookie字符串
+    
+    示例: ``SESSDATA=xxx; bili_jct=yyy; buvid3=zzz | SESSDATA=...``，空项被忽略
+    
+    Returns:
+        List: 每个账号的{'SESSDATA', 'bili_jct', 'buvid3'}
+    
+    Raises:
+        ValueError: 某个账号缺少必需的字段
+    """
+    accounts = []
+    items = [item.strip() for item in re.split(r'[\n|]', text or '')]
+    for number, item in enumerate(filter(None, items), 1):
+        cookies = parse_cookies(item)
+        missing = [name for name in ('SESSDATA', 'bili_jct', 'buvid3') if not cookies.get(name)]
+        if missing:
+            raise ValueError(f"第{number}个账号缺少: {', '.join(missing)}")
+        accounts.append({name: cookies[name] for name in ('SESSDATA', 'bili_jct', 'buvid3')})
+    return accounts
+
+def parse_tool_credentials(credentials: Mapping[str, Any]) -> Dict[str, Any]:
+    """解析插件的凭证配置：主账号、额外账号和账号选择策略
+    
+    Returns:
+        Dict: sessdata、bili_jct、buvid3、extra_accounts和account_strategy，
+            可以直接作为BilibiliEnhancedTool和AsyncBilibiliClient的关键字参数
+    
+    Raises:
+        ValueError: 缺少主账号的凭证，或额外账号配置无效
+    """
+    missing = [name for name in ('sessdata', 'bili_jct', 'buvid3') if not credentials.get(name)]
+    if missing:
+        raise ValueError(f"缺少凭证: {', '.join(missing)}")
+    try:
+        extra_accounts = parse_account_list(credentials.get('extra_accounts'))
+    except ValueError as e:
+        raise ValueError(f"额外账号无效: {e}")
+    return {
+        'sessdata': credentials['sessdata'],
+        'bili_jct': credentials['bili_jct'],
+        'buvid3': credentials['buvid3'],
+        'extra_accounts': extra_accounts,
+        'account_strategy': credentials.get('account_strategy') or STRATEGY_LEAST_LOADED,
+    }
+
+def clamp_int(value: Any, default: int, lower: int, upper: int) -> int:
+    """解析整数参数并限制在[lower, upper]范围内，缺失或无法解析时返回default"""
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(number, lower), upper)
+
+def reserve_rate_limit(limiter) -> float:
+    """从令牌桶预留一次请求，返回发送前需要等待的秒数
+
+    Raises:
+        DeadlineExceeded: 剩余时间不足以等待
+    """
+    delay = limiter.reserve()
+    if delay > 0:
+        ensure_time_for(delay)
+        record_time('rate_limit', delay)
+    return delay
+
+def transient_retry_delay(error: httpx.HTTPError, attempt: int, retryable: bool = True) -> float:
+    """网络错误或5xx响应后的退避时间，同步和异步请求共用
+
+    Args:
+        error: 本次请求的错误
+        attempt: 已重试次数
+        retryable: 调用方是否还能重试（如流式下载已产出数据后不能重试）
+
+    Raises:
+        DeadlineExceeded: 截止时间已过
+        httpx.HTTPError: 错误不可重试或重试次数、剩余时间已用完，重新抛出原错误
+    """
+    if deadline_exceeded():
+        raise DeadlineExceeded()
+    delay = retry_delay(attempt) if retryable and is_transient_error(error) else None
+    if delay is None:
+        raise error
+    record_retry('transient')
+    record_time('backoff', delay)
+    return delay
+
+def check_server_error(response: httpx.Response, endpoint: str) -> httpx.Response:
+    """记录一次API响应，5xx响应抛出HTTPStatusError以便退避重试"""
+    record_request(endpoint, len(response.content))
+    if response.status_code >= 500:
+        response.raise_for_status()
+    return response
+
+def request_error(error: Exception) -> Exception:
+    """将API请求中的异常转换为对外抛出的异常，DeadlineExceeded原样返回"""
+    if isinstance(error, DeadlineExceeded):
+        return error
+    if isinstance(error, httpx.HTTPStatusError):
+        return Exception(f"HTTP错误 {error.response.status_code}: {error.response.text}")
+    if isinstance(error, httpx.RequestError):
+        return Exception(f"请求错误: {error}")
+    if isinstance(error, json.JSONDecodeError):
+        return Exception(f"JSON解析错误: {error}")
+    return Exception(f"请求失败: {error}")
+
+
+class ApiRequest:
+    """一次API调用的签名、响应分类和重试决策，同步和异步客户端共用
+
+    - 每次尝试从凭证池选择一个账号，发送前经过(账号, 域名)令牌桶限流
+    - WBI签名被拒绝（-403/-352）时刷新密钥缓存并重新签名一次
+    - 被风控拦截（-412/-352/HTTP 412）时降低速率，有其他可用账号时立即换号重试，否则按指数退避重试
+    - 账号登录失效（-101）且有其他可用账号时换号重试
+
+    本类不做任何I/O：获取WBI密钥、发送请求和等待由调用方完成
+    """
+
+    def __init__(self, url: str, params: Optional[dict], use_wbi: bool, pool):
+        self.url = url
+        self.params = params
+        self.signed = use_wbi and bool(params)
+        self.host = urllib.parse.urlsplit(url).hostname
+        self.endpoint = endpoint_name(url)
+        self.pool = pool
+        self.limiter = None
+        self.sign_refreshed = False
+        self.retries = 0
+        self._wbi_keys: Optional[tuple[str, str]] = None
+
+    def sign(self, wbi_keys: Optional[tuple[str, str]]) -> Optional[dict]:
+        """返回本次尝试发送的参数，需要签名时用给定的WBI密钥签名"""
+        if not self.signed:
+            return self.params
+        self._wbi_keys = wbi_keys
+        return encWbi(dict(self.params), *wbi_keys)
+
+    def reserve(self, account: PooledAccount) -> float:
+        """为选中的账号预留令牌，返回发送前需要等待的秒数"""
+        self.limiter = rate_limiters.get(account.key, self.host)
+        return reserve_rate_limit(self.limiter)
+
+    def read_response(self, response: httpx.Response) -> tuple[Optional[str], Optional[dict]]:
+        """解析一次响应，返回(请求结果, 响应数据)
+
+        WBI签名被拒绝且尚未刷新过密钥时，使密钥失效并返回结果None，调用方应重新签名后重试；
+        此时账号不计入请求结果
+        """
+        data = None
+        if response.status_code != 412:
+            response.raise_for_status()
+            data = response.json()
+
+            if self.signed and not self.sign_refreshed and data.get('code') in WBI_SIGN_ERROR_CODES:
+                # 密钥可能已轮换，刷新后重新签名
+                self.sign_refreshed = True
+                wbi_key_cache.invalidate(self._wbi_keys)
+                record_retry('wbi_sign')
+                return None, data
+        return classify_response(response.status_code, data), data
+
+    def next_delay(self, outcome: Optional[str], response: httpx.Response) -> Optional[float]:
+        """根据请求结果决定是否重试
+
+        Returns:
+            重试前需要等待的秒数（立即重试为0），不再重试时返回None
+
+        Raises:
+            httpx.HTTPStatusError: 风控重试次数用完且响应为HTTP 412
+            DeadlineExceeded: 剩余时间不足以退避
+        """
+        if outcome is None:
+            return 0.0
+        switch_account = len(self.pool) > 1 and self.pool.has_available()
+        if outcome == OUTCOME_THROTTLED:
+            self.limiter.on_throttled()
+            if self.retries < MAX_THROTTLE_RETRIES:
+                record_retry('throttle')
+                delay = 0.0
+                if not switch_account:
+                    delay = backoff_delay(self.retries)
+                    ensure_time_for(delay)
+                    record_time('backoff', delay)
+                self.retries += 1
+                return delay
+            response.raise_for_status()
+            return None
+
+        if outcome == OUTCOME_LOGGED_OUT and switch_account and self.retries < MAX_THROTTLE_RETRIES:
+            record_retry('logged_out')
+            self.retries += 1
+            return 0.0
+
+        self.limiter.on_success()
+        return None
+
+
 class BilibiliEnhancedTool:
     """B站视频信息和字幕获取增强工具
     
@@ -95,7 +684,8 @@ class BilibiliEnhancedTool:
     - BV号和AV号相互转换
     """
     
-    def __init__(self, sessdata, bili_jct, buvid3):
+    def __init__(self, sessdata, bili_jct, buvid3, extra_accounts: Optional[List[Dict[str, str]]] = None,
+                 account_strategy: str = STRATEGY_LEAST_LOADED):
         """
         初始化工具
         
@@ -103,6 +693,8 @@ class BilibiliEnhancedTool:
             sessdata: 用户会话数据（必需）
             bili_jct: 用户验证令牌（必需）
             buvid3: 用户设备标识（必需）
+            extra_accounts: 额外账号（parse_account_list的结果），与主账号组成凭证池分担请求
+            account_strategy: 凭证池选择账号的策略，least_loaded或round_robin
         
         Raises:
             ValueError: 如果任何凭证参数为空或None
@@ -125,84 +717,102 @@ class BilibiliEnhancedTool:
             'buvid3': buvid3
         }
         self.has_credentials = True
+        # 共享连接池不保存Cookie，凭证随请求头发送
+        self.headers = {**HEADERS, **build_cookie_header(self.cookies)}
+        # 凭证池，每个请求选择一个账号发送；只有主账号时池中只有一个账号
+        accounts = [self.cookies] + list(extra_accounts or [])
+        self.pool = credential_pools.get([
+            PooledAccount(
+                credential_fingerprint(cookies['SESSDATA'], cookies['bili_jct'], cookies['buvid3']),
+                {**HEADERS, **build_cookie_header(cookies)},
+            )
+            for cookies in accounts
+        ], account_strategy)
+        # 凭证指纹，用于区分不同账号（组合）的缓存等，不包含原始Cookie
+        self.account_key = self.pool.key
     
 
     
     def _make_request(self, url: str, params: dict = None, use_wbi: bool = True) -> dict:
-        """发起HTTP请求的辅助方法"""
+        """发起HTTP请求的辅助方法
+
+        相同账号对同一接口、同一参数的并发请求会被合并为一次上游请求
+        """
+        key = request_key(self.account_key, url, params)
+        return request_flight.do(key, lambda: self._send_request(url, params, use_wbi))
+    
+    def _send_request(self, url: str, params: dict = None, use_wbi: bool = True) -> dict:
+        """发送HTTP请求
+
+        重试规则见ApiRequest；请求超时不超过调用的剩余时间，等待和退避前时间不足时抛出DeadlineExceeded
+        """
         try:
-            # 如果需要WBI签名，对参数进行签名
-            if use_wbi and params:
-                params = get_signed_params(params)
-            
-            with httpx.Client() as client:
-                response = client.get(
-                    url=url,
-                    params=params,
-                    headers=HEADERS,
-                    cookies=self.cookies,
-                    timeout=10
-                )
-                response.raise_for_status()
-                return response.json()
-            
-        except httpx.HTTPStatusError as e:
-            raise Exception(f"HTTP错误 {e.response.status_code}: {e.response.text}")
-        except httpx.RequestError as e:
-            raise Exception(f"请求错误: {e}")
-        except json.JSONDecodeError as e:
-            raise Exception(f"JSON解析错误: {e}")
+            request = ApiRequest(url, params, use_wbi, self.pool)
+            while True:
+                request_params = request.sign(wbi_key_cache.get() if request.signed else None)
+                account = self.pool.acquire()
+                outcome = OUTCOME_ERROR
+                try:
+                    delay = request.reserve(account)
+                    if delay > 0:
+                        time.sleep(delay)
+                    response = self._http_get(url, request_params, account.headers, request.endpoint)
+                    outcome, data = request.read_response(response)
+                finally:
+                    self.pool.release(account, outcome)
+
+                delay = request.next_delay(outcome, response)
+                if delay is None:
+                    return data
+                if delay > 0:
+                    time.sleep(delay)
         except Exception as e:
-            raise Exception(f"请求失败: {e}")
+            raise request_error(e)
+    
+    def _http_get(self, url: str, params: Optional[dict], headers: Dict[str, str], endpoint: str) -> httpx.Response:
+        """发送一次GET请求，网络错误和5xx响应在剩余时间足够时退避重试
+        
+        Raises:
+            DeadlineExceeded: 截止时间已过
+            httpx.HTTPError: 请求失败且不能再重试
+        """
+        client = get_http_client()
+        attempt = 0
+        while True:
+            try:
+                with timed(endpoint):
+                    response = client.get(url, params=params, headers=headers, timeout=request_timeout(client.timeout))
+                return check_server_error(response, endpoint)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                time.sleep(transient_retry_delay(e, attempt))
+                attempt += 1
     
     def bvid2aid(self, bvid: str) -> int:
         """BV号转AV号"""
-        # 基于bilibili_api项目的转换算法
-        XOR_CODE = 23442827791579
-        MASK_CODE = 2251799813685247
-        BASE = 58
-        
-        data = [
-            b"F", b"c", b"w", b"A", b"P", b"N", b"K", b"T", b"M", b"u", b"g", b"3", b"G", b"V", b"5", b"L",
-            b"j", b"7", b"E", b"J", b"n", b"H", b"p", b"W", b"s", b"x", b"4", b"t", b"b", b"8", b"h", b"a",
-            b"Y", b"e", b"v", b"i", b"q", b"B", b"z", b"6", b"r", b"k", b"C", b"y", b"1", b"2", b"m", b"U",
-            b"S", b"D", b"Q", b"X", b"9", b"R", b"d", b"o", b"Z", b"f"
-        ]
-        
-        bvid = list(bvid)
-        bvid[3], bvid[9] = bvid[9], bvid[3]
-        bvid[4], bvid[7] = bvid[7], bvid[4]
-        bvid = bvid[3:]
-        tmp = 0
-        for i in bvid:
-            idx = data.index(i.encode())
-            tmp = tmp * BASE + idx
-        return (tmp & MASK_CODE) ^ XOR_CODE
+        return bvid2aid(bvid)
     
     def aid2bvid(self, aid: int) -> str:
         """AV号转BV号"""
-        XOR_CODE = 23442827791579
-        MAX_AID = 1 << 51
-        BASE = 58
-        BV_LEN = 12
-        
-        data = [
-            b"F", b"c", b"w", b"A", b"P", b"N", b"K", b"T", b"M", b"u", b"g", b"3", b"G", b"V", b"5", b"L",
-            b"j", b"7", b"E", b"J", b"n", b"H", b"p", b"W", b"s", b"x", b"4", b"t", b"b", b"8", b"h", b"a",
-            b"Y", b"e", b"v", b"i", b"q", b"B", b"z", b"6", b"r", b"k", b"C", b"y", b"1", b"2", b"m", b"U",
-            b"S", b"D", b"Q", b"X", b"9", b"R", b"d", b"o", b"Z", b"f"
-        ]
-        
-        bytes_list = [b"B", b"V", b"1", b"0", b"0", b"0", b"0", b"0", b"0", b"0", b"0", b"0"]
-        bv_idx = BV_LEN - 1
-        tmp = (MAX_AID | aid) ^ XOR_CODE
-        while int(tmp) != 0:
-            bytes_list[bv_idx] = data[int(tmp % BASE)]
-            tmp //= BASE
-            bv_idx -= 1
-        bytes_list[3], bytes_list[9] = bytes_list[9], bytes_list[3]
-        bytes_list[4], bytes_list[7] = bytes_list[7], bytes_list[4]
-        return "".join([i.decode() for i in bytes_list])
+        return aid2bvid(aid)
+    
+    def resolve_video_id(self, video_id: str) -> Optional[tuple[str, int]]:
+        """解析视频ID，见模块级的resolve_video_id"""
+        return resolve_video_id(video_id)
+    
+    def parse_video_info(self, video_data: Dict[str, Any]) -> Dict[str, Any]:
+        """从视频信息接口的data字段中提取关键信息"""
+        return {
+            'aid': video_data.get('aid'),
+            'bvid': video_data.get('bvid'),
+            'title': video_data.get('title'),
+            'desc': video_data.get('desc'),
+            'duration': video_data.get('duration'),
+            'pubdate': video_data.get('pubdate'),
+            'owner': video_data.get('owner', {}),
+            'stat': video_data.get('stat', {}),
+            'pages': video_data.get('pages', []),
+            'season': parse_ugc_season(video_data.get('ugc_season')),
+        }
     
     def get_video_info(self, video_id: str) -> Optional[Dict[str, Any]]:
         """获取视频基本信息
@@ -215,48 +825,82 @@ class BilibiliEnhancedTool:
         """
         try:
             # 判断是BV号还是AV号
-            if video_id.startswith('BV'):
-                bvid = video_id
-                aid = self.bvid2aid(bvid)
-            elif video_id.startswith('av') or video_id.isdigit():
-                aid = int(video_id.replace('av', ''))
-                bvid = self.aid2bvid(aid)
-            else:
+            ids = self.resolve_video_id(video_id)
+            if not ids:
                 print(f"无效的视频ID格式: {video_id}")
                 return None
+            bvid, aid = ids
+            
+            # 优先使用进程内缓存（包括视频不存在的负缓存）
+            hit, video_info = video_info_cache.get(bvid)
+            record_cache('video_info', hit)
+            if hit:
+                return video_info
             
             # 调用B站API获取视频信息
-            url = "https://api.bilibili.com/x/web-interface/view"
             params = {
                 'bvid': bvid
             }
             
-            data = self._make_request(url, params)
+            data = self._make_request(VIDEO_INFO_URL, params)
             if data.get('code') != 0:
                 print(f"API返回错误: {data.get('message', '未知错误')}")
+                if data.get('code') in NOT_FOUND_CODES:
+                    video_info_cache.set(bvid, None, NEGATIVE_TTL)
                 return None
             
-            video_data = data.get('data', {})
-            
             # 提取关键信息
-            info = {
-                'aid': video_data.get('aid'),
-                'bvid': video_data.get('bvid'),
-                'title': video_data.get('title'),
-                'desc': video_data.get('desc'),
-                'duration': video_data.get('duration'),
-                'pubdate': video_data.get('pubdate'),
-                'owner': video_data.get('owner', {}),
-                'stat': video_data.get('stat', {}),
-                'pages': video_data.get('pages', [])
-            }
-            
-            return info
+            video_info = self.parse_video_info(data.get('data', {}))
+            video_info_cache.set(bvid, video_info)
+            return video_info
             
         except Exception as e:
             print(f"获取视频信息失败: {e}")
             return None
     
+    def get_uploader_videos(self, mid: int, pn: int = 1, ps: int = UPLOADER_PAGE_SIZE) -> Optional[Dict[str, Any]]:
+        """获取UP主投稿列表的一页，按发布时间从新到旧排列
+        
+        Args:
+            mid: UP主的mid
+            pn: 页码，从1开始
+            ps: 每页视频数
+            
+        Returns:
+            Dict: parse_uploader_videos的结果，失败返回None
+        """
+        try:
+            data = self._make_request(UPLOADER_VIDEOS_URL, uploader_query_params(mid, pn, ps))
+            if data.get('code') != 0:
+                print(f"API返回错误: {data.get('message', '未知错误')}")
+                return None
+            return parse_uploader_videos(data.get('data') or {})
+            
+        except Exception as e:
+            print(f"获取投稿列表失败: {e}")
+            return None
+    
+    def search_videos(self, keyword: str, page: int = 1) -> Optional[Dict[str, Any]]:
+        """按关键词搜索视频，结果按综合排序
+        
+        Args:
+            keyword: 搜索关键词
+            page: 页码，从1开始，每页SEARCH_PAGE_SIZE个结果
+            
+        Returns:
+            Dict: parse_search_results的结果，失败返回None
+        """
+        try:
+            data = self._make_request(SEARCH_URL, {'search_type': 'video', 'keyword': keyword, 'page': page})
+            if data.get('code') != 0:
+                print(f"API返回错误: {data.get('message', '未知错误')}")
+                return None
+            return parse_search_results(data.get('data') or {})
+            
+        except Exception as e:
+            print(f"搜索视频失败: {e}")
+            return None
+    
     def get_video_pages(self, video_id: str) -> Optional[List[Dict[str, Any]]]:
         """获取视频分P信息
         
@@ -268,28 +912,32 @@ class BilibiliEnhancedTool:
         """
         try:
             # 判断是BV号还是AV号
-            if video_id.startswith('BV'):
-                bvid = video_id
-                aid = self.bvid2aid(bvid)
-            elif video_id.startswith('av') or video_id.isdigit():
-                aid = int(video_id.replace('av', ''))
-                bvid = self.aid2bvid(aid)
-            else:
+            ids = self.resolve_video_id(video_id)
+            if not ids:
                 print(f"无效的视频ID格式: {video_id}")
                 return None
+            bvid, aid = ids
+            
+            hit, pages = video_pages_cache.get(bvid)
+            record_cache('video_pages', hit)
+            if hit:
+                return pages
             
             # 调用B站API获取分P信息
-            url = "https://api.bilibili.com/x/player/pagelist"
             params = {
                 'bvid': bvid
             }
             
-            data = self._make_request(url, params, use_wbi=False)
+            data = self._make_request(VIDEO_PAGES_URL, params, use_wbi=False)
             if data.get('code') != 0:
                 print(f"API返回错误: {data.get('message', '未知错误')}")
+                if data.get('code') in NOT_FOUND_CODES:
+                    video_pages_cache.set(bvid, None, NEGATIVE_TTL)
                 return None
             
-            return data.get('data', [])
+            pages = data.get('data', [])
+            video_pages_cache.set(bvid, pages)
+            return pages
             
         except Exception as e:
             print(f"获取分P信息失败: {e}")
@@ -305,23 +953,36 @@ class BilibiliEnhancedTool:
         Returns:
             Dict: 播放器信息，包含字幕链接等
         """
+        ids = self.resolve_video_id(video_id)
+        if not ids:
+            print(f"无效的视频ID格式: {video_id}")
+            return None
+        bvid, aid = ids
+        
+        # 播放器信息与登录状态相关，缓存键包含凭证指纹
+        cache_key = (self.account_key, bvid, cid)
+        hit, player_info = player_info_cache.get(cache_key)
+        record_cache('player_info', hit)
+        if hit:
+            return player_info
+        
+        player_info = self._fetch_player_info(bvid, aid, cid)
+        if player_info is not None:
+            # 没有字幕的结果只做短时间缓存
+            has_subtitles = bool(player_info.get('subtitle', {}).get('subtitles'))
+            player_info_cache.set(cache_key, player_info, None if has_subtitles else NEGATIVE_TTL)
+        return player_info
+    
+    def _fetch_player_info(self, bvid: str, aid: int, cid: int) -> Optional[Dict[str, Any]]:
+        """请求播放器接口，WBI接口失败时使用普通接口"""
         try:
-            # 确保使用BV号
-            if video_id.startswith('av') or video_id.isdigit():
-                aid = int(video_id.replace('av', ''))
-                bvid = self.aid2bvid(aid)
-            else:
-                bvid = video_id
-                aid = self.bvid2aid(video_id)
-            
             # 使用播放器接口 - 使用wbi接口获取完整字幕信息
-            url = "https://api.bilibili.com/x/player/wbi/v2"
             params = {
                 'bvid': bvid,
                 'cid': cid
             }
             
-            data = self._make_request(url, params)
+            data = self._make_request(PLAYER_WBI_URL, params)
             if data.get('code') != 0:
                 print(f"WBI API返回错误: {data.get('message', '未知错误')}")
                 # 如果wbi接口失败，尝试普通接口
@@ -332,18 +993,17 @@ class BilibiliEnhancedTool:
         except Exception as e:
             print(f"获取播放器信息失败: {e}")
             # 尝试备用方法
-            return self._get_player_info_fallback(aid if 'aid' in locals() else self.bvid2aid(video_id), cid)
+            return self._get_player_info_fallback(aid, cid)
     
     def _get_player_info_fallback(self, aid: int, cid: int) -> Optional[Dict[str, Any]]:
         """备用的播放器信息获取方法"""
         try:
-            url = "https://api.bilibili.com/x/player/v2"
             params = {
                 'aid': aid,
                 'cid': cid
             }
             
-            data = self._make_request(url, params, use_wbi=False)
+            data = self._make_request(PLAYER_URL, params, use_wbi=False)
             if data.get('code') != 0:
                 print(f"备用API返回错误: {data.get('message', '未知错误')}")
                 return None
@@ -380,128 +1040,222 @@ class BilibiliEnhancedTool:
             print(f"获取字幕信息失败: {e}")
             return None
     
-    def download_subtitle(self, subtitle_url: str) -> Optional[List[Dict[str, Any]]]:
+    def iter_subtitle_cues(self, subtitle_url: str) -> Iterator[Dict[str, Any]]:
+        """流式下载字幕文件，逐条产出字幕条目
+        
+        响应按块读取并增量解析，不保留完整的响应文本和解析后的JSON对象。
+        网络错误和5xx在产出第一条字幕前、剩余时间足够时退避重试。
+        
+        Args:
+            subtitle_url: 字幕文件URL
+            
+        Yields:
+            Dict: 字幕条目（from/to/content）
+            
+        Raises:
+            Exception: 请求或解析失败
+        """
+        url = normalize_subtitle_url(subtitle_url)
+        account = self.pool.acquire()
+        # 调用方提前停止迭代时不计入账号的请求结果
+        outcome = None
+        limiter = rate_limiters.get(account.key, urllib.parse.urlsplit(url).hostname)
+        try:
+            delay = reserve_rate_limit(limiter)
+            if delay > 0:
+                time.sleep(delay)
+            
+            client = get_http_client()
+            attempt = 0
+            while True:
+                # 已经产出字幕条目后不能重试，否则调用方会收到重复的条目
+                started = False
+                try:
+                    with timed('subtitle'), client.stream(
+                        "GET", url, headers=account.headers, timeout=request_timeout(client.timeout)
+                    ) as response:
+                        try:
+                            if response.status_code == 412:
+                                outcome = OUTCOME_THROTTLED
+                                limiter.on_throttled()
+                            response.raise_for_status()
+                            for cue in iter_subtitle_body(iter_until_deadline(response.iter_bytes())):
+                                started = True
+                                yield cue
+                        finally:
+                            record_request('subtitle', response.num_bytes_downloaded)
+                    break
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    time.sleep(transient_retry_delay(e, attempt, retryable=not started))
+                    attempt += 1
+            outcome = OUTCOME_OK
+        except httpx.HTTPStatusError as e:
+            outcome = outcome or OUTCOME_ERROR
+            raise Exception(f"HTTP错误 {e.response.status_code}")
+        except httpx.RequestError as e:
+            outcome = OUTCOME_ERROR
+            raise Exception(f"请求错误: {e}")
+        except ValueError as e:
+            outcome = OUTCOME_ERROR
+            raise Exception(f"字幕解析错误: {e}")
+        finally:
+            self.pool.release(account, outcome)
+        limiter.on_success()
+    
+    def download_subtitle(self, subtitle_url: str) -> Optional[SubtitleTrack]:
         """下载字幕内容
         
         Args:
             subtitle_url: 字幕文件URL
             
         Returns:
-            List: 字幕内容列表，失败返回None
+            SubtitleTrack: 字幕轨道，失败返回None
         """
         try:
-            # 确保URL是完整的
-            if subtitle_url.startswith('//'):
-                subtitle_url = 'https:' + subtitle_url
-            
-            data = self._make_request(subtitle_url)
-            return data.get('body', [])
+            # 同一字幕文件的并发下载只请求一次
+            key = request_key(self.account_key, normalize_subtitle_url(subtitle_url))
+            return request_flight.do(key, lambda: SubtitleTrack.from_cues(self.iter_subtitle_cues(subtitle_url)))
             
         except Exception as e:
             print(f"下载字幕失败: {e}")
             return None
     
-    def get_subtitle_content(self, subtitle_url: str) -> Optional[str]:
+    def get_subtitle_content(self, subtitle_url: str, fmt: str = FORMAT_PLAIN) -> Optional[str]:
         """获取字幕内容
         
         Args:
             subtitle_url: 字幕文件URL
+            fmt: 输出格式，plain/srt/vtt/jsonl之一
             
         Returns:
             str: 字幕内容，失败返回None
         """
         try:
-            # 确保URL是完整的
-            if subtitle_url.startswith('//'):
-                subtitle_url = 'https:' + subtitle_url
-            elif subtitle_url.startswith('/'):
-                subtitle_url = 'https://api.bilibili.com' + subtitle_url
-            
-            # 使用httpx直接请求字幕文件
-            with httpx.Client(headers=HEADERS, cookies=self.cookies, timeout=10) as client:
-                response = client.get(subtitle_url)
-                response.raise_for_status()
-                content = response.text
-            
-            # 解析JSON格式的字幕
-            subtitle_data = json.loads(content)
-            
-            # 提取字幕文本
-            subtitle_text = ""
-            if 'body' in subtitle_data:
-                for item in subtitle_data['body']:
-                    if 'content' in item:
-                        subtitle_text += item['content'] + "\n"
-            
-            return subtitle_text.strip()
+            # 边下载边解析，字幕条目直接写入输出缓冲区
+            return format_subtitles(self.iter_subtitle_cues(subtitle_url), fmt)
             
         except Exception as e:
             print(f"获取字幕内容失败: {e}")
             return None
     
-    def get_video_subtitle(self, video_id: str, page: int = 1, lang: str = 'zh-CN') -> Optional[str]:
-        """获取视频字幕文本
+    def select_subtitle(self, subtitles: List[Dict[str, Any]], lang: str = 'zh-CN') -> Optional[Dict[str, Any]]:
+        """从字幕列表中选择字幕轨道
         
         Args:
-            video_id: 视频ID，支持BV号或AV号
-            page: 分P页码，从1开始
-            lang: 字幕语言，默认中文
+            subtitles: 播放器接口返回的字幕列表
+            lang: 优先选择的字幕语言
             
         Returns:
-            str: 字幕文本，失败返回None
+            Dict: 指定语言的字幕，不存在时返回第一个可用字幕，列表为空返回None
         """
-        try:
-            # 获取分P信息
-            pages = self.get_video_pages(video_id)
-            if not pages or page > len(pages):
-                print(f"无效的分P页码: {page}")
-                return None
-            
-            cid = pages[page - 1].get('cid')
+        for subtitle in subtitles:
+            if subtitle.get('lan') == lang:
+                return subtitle
+        
+        if subtitles:
+            target_subtitle = subtitles[0]
+            print(f"未找到{lang}字幕，使用{target_subtitle.get('lan_doc', '未知语言')}字幕")
+            return target_subtitle
+        
+        return None
+    
+    def extract_page_subtitle(self, bvid: str, page_info: Dict[str, Any], lang: str = 'zh-CN') -> Dict[str, Any]:
+        """获取单个分P的字幕
+        
+        Args:
+            bvid: 视频BV号
+            page_info: 视频信息中pages列表的元素
+            lang: 字幕语言
             
+        Returns:
+            Dict: 包含page、subtitle、body、text字段，含义同extract_subtitle
+        """
+        result = {
+            'page': page_info,
+            'subtitle': None,
+            'body': None,
+            'text': None
+        }
+        
+        try:
             # 获取字幕信息
-            subtitle_info = self.get_subtitle_info(video_id, cid)
+            subtitle_info = self.get_subtitle_info(bvid, page_info.get('cid'))
             if not subtitle_info:
-                return None
-            
-            # 查找指定语言的字幕
-            target_subtitle = None
-            for subtitle in subtitle_info:
-                if subtitle.get('lan') == lang:
-                    target_subtitle = subtitle
-                    break
-            
-            # 如果没找到指定语言，使用第一个可用的字幕
-            if not target_subtitle and subtitle_info:
-                target_subtitle = subtitle_info[0]
-                print(f"未找到{lang}字幕，使用{target_subtitle.get('lan_doc', '未知语言')}字幕")
-            
-            if not target_subtitle:
                 print("没有可用的字幕")
-                return None
+                return result
+            
+            target_subtitle = self.select_subtitle(subtitle_info, lang)
             
             # 下载字幕内容
             subtitle_url = target_subtitle.get('subtitle_url')
             if not subtitle_url:
                 print("字幕URL为空")
-                return None
+                return result
             
+            result['subtitle'] = target_subtitle
             subtitle_content = self.download_subtitle(subtitle_url)
-            if not subtitle_content:
-                return None
-            
-            # 拼接字幕文本
-            subtitle_text = ''
-            for item in subtitle_content:
-                content = item.get('content', '').strip()
-                if content:
-                    subtitle_text += content + '\n'
-            
-            return subtitle_text.strip()
+            if subtitle_content:
+                result['body'] = subtitle_content
+                result['text'] = self.join_subtitle_text(result['body'])
+            return result
             
         except Exception as e:
             print(f"获取字幕文本失败: {e}")
-            return None    
+            return result
+    
+    def extract_subtitle(self, video_id: str, page: int = 1, lang: str = 'zh-CN') -> Optional[Dict[str, Any]]:
+        """单次遍历获取视频信息和字幕
+        
+        直接使用视频信息接口返回的pages/cid，播放器信息只请求一次，
+        整个流程为 视频信息 -> 播放器信息 -> 字幕文件 三次请求。
+        
+        Args:
+            video_id: 视频ID，支持BV号或AV号
+            page: 分P页码，从1开始
+            lang: 字幕语言，默认中文
+            
+        Returns:
+            Dict: 包含以下字段，获取视频信息失败返回None
+                - video: 视频信息（同get_video_info）
+                - page: 所选分P信息，页码无效时为None
+                - subtitle: 实际使用的字幕轨道信息，没有字幕时为None
+                - body: 字幕轨道（SubtitleTrack，迭代得到from/to/content条目），没有字幕时为None
+                - text: 字幕文本，没有字幕或下载失败时为None
+        """
+        video_info = self.get_video_info(video_id)
+        if not video_info:
+            return None
+        
+        pages = video_info.get('pages') or []
+        if page < 1 or page > len(pages):
+            print(f"无效的分P页码: {page}")
+            return {'video': video_info, 'page': None, 'subtitle': None, 'body': None, 'text': None}
+        
+        result = self.extract_page_subtitle(video_info.get('bvid') or video_id, pages[page - 1], lang)
+        return {'video': video_info, **result}
+    
+    def join_subtitle_text(self, subtitle_content: Iterable[Dict[str, Any]]) -> str:
+        """拼接字幕文本，每条字幕一行"""
+        return format_subtitles(subtitle_content, FORMAT_PLAIN)
+    
+    def get_video_subtitle(self, video_id: str, page: int = 1, lang: str = 'zh-CN',
+                           fmt: str = FORMAT_PLAIN) -> Optional[str]:
+        """获取视频字幕文本
+        
+        Args:
+            video_id: 视频ID，支持BV号或AV号
+            page: 分P页码，从1开始
+            lang: 字幕语言，默认中文
+            fmt: 输出格式，plain/srt/vtt/jsonl之一
+            
+        Returns:
+            str: 字幕文本，失败返回None
+        """
+        result = self.extract_subtitle(video_id, page, lang)
+        if not result or not result['body']:
+            return None
+        return format_subtitles(result['body'], fmt)
+    
     def get_credentials_status(self) -> Dict[str, Any]:
         """获取凭证状态信息"""
         return {
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+B站HTTP传输层
+
+提供进程内共享的httpx客户端，复用keep-alive连接池，
+避免每次请求都重新建立到api.bilibili.com和字幕CDN的TCP+TLS连接。
+工具、WBI密钥获取和凭证验证共用同一个连接池；
+异步客户端按事件循环共享，同一事件循环中的调用复用连接。
+"""
+
+import asyncio
+import atexit
+import importlib.util
+import threading
+import weakref
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Optional, Dict, List
+
+import httpx
+
+
+# 默认连接池和超时配置
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE_CONNECTIONS = 10
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+
+_config = {
+    'timeout': DEFAULT_TIMEOUT,
+    'connect_timeout': DEFAULT_CONNECT_TIMEOUT,
+    'max_connections': DEFAULT_MAX_CONNECTIONS,
+    'max_keepalive_connections': DEFAULT_MAX_KEEPALIVE_CONNECTIONS,
+    'keepalive_expiry': DEFAULT_KEEPALIVE_EXPIRY,
+    'http2': False,
+    'transport': None,
+}
+
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+# 重新配置前创建的客户端，可能仍被其他线程使用，进程退出时再关闭
+_retired_clients: List[httpx.Client] = []
+# 每个事件循环一个长期存在的异步客户端，连接池绑定在创建它的事件循环上
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]' = weakref.WeakKeyDictionary()
+
+
+def http2_available() -> bool:
+    """HTTP/2需要额外安装h2（pip install httpx[http2]）"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def configure_http_client(**options) -> None:
+    """修改共享客户端配置
+
+    支持的配置项: timeout, connect_timeout, max_connections,
+    max_keepalive_connections, keepalive_expiry, http2, transport。
+    应在插件启动时调用。下次使用时按新配置创建客户端；已创建的客户端可能仍被其他线程使用，
+    不会立即关闭，而是在进程退出或close_http_client时关闭，异步客户端在不再被引用后回收。
+
+    Raises:
+        ValueError: 如果包含未知的配置项
+    """
+    global _client
+    unknown = set(options) - set(_config)
+    if unknown:
+        raise ValueError(f"未知的HTTP配置项: {', '.join(sorted(unknown))}")
+
+    with _lock:
+        _config.update(options)
+        if _client is not None:
+            _retired_clients.append(_client)
+            _client = None
+        _async_clients.clear()
+
+
+def build_limits() -> httpx.Limits:
+    """按当前配置构造连接池限制"""
+    return httpx.Limits(
+        max_connections=_config['max_connections'],
+        max_keepalive_connections=_config['max_keepalive_connections'],
+        keepalive_expiry=_config['keepalive_expiry'],
+    )
+
+
+def build_timeout() -> httpx.Timeout:
+    """按当前配置构造超时设置"""
+    return httpx.Timeout(_config['timeout'], connect=_config['connect_timeout'])
+
+
+def use_http2() -> bool:
+    """是否启用HTTP/2，未安装h2时自动回退到HTTP/1.1"""
+    return bool(_config['http2']) and http2_available()
+
+
+def get_transport():
+    """自定义传输层（测试或基准测试时注入），默认为None"""
+    return _config['transport']
+
+
+def ignore_cookies_jar() -> CookieJar:
+    """不保存任何响应Cookie的CookieJar
+
+    共享客户端会被不同凭证复用，不能让某个账号的Set-Cookie
+    泄露到其他账号的请求中，凭证统一通过Cookie请求头传递
+    """
+    return CookieJar(policy=DefaultCookiePolicy(allowed_domains=[]))
+
+
+def get_http_client() -> httpx.Client:
+    """获取进程内共享的HTTP客户端（线程安全，惰性创建）"""
+    global _client
+    client = _client
+    if client is not None:
+        return client
+
+    with _lock:
+        if _client is None:
+            _client = httpx.Client(
+                limits=build_limits(),
+                timeout=build_timeout(),
+                http2=use_http2(),
+                cookies=ignore_cookies_jar(),
+                transport=get_transport(),
+            )
+        return _client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """获取当前事件循环共享的异步HTTP客户端（惰性创建）
+
+    同一事件循环中的所有调用复用同一个连接池，不会每次调用都重新建立TCP+TLS连接。
+    必须在事件循环中调用；客户端随事件循环一直保留，由close_async_http_client关闭
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=build_limits(),
+                timeout=build_timeout(),
+                http2=use_http2(),
+                cookies=ignore_cookies_jar(),
+                transport=get_transport(),
+            )
+            _async_clients[loop] = client
+        return client
+
+
+async def close_async_http_client() -> None:
+    """关闭当前事件循环的异步客户端，临时创建的事件循环应在关闭前调用"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_clients.pop(loop, None)
+    if client is not None:
+        await client.aclose()
+
+
+def close_http_client() -> None:
+    """关闭共享客户端（包括重新配置前创建的客户端）并释放连接池"""
+    global _client
+    with _lock:
+        clients = list(_retired_clients)
+        if _client is not None:
+            clients.append(_client)
+        _retired_clients.clear()
+        _client = None
+    for client in clients:
+        client.close()
+
+
+def _close_retired_clients() -> None:
+    """进程退出时关闭重新配置前创建的客户端"""
+    with _lock:
+        clients = list(_retired_clients)
+        _retired_clients.clear()
+    for client in clients:
+        client.close()
+
+
+atexit.register(_close_retired_clients)
+
+
+def build_cookie_header(cookies: Optional[Dict[str, str]]) -> Dict[str, str]:
+    """将凭证字典转换为Cookie请求头"""
+    if not cookies:
+        return {}
+    return {'Cookie': '; '.join(f"{key}={value}" for key, value in cookies.items())}
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多账号凭证池
+
+配置多组B站凭证时，每个上游请求从池中选择一个账号发送（轮询或选择进行中请求最少的账号），
+每个账号有独立的令牌桶，总吞吐量随账号数增加。
+账号登录失效（-101）或被风控拦截（-412等）时暂停使用一段时间，请求改用其他账号，
+并按账号记录请求数、失败数等健康状态。只有一个账号时行为与不使用凭证池相同。
+"""
+
+import threading
+import time
+from hashlib import sha256
+from typing import Any, Dict, List, Optional
+
+from rate_limiter import is_throttled
+
+
+# 账号选择策略
+STRATEGY_ROUND_ROBIN = 'round_robin'
+STRATEGY_LEAST_LOADED = 'least_loaded'
+POOL_STRATEGIES = (STRATEGY_LEAST_LOADED, STRATEGY_ROUND_ROBIN)
+
+# 表示登录失效的业务错误码
+LOGGED_OUT_CODES = (-101,)
+
+# 账号暂停使用的时长（秒）
+LOGGED_OUT_BENCH = 600
+THROTTLED_BENCH = 30
+
+# 请求结果
+OUTCOME_OK = 'ok'
+OUTCOME_THROTTLED = 'throttled'
+OUTCOME_LOGGED_OUT = 'logged_out'
+OUTCOME_ERROR = 'error'
+
+
+def classify_response(status_code: int, data: Any) -> str:
+    """根据响应判断账号的请求结果"""
+    if is_throttled(status_code, data):
+        return OUTCOME_THROTTLED
+    if isinstance(data, dict) and data.get('code') in LOGGED_OUT_CODES:
+        return OUTCOME_LOGGED_OUT
+    return OUTCOME_OK
+
+
+class PooledAccount:
+    """凭证池中的一个账号及其健康状态"""
+
+    def __init__(self, key: str, headers: Dict[str, str]):
+        """
+        Args:
+            key: 凭证指纹，用于限流、缓存键和日志，不包含原始Cookie
+            headers: 携带该账号Cookie的请求头
+        """
+        self.key = key
+        self.headers = headers
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.throttled = 0
+        self.logged_out = 0
+        self.benched_until = 0.0
+        self.last_error = ''
+
+    def available(self, now: float) -> bool:
+        """账号当前是否可用"""
+        return now >= self.benched_until
+
+    def health(self, now: float) -> Dict[str, Any]:
+        """健康状态摘要"""
+        return {
+            'account': self.key,
+            'healthy': self.available(now),
+            'benched_for': round(max(0.0, self.benched_until - now), 1),
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+            'throttled': self.throttled,
+            'logged_out': self.logged_out,
+            'last_error': self.last_error,
+        }
+
+
+class CredentialPool:
+    """线程安全的账号池
+
+    acquire()选择一个账号并计入进行中请求，请求结束后必须调用release()报告结果。
+    所有账号都暂停时仍返回最早恢复的账号，调用方照常请求（由令牌桶和退避控制速率）。
+    """
+
+    def __init__(self, accounts: List[PooledAccount], strategy: str = STRATEGY_LEAST_LOADED):
+        if not accounts:
+            raise ValueError("凭证池至少需要一个账号")
+        if strategy not in POOL_STRATEGIES:
+            raise ValueError(f"不支持的账号选择策略: {strategy}，可选: {', '.join(POOL_STRATEGIES)}")
+        self.accounts = accounts
+        self.strategy = strategy
+        self._cursor = 0
+        self._lock = threading.Lock()
+        if len(accounts) == 1:
+            # 单账号时沿用账号指纹，缓存键和令牌桶与不使用凭证池时一致
+            self.key = accounts[0].key
+        else:
+            self.key = sha256('\x00'.join(account.key for account in accounts).encode()).hexdigest()[:16]
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def acquire(self) -> PooledAccount:
+        """选择一个账号"""
+        with self._lock:
+            now = time.monotonic()
+            count = len(self.accounts)
+            # 从游标位置开始排列，相同负载时依次轮换
+            ordered = [self.accounts[(self._cursor + offset) % count] for offset in range(count)]
+            candidates = [account for account in ordered if account.available(now)]
+            if not candidates:
+                account = min(ordered, key=lambda item: item.benched_until)
+            elif self.strategy == STRATEGY_LEAST_LOADED:
+                account = min(candidates, key=lambda item: item.in_flight)
+            else:
+                account = candidates[0]
+            self._cursor = (self.accounts.index(account) + 1) % count
+            account.in_flight += 1
+            account.requests += 1
+            return account
+
+    def release(self, account: PooledAccount, outcome: Optional[str] = OUTCOME_OK, error: str = '') -> None:
+        """报告请求结果
+
+        Args:
+            account: acquire()返回的账号
+            outcome: 请求结果，登录失效和被拦截时暂停使用该账号；None表示不计入结果（如签名重试）
+            error: 失败原因，记录在健康状态中
+        """
+        with self._lock:
+            account.in_flight = max(0, account.in_flight - 1)
+            if outcome is None or outcome == OUTCOME_OK:
+                return
+            account.failures += 1
+            account.last_error = error or outcome
+            now = time.monotonic()
+            if outcome == OUTCOME_LOGGED_OUT:
+                account.logged_out += 1
+                bench = LOGGED_OUT_BENCH
+            elif outcome == OUTCOME_THROTTLED:
+                account.throttled += 1
+                bench = THROTTLED_BENCH
+            else:
+                return
+            if len(self.accounts) > 1:
+                account.benched_until = max(account.benched_until, now + bench)
+                print(f"账号{account.key}暂停使用{bench}秒: {account.last_error}")
+
+    def has_available(self) -> bool:
+        """是否还有未暂停的账号"""
+        with self._lock:
+            now = time.monotonic()
+            return any(account.available(now) for account in self.accounts)
+
+    def health(self) -> List[Dict[str, Any]]:
+        """所有账号的健康状态"""
+        with self._lock:
+            now = time.monotonic()
+            return [account.health(now) for account in self.accounts]
+
+
+class CredentialPoolRegistry:
+    """按账号组合管理凭证池，同一组账号的健康状态在多次调用之间共享"""
+
+    def __init__(self):
+        self._pools: Dict[tuple, CredentialPool] = {}
+        self._lock = threading.Lock()
+
+    def get(self, accounts: List[PooledAccount], strategy: str = STRATEGY_LEAST_LOADED) -> CredentialPool:
+        """获取账号组合对应的凭证池，重复的账号只保留一个"""
+        unique: Dict[str, PooledAccount] = {}
+        for account in accounts:
+            unique.setdefault(account.key, account)
+        key = (tuple(unique), strategy)
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = CredentialPool(list(unique.values()), strategy)
+                self._pools[key] = pool
+            return pool
+
+
+# 进程内共享的凭证池
+credential_pools = CredentialPoolRegistry()
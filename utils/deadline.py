@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+调用截止时间
+
+Dify按MAX_REQUEST_TIMEOUT限制一次工具调用的总时长，超时后整个调用失败、已获取的结果也会丢失。
+工具调用开始时设置截止时间，保存在contextvars中并传递到同步和异步请求：
+每个上游请求的超时不超过剩余时间，幂等的GET请求遇到网络错误或5xx时只在剩余时间足够时退避重试，
+时间用完后请求立即失败，工具返回已经获取到的部分结果（例如只有视频信息没有字幕）。
+"""
+
+import contextvars
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, Optional
+
+import httpx
+
+
+# 插件的请求超时（秒），与main.py中DifyPluginEnv的MAX_REQUEST_TIMEOUT一致
+MAX_REQUEST_TIMEOUT = float(os.environ.get('MAX_REQUEST_TIMEOUT') or 120)
+# 为整理和返回结果预留的时间（秒）
+RESPONSE_RESERVE = 10.0
+# 工具调用默认的时间预算（秒）
+DEFAULT_BUDGET = MAX_REQUEST_TIMEOUT - RESPONSE_RESERVE
+
+# 网络错误和5xx的最大重试次数
+MAX_TRANSIENT_RETRIES = 2
+# 重试退避的基础时间和上限（秒）
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_CAP = 4.0
+# 剩余时间少于该值时不再发起重试（秒）
+MIN_ATTEMPT_TIME = 1.0
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar('bilibili_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """调用的时间预算已用完"""
+
+    def __init__(self, message: str = "调用时间预算已用完"):
+        super().__init__(message)
+
+
+@contextmanager
+def deadline_scope(budget: Optional[float] = DEFAULT_BUDGET) -> Iterator[None]:
+    """在代码块内设置截止时间，嵌套使用时取较早的截止时间
+
+    Args:
+        budget: 时间预算（秒），None表示不限制
+    """
+    current = _deadline.get()
+    deadline = current
+    if budget is not None:
+        expires_at = time.monotonic() + budget
+        deadline = expires_at if current is None else min(current, expires_at)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        try:
+            _deadline.reset(token)
+        except ValueError:
+            # 生成器中使用时，未迭代完的生成器可能在其他上下文中被关闭
+            pass
+
+
+def remaining_time() -> Optional[float]:
+    """剩余时间（秒），没有截止时间时返回None"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def deadline_exceeded() -> bool:
+    """截止时间是否已过"""
+    remaining = remaining_time()
+    return remaining is not None and remaining <= 0
+
+
+def check_deadline() -> None:
+    """截止时间已过时抛出DeadlineExceeded"""
+    if deadline_exceeded():
+        raise DeadlineExceeded()
+
+
+def request_timeout(timeout: httpx.Timeout) -> httpx.Timeout:
+    """把请求超时限制在剩余时间内
+
+    Args:
+        timeout: 客户端默认的超时设置
+
+    Raises:
+        DeadlineExceeded: 截止时间已过
+    """
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    if remaining <= 0:
+        raise DeadlineExceeded()
+
+    def clip(value: Optional[float]) -> float:
+        return remaining if value is None else min(value, remaining)
+
+    return httpx.Timeout(
+        connect=clip(timeout.connect),
+        read=clip(timeout.read),
+        write=clip(timeout.write),
+        pool=clip(timeout.pool),
+    )
+
+
+def ensure_time_for(delay: float) -> None:
+    """等待delay秒后仍有时间发起请求，否则抛出DeadlineExceeded（用于限流等待和退避前）"""
+    remaining = remaining_time()
+    if remaining is not None and delay + MIN_ATTEMPT_TIME > remaining:
+        raise DeadlineExceeded()
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """网络错误、超时和5xx响应可以重试"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+def retry_delay(attempt: int) -> Optional[float]:
+    """第attempt次重试前的等待时间，超过重试次数或剩余时间不足时返回None"""
+    if attempt >= MAX_TRANSIENT_RETRIES:
+        return None
+    delay = random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * (2 ** attempt)))
+    remaining = remaining_time()
+    if remaining is not None and delay + MIN_ATTEMPT_TIME > remaining:
+        return None
+    return delay
+
+
+def iter_until_deadline(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """逐块读取响应，截止时间已过时停止并抛出DeadlineExceeded"""
+    for chunk in chunks:
+        check_deadline()
+        yield chunk
+
+
+async def aiter_until_deadline(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """iter_until_deadline的异步版本"""
+    async for chunk in chunks:
+        check_deadline()
+        yield chunk
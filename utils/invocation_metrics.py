@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+调用级性能统计
+
+每次工具调用记录各阶段耗时、上游请求数和传输字节数、缓存命中情况和重试次数，
+调用结束时输出一条结构化日志，并交给注册的导出器（例如汇总为Prometheus格式的计数器）。
+
+当前调用的统计对象保存在contextvars中，同步代码、asyncio任务和to_thread线程都能访问，
+没有进行中的调用时所有记录函数都是空操作。
+"""
+
+import contextvars
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+
+MetricsRecord = Dict[str, Any]
+
+_current: contextvars.ContextVar[Optional['InvocationMetrics']] = contextvars.ContextVar(
+    'bilibili_invocation_metrics', default=None
+)
+
+_exporters: List[Callable[[MetricsRecord], None]] = []
+_exporters_lock = threading.Lock()
+
+
+class InvocationMetrics:
+    """单次工具调用的统计
+
+    阶段耗时按名称累加，并发执行的阶段（如多个分P同时下载字幕）会分别计入，
+    因此各阶段耗时之和可能大于调用总耗时。
+    """
+
+    def __init__(self, tool: str, **labels):
+        self.tool = tool
+        self.labels = labels
+        self.status = 'ok'
+        self.error = ''
+        self._started_at = time.perf_counter()
+        self._duration: Optional[float] = None
+        self._lock = threading.Lock()
+        self.stages: Dict[str, float] = defaultdict(float)
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.bytes: Dict[str, int] = defaultdict(int)
+        self.cache_hits: Dict[str, int] = defaultdict(int)
+        self.cache_misses: Dict[str, int] = defaultdict(int)
+        self.retries: Dict[str, int] = defaultdict(int)
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        """累加阶段耗时（秒）"""
+        with self._lock:
+            self.stages[stage] += seconds
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """统计代码块的耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def count_request(self, endpoint: str, nbytes: int = 0) -> None:
+        """记录一次上游请求及其响应字节数"""
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.bytes[endpoint] += nbytes
+
+    def count_cache(self, cache: str, hit: bool) -> None:
+        """记录一次缓存查询"""
+        with self._lock:
+            if hit:
+                self.cache_hits[cache] += 1
+            else:
+                self.cache_misses[cache] += 1
+
+    def count_retry(self, reason: str) -> None:
+        """记录一次重试（throttle: 被风控拦截，wbi_sign: 签名被拒绝）"""
+        with self._lock:
+            self.retries[reason] += 1
+
+    def fail(self, error: str) -> None:
+        """标记调用失败"""
+        self.status = 'error'
+        self.error = error
+
+    def finish(self) -> None:
+        """结束计时"""
+        if self._duration is None:
+            self._duration = time.perf_counter() - self._started_at
+
+    @property
+    def duration(self) -> float:
+        """调用总耗时（秒），未结束时为已经过的时间"""
+        if self._duration is not None:
+            return self._duration
+        return time.perf_counter() - self._started_at
+
+    def to_record(self) -> MetricsRecord:
+        """转换为可序列化为JSON的记录"""
+        with self._lock:
+            return {
+                'tool': self.tool,
+                **self.labels,
+                'status': self.status,
+                'error': self.error,
+                'duration_ms': round(self.duration * 1000, 2),
+                'stages_ms': {name: round(seconds * 1000, 2) for name, seconds in sorted(self.stages.items())},
+                'requests': sum(self.requests.values()),
+                'requests_by_endpoint': dict(sorted(self.requests.items())),
+                'bytes': sum(self.bytes.values()),
+                'cache_hits': dict(sorted(self.cache_hits.items())),
+                'cache_misses': dict(sorted(self.cache_misses.items())),
+                'retries': dict(sorted(self.retries.items())),
+            }
+
+
+def current_metrics() -> Optional[InvocationMetrics]:
+    """当前调用的统计对象，不在调用中时返回None"""
+    return _current.get()
+
+
+@contextmanager
+def track_invocation(tool: str, logger=None, **labels) -> Iterator[InvocationMetrics]:
+    """统计一次工具调用
+
+    结束时调用所有导出器，指定logger时输出一条"Invocation metrics: {...}"日志
+
+    Args:
+        tool: 工具名称
+        logger: 输出结构化日志的logger
+        **labels: 附加到记录中的字段（如视频ID）
+    """
+    metrics = InvocationMetrics(tool, **labels)
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    except BaseException as e:
+        if metrics.status == 'ok':
+            metrics.fail(type(e).__name__)
+        raise
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:
+            # 生成器中使用时，未迭代完的生成器可能在其他上下文中被关闭
+            pass
+        metrics.finish()
+        record = metrics.to_record()
+        if logger is not None:
+            logger.info(f"Invocation metrics: {json.dumps(record, ensure_ascii=False)}")
+        export(record)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """统计当前调用中代码块的耗时，不在调用中时不做任何事"""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    with metrics.stage(stage):
+        yield
+
+
+def record_time(stage: str, seconds: float) -> None:
+    """累加当前调用的阶段耗时"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_time(stage, seconds)
+
+
+def record_request(endpoint: str, nbytes: int = 0) -> None:
+    """记录当前调用的一次上游请求"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count_request(endpoint, nbytes)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """记录当前调用的一次缓存查询"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count_cache(cache, hit)
+
+
+def record_retry(reason: str) -> None:
+    """记录当前调用的一次重试"""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count_retry(reason)
+
+
+def register_exporter(exporter: Callable[[MetricsRecord], None]) -> None:
+    """注册导出器，每次调用结束时以统计记录为参数调用"""
+    with _exporters_lock:
+        _exporters.append(exporter)
+
+
+def unregister_exporter(exporter: Callable[[MetricsRecord], None]) -> None:
+    """取消注册导出器"""
+    with _exporters_lock:
+        if exporter in _exporters:
+            _exporters.remove(exporter)
+
+
+def export(record: MetricsRecord) -> None:
+    """将统计记录交给所有导出器，导出器的异常不影响工具调用"""
+    with _exporters_lock:
+        exporters = list(_exporters)
+    for exporter in exporters:
+        try:
+            exporter(record)
+        except Exception as e:
+            print(f"导出调用统计失败: {e}")
+
+
+class PrometheusCollector:
+    """将调用统计汇总为Prometheus格式的计数器
+
+    示例::
+
+        collector = PrometheusCollector()
+        register_exporter(collector)
+        ...
+        text = collector.render()  # 由本地采集端点返回
+    """
+
+    def __init__(self, prefix: str = 'bilibili_subtitle'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: Dict[tuple, float] = defaultdict(float)
+
+    def _add(self, name: str, value: float, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] += value
+
+    def __call__(self, record: MetricsRecord) -> None:
+        tool = record['tool']
+        with self._lock:
+            self._add('invocations_total', 1, tool=tool, status=record['status'])
+            self._add('invocation_seconds_total', record['duration_ms'] / 1000, tool=tool)
+            for stage, ms in record['stages_ms'].items():
+                self._add('stage_seconds_total', ms / 1000, tool=tool, stage=stage)
+            for endpoint, count in record['requests_by_endpoint'].items():
+                self._add('upstream_requests_total', count, endpoint=endpoint)
+            self._add('upstream_bytes_total', record['bytes'], tool=tool)
+            for cache, count in record['cache_hits'].items():
+                self._add('cache_requests_total', count, cache=cache, result='hit')
+            for cache, count in record['cache_misses'].items():
+                self._add('cache_requests_total', count, cache=cache, result='miss')
+            for reason, count in record['retries'].items():
+                self._add('retries_total', count, reason=reason)
+
+    def render(self) -> str:
+        """以Prometheus文本格式输出所有计数器"""
+        with self._lock:
+            items = sorted(self._counters.items())
+        lines = []
+        declared = set()
+        for (name, labels), value in items:
+            metric = f"{self.prefix}_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            label_text = ','.join(f'{key}="{str(val)}"' for key, val in labels)
+            lines.append(f"{metric}{{{label_text}}} {value:g}")
+        return '\n'.join(lines) + '\n'
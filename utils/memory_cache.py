@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内LRU/TTL缓存
+
+用于缓存视频信息、分P列表和播放器信息等短时间内不变的接口结果，
+同时支持负缓存（视频不存在、没有字幕等），重复查询无需访问网络。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """线程安全的LRU缓存，每个条目有独立的过期时间
+
+    缓存值可以是None（用于负缓存），因此get返回(是否命中, 值)。
+    缓存的对象会被多个调用方共享，调用方不应修改。
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        """
+        初始化缓存
+
+        Args:
+            maxsize: 最大条目数，超出时淘汰最久未使用的条目
+            ttl: 默认过期时间（秒）
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        """读取缓存
+
+        Returns:
+            tuple: (是否命中, 缓存值)，未命中或已过期时为(False, None)
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return False, None
+            self._data.move_to_end(key)
+            return True, value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存
+
+        Args:
+            key: 缓存键
+            value: 缓存值，None表示负缓存
+            ttl: 过期时间（秒），默认使用缓存的ttl
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        """删除缓存条目"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+# 正常结果的缓存时间（秒）
+METADATA_TTL = 300
+# 负结果（视频不存在、没有字幕）的缓存时间（秒）
+NEGATIVE_TTL = 60
+
+# 凭证校验结果的缓存时间（秒）
+CREDENTIAL_TTL = 600
+
+# 表示视频不存在或不可访问的业务错误码，这类结果会被负缓存
+NOT_FOUND_CODES = (-404, 62002, 62004, 62012)
+
+# 进程内共享的元数据缓存
+# 视频信息和分P列表以bvid为键，播放器信息与登录状态相关，以(凭证指纹, bvid, cid)为键
+video_info_cache = TTLCache(maxsize=1024, ttl=METADATA_TTL)
+video_pages_cache = TTLCache(maxsize=1024, ttl=METADATA_TTL)
+player_info_cache = TTLCache(maxsize=2048, ttl=METADATA_TTL)
+# 凭证校验结果以凭证指纹为键，值为失败原因，空字符串表示校验通过
+credential_cache = TTLCache(maxsize=256, ttl=CREDENTIAL_TTL)
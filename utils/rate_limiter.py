@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+客户端限流
+
+每个(账号, 域名)使用一个令牌桶控制请求速率，遇到B站风控（-412/-352或HTTP 412）时
+按AIMD方式自适应降速：被拦截时速率减半，请求成功时缓慢回升。
+被拦截的请求按带随机抖动的指数退避重试，使持续吞吐量稳定在允许的上限附近。
+"""
+
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+# 默认速率（请求/秒）和突发容量
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10.0
+# 自适应调整的速率范围
+DEFAULT_MIN_RATE = 0.5
+DEFAULT_MAX_RATE = 10.0
+# 每次成功请求增加的速率（加性增）
+RATE_INCREASE = 0.05
+# 被拦截时的速率乘数（乘性减）
+RATE_DECREASE_FACTOR = 0.5
+# 两次降速的最小间隔（秒），同一波拦截只降速一次
+DECREASE_COOLDOWN = 1.0
+
+# 表示请求被风控拦截的业务错误码
+THROTTLE_CODES = (-412, -352)
+# 被拦截后的最大重试次数
+MAX_THROTTLE_RETRIES = 3
+# 退避基础时间和上限（秒）
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+
+class TokenBucket:
+    """支持AIMD自适应速率的令牌桶（线程安全）
+
+    reserve()立即预留一个令牌并返回需要等待的时间，由调用方自行sleep，
+    因此同一个令牌桶可以同时服务同步和异步调用方。
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: float = DEFAULT_BURST,
+                 min_rate: float = DEFAULT_MIN_RATE, max_rate: float = DEFAULT_MAX_RATE):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def reserve(self) -> float:
+        """预留一个令牌
+
+        Returns:
+            float: 发送请求前需要等待的秒数，0表示可以立即发送
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def on_success(self) -> None:
+        """请求成功，速率加性增长"""
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + RATE_INCREASE)
+
+    def on_throttled(self) -> None:
+        """请求被拦截，速率乘性下降并清空突发容量"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens = min(self._tokens, 0.0)
+            if now - self._last_decrease >= DECREASE_COOLDOWN:
+                self.rate = max(self.min_rate, self.rate * RATE_DECREASE_FACTOR)
+                self._last_decrease = now
+
+
+class RateLimiterRegistry:
+    """按(账号, 域名)管理令牌桶"""
+
+    def __init__(self, **defaults):
+        self._defaults = defaults
+        self._buckets: Dict[tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, **defaults) -> None:
+        """修改新建令牌桶的参数（rate、burst、min_rate、max_rate），已有令牌桶被重置"""
+        with self._lock:
+            self._defaults = defaults
+            self._buckets.clear()
+
+    def get(self, account_key: str, host: Optional[str]) -> TokenBucket:
+        """获取账号在指定域名上的令牌桶"""
+        key = (account_key, host or '')
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(**self._defaults)
+                self._buckets[key] = bucket
+            return bucket
+
+
+def is_throttled(status_code: int, data: Any) -> bool:
+    """判断响应是否表示被风控拦截"""
+    if status_code == 412:
+        return True
+    return isinstance(data, dict) and data.get('code') in THROTTLE_CODES
+
+
+def backoff_delay(attempt: int) -> float:
+    """第attempt次重试前的等待时间（指数退避，full jitter）"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+# 进程内共享的限流器
+rate_limiters = RateLimiterRegistry()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发请求合并（single-flight）
+
+多个调用方同时请求同一个键时只执行一次上游请求，其余调用方等待并共享结果。
+同步调用和异步调用共用同一张进行中请求表，不同线程、不同事件循环之间也能合并。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """进行中请求表
+
+    领头的调用方执行请求并把结果写入共享的Future，
+    同步跟随者阻塞等待Future，异步跟随者通过asyncio.wrap_future等待。
+    结果对象会被多个调用方共享，调用方不应修改。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        """加入进行中的请求，返回(共享Future, 是否为领头调用方)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            return future, True
+
+    def _finish(self, key: Hashable) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """同步执行，相同键的并发调用共享一次fn()的结果或异常"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key)
+            future.set_exception(e)
+            raise
+        self._finish(key)
+        future.set_result(result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """异步执行，相同键的并发调用共享一次fn()的结果或异常
+
+        领头调用方被取消时，跟随者会重新发起请求而不是收到取消异常
+        """
+        while True:
+            future, leader = self._join(key)
+            if not leader:
+                try:
+                    return await asyncio.wrap_future(future)
+                except asyncio.CancelledError:
+                    if future.cancelled():
+                        continue
+                    raise
+
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self._finish(key)
+                future.cancel()
+                raise
+            except BaseException as e:
+                self._finish(key)
+                future.set_exception(e)
+                raise
+            self._finish(key)
+            future.set_result(result)
+            return result
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def request_key(account_key: str, url: str, params: Any = None) -> tuple:
+    """构造请求合并键，忽略WBI签名中随时间变化的wts和w_rid"""
+    items = ()
+    if params:
+        items = tuple(sorted((str(k), str(v)) for k, v in params.items() if k not in ('wts', 'w_rid')))
+    return account_key, url, items
+
+
+# 进程内共享的上游请求合并表
+request_flight = SingleFlight()
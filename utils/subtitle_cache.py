@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕持久化缓存
+
+B站字幕发布后基本不会变化，将解析后的字幕内容和视频信息保存在本地SQLite中，
+命中缓存时无需任何网络请求。按访问时间进行LRU淘汰，支持过期时间，
+所有写入都在事务中完成，进程崩溃不会留下半条记录。
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Optional, Dict, Iterable, Any
+
+from subtitle_track import SubtitleTrack
+
+
+# 缓存目录，可通过环境变量修改
+CACHE_DIR_ENV = "BILIBILI_SUBTITLE_CACHE_DIR"
+# 设置为0/false/off时禁用持久化缓存
+CACHE_ENABLED_ENV = "BILIBILI_SUBTITLE_CACHE"
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "bilibili_subtitle_plugin")
+DEFAULT_CACHE_FILE = "subtitle_cache.sqlite3"
+
+# 缓存总大小上限（字节）
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+# 字幕内容过期时间（秒）
+DEFAULT_SUBTITLE_TTL = 30 * 24 * 60 * 60
+# 视频信息过期时间（秒），标题、简介等可能被修改
+DEFAULT_VIDEO_TTL = 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    bvid TEXT PRIMARY KEY,
+    info TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS subtitles (
+    bvid TEXT NOT NULL,
+    cid INTEGER NOT NULL,
+    lan TEXT NOT NULL,
+    subtitle_id TEXT NOT NULL,
+    subtitle TEXT NOT NULL,
+    body TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (bvid, cid, lan, subtitle_id)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    mid INTEGER PRIMARY KEY,
+    pubdate INTEGER NOT NULL,
+    aid INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_videos_accessed ON videos (accessed_at);
+CREATE INDEX IF NOT EXISTS idx_subtitles_accessed ON subtitles (accessed_at);
+"""
+
+
+class SubtitleCache:
+    """基于SQLite的字幕持久化缓存（线程安全）
+
+    - videos: 以bvid为键保存视频信息
+    - subtitles: 以(bvid, cid, lan, subtitle_id)为键保存字幕轨道信息和解析后的字幕内容，
+      字幕内容以SubtitleTrack的二进制格式保存，旧版本写入的JSON文本仍可读取
+    - watermarks: 以UP主mid为键保存增量同步的进度（已处理的最新投稿的发布时间和aid），不参与淘汰
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = DEFAULT_MAX_BYTES,
+                 subtitle_ttl: float = DEFAULT_SUBTITLE_TTL, video_ttl: float = DEFAULT_VIDEO_TTL):
+        """
+        初始化缓存
+
+        Args:
+            path: SQLite文件路径，默认为缓存目录下的subtitle_cache.sqlite3
+            max_bytes: 缓存总大小上限，超出时淘汰最久未访问的记录
+            subtitle_ttl: 字幕内容过期时间（秒）
+            video_ttl: 视频信息过期时间（秒）
+        """
+        if path is None:
+            cache_dir = os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+            os.makedirs(cache_dir, exist_ok=True)
+            path = os.path.join(cache_dir, DEFAULT_CACHE_FILE)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.subtitle_ttl = subtitle_ttl
+        self.video_ttl = video_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def get_video(self, bvid: str) -> Optional[Dict[str, Any]]:
+        """读取视频信息，不存在或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info, created_at FROM videos WHERE bvid = ?", (bvid,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.video_ttl:
+                self._conn.execute("DELETE FROM videos WHERE bvid = ?", (bvid,))
+                return None
+            self._conn.execute("UPDATE videos SET accessed_at = ? WHERE bvid = ?", (now, bvid))
+        return json.loads(row[0])
+
+    def put_video(self, info: Dict[str, Any]) -> None:
+        """保存视频信息"""
+        bvid = info.get('bvid')
+        if not bvid:
+            return
+        data = json.dumps(info, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._write(
+                "INSERT OR REPLACE INTO videos (bvid, info, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (bvid, data, len(data.encode()), now, now)
+            )
+
+    def get_subtitle(self, bvid: str, cid: int, lang: str = 'zh-CN') -> Optional[tuple[Dict[str, Any], SubtitleTrack]]:
+        """读取字幕
+
+        Args:
+            bvid: 视频BV号
+            cid: 分P的cid
+            lang: 优先选择的字幕语言，不存在时返回该分P最近缓存的字幕
+
+        Returns:
+            tuple: (字幕轨道信息, 字幕内容)，不存在或已过期返回None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT lan, subtitle_id, subtitle, body FROM subtitles "
+                "WHERE bvid = ? AND cid = ? AND created_at >= ? "
+                "ORDER BY lan = ? DESC, created_at DESC LIMIT 1",
+                (bvid, cid, now - self.subtitle_ttl, lang)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE subtitles SET accessed_at = ? WHERE bvid = ? AND cid = ? AND lan = ? AND subtitle_id = ?",
+                (now, bvid, cid, row[0], row[1])
+            )
+        return json.loads(row[2]), self._load_body(row[3])
+
+    @staticmethod
+    def _load_body(data: Any) -> SubtitleTrack:
+        """解析缓存的字幕内容"""
+        if isinstance(data, bytes):
+            return SubtitleTrack.from_bytes(data)
+        return SubtitleTrack.from_cues(json.loads(data))
+
+    def put_subtitle(self, bvid: str, cid: int, subtitle: Dict[str, Any], body: Iterable[Dict[str, Any]]) -> None:
+        """保存字幕
+
+        Args:
+            bvid: 视频BV号
+            cid: 分P的cid
+            subtitle: 字幕轨道信息（播放器接口subtitles列表的元素）
+            body: 解析后的字幕内容（SubtitleTrack或字幕条目列表）
+        """
+        subtitle_data = json.dumps(subtitle, ensure_ascii=False)
+        body_data = SubtitleTrack.from_cues(body).to_bytes()
+        size = len(subtitle_data.encode()) + len(body_data)
+        now = time.time()
+        with self._lock:
+            self._write(
+                "INSERT OR REPLACE INTO subtitles "
+                "(bvid, cid, lan, subtitle_id, subtitle, body, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (bvid, cid, subtitle.get('lan') or '', str(subtitle.get('id') or subtitle.get('id_str') or ''),
+                 subtitle_data, body_data, size, now, now)
+            )
+
+    def get_watermark(self, mid: int) -> Optional[tuple[int, int]]:
+        """读取UP主的同步进度
+
+        Returns:
+            tuple: 已处理的最新投稿的(发布时间, aid)，没有记录返回None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT pubdate, aid FROM watermarks WHERE mid = ?", (mid,)
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def set_watermark(self, mid: int, pubdate: int, aid: int) -> None:
+        """保存UP主的同步进度，只会前进，不会回退到更早的投稿"""
+        with self._lock:
+            self._write(
+                "INSERT INTO watermarks (mid, pubdate, aid, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (mid) DO UPDATE SET pubdate = excluded.pubdate, aid = excluded.aid, "
+                "updated_at = excluded.updated_at "
+                "WHERE (excluded.pubdate, excluded.aid) > (watermarks.pubdate, watermarks.aid)",
+                (mid, pubdate, aid, time.time())
+            )
+
+    def clear(self) -> None:
+        """清空缓存（不包括同步进度）"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM videos")
+                self._conn.execute("DELETE FROM subtitles")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _write(self, sql: str, params: tuple) -> None:
+        """在一个事务中写入记录并按大小上限淘汰旧记录（调用方需持有锁）"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(sql, params)
+            self._evict()
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self) -> None:
+        """删除过期记录，总大小超出上限时按访问时间淘汰"""
+        now = time.time()
+        self._conn.execute("DELETE FROM videos WHERE created_at < ?", (now - self.video_ttl,))
+        self._conn.execute("DELETE FROM subtitles WHERE created_at < ?", (now - self.subtitle_ttl,))
+
+        total = self._conn.execute(
+            "SELECT (SELECT IFNULL(SUM(size), 0) FROM videos) + (SELECT IFNULL(SUM(size), 0) FROM subtitles)"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        rows = self._conn.execute(
+            "SELECT 'videos', rowid, size, accessed_at FROM videos "
+            "UNION ALL SELECT 'subtitles', rowid, size, accessed_at FROM subtitles "
+            "ORDER BY accessed_at"
+        )
+        stale = {'videos': [], 'subtitles': []}
+        for table, rowid, size, _ in rows:
+            if total <= self.max_bytes:
+                break
+            stale[table].append((rowid,))
+            total -= size
+        for table, rowids in stale.items():
+            self._conn.executemany(f"DELETE FROM {table} WHERE rowid = ?", rowids)
+
+
+_default_cache: Optional[SubtitleCache] = None
+_default_cache_lock = threading.Lock()
+_default_cache_failed = False
+
+
+def get_default_cache() -> Optional[SubtitleCache]:
+    """获取进程内共享的默认缓存
+
+    通过环境变量BILIBILI_SUBTITLE_CACHE=0禁用，缓存目录不可写时返回None
+    """
+    global _default_cache, _default_cache_failed
+    if os.environ.get(CACHE_ENABLED_ENV, "1").strip().lower() in ("0", "false", "off", "no"):
+        return None
+    if _default_cache is not None or _default_cache_failed:
+        return _default_cache
+
+    with _default_cache_lock:
+        if _default_cache is None and not _default_cache_failed:
+            try:
+                _default_cache = SubtitleCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"字幕缓存初始化失败，将不使用持久化缓存: {e}")
+                _default_cache_failed = True
+        return _default_cache
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕分块
+
+按字符数或估算的token数把字幕条目切分成多个块，便于长视频的字幕分批交给大模型处理。
+块只在字幕条目之间切分，可以保留重叠的条目，每个块带有开始和结束时间。
+分块逐条写入、逐块产出，不需要先拼出完整的字幕文本，也可以在字幕下载过程中进行。
+"""
+
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from subtitle_format import FORMAT_PLAIN, format_subtitles
+
+
+# 分块预算的单位
+CHUNK_UNIT_CHARS = 'chars'
+CHUNK_UNIT_TOKENS = 'tokens'
+CHUNK_UNITS = (CHUNK_UNIT_CHARS, CHUNK_UNIT_TOKENS)
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的token数
+
+    中日韩字符按每个字符1个token计算，其余字符按每4个字符1个token计算，
+    不依赖具体模型的分词器，只用于控制分块大小。
+    """
+    cjk = 0
+    for char in text:
+        if '\u3040' <= char <= '\u9fff' or '\uac00' <= char <= '\ud7af' or '\uf900' <= char <= '\ufaff':
+            cjk += 1
+    other = len(text) - cjk
+    return cjk + (other + 3) // 4
+
+
+def content_size(content: str, unit: str = CHUNK_UNIT_TOKENS) -> int:
+    """单条字幕文本占用的预算（包括换行符）"""
+    if unit == CHUNK_UNIT_CHARS:
+        return len(content) + 1
+    return estimate_tokens(content) + 1
+
+
+class SubtitleChunker:
+    """增量分块器
+
+    逐条写入字幕，块满时立即返回，只保留当前块中的条目。
+    字幕流式下载时可以逐批写入，下载过程中就能得到已经切好的块。
+    """
+
+    def __init__(self, max_size: int, overlap: int = 0, unit: str = CHUNK_UNIT_TOKENS, fmt: str = FORMAT_PLAIN):
+        """
+        Args:
+            max_size: 每块的预算（字符数或token数），单条字幕超出预算时单独成块
+            overlap: 相邻块之间重叠的预算，上一块末尾不超过该预算的条目会在下一块开头重复
+            unit: 预算单位，chars或tokens
+            fmt: 块文本的输出格式
+
+        Raises:
+            ValueError: 预算参数无效
+        """
+        if unit not in CHUNK_UNITS:
+            raise ValueError(f"不支持的分块单位: {unit}，可选: {', '.join(CHUNK_UNITS)}")
+        if max_size <= 0:
+            raise ValueError(f"分块大小必须大于0: {max_size}")
+        if overlap < 0 or overlap >= max_size:
+            raise ValueError(f"重叠大小必须在0到分块大小之间: {overlap}")
+        self.max_size = max_size
+        self.overlap = overlap
+        self.unit = unit
+        self.fmt = fmt
+        self.index = 0
+        self._window: deque = deque()  # 当前块中的(字幕条目, 预算)
+        self._size = 0
+        self._fresh = 0  # 当前块中不属于上一块重叠部分的条目数
+
+    def add(self, cue: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """写入一条字幕，写入前当前块已满时返回该块，否则返回None；空白字幕被忽略"""
+        content = (cue.get('content') or '').strip()
+        if not content:
+            return None
+        cost = content_size(content, self.unit)
+        chunk = None
+        if self._fresh and self._size + cost > self.max_size:
+            chunk = self._make_chunk()
+            # 保留末尾的条目作为下一块的开头
+            kept: deque = deque()
+            kept_size = 0
+            while self._window and kept_size + self._window[-1][1] <= self.overlap:
+                item = self._window.pop()
+                kept.appendleft(item)
+                kept_size += item[1]
+            self._window, self._size, self._fresh = kept, kept_size, 0
+            # 重叠部分加上新条目超出预算时，从头部丢弃重叠条目
+            while self._window and self._size + cost > self.max_size:
+                self._size -= self._window.popleft()[1]
+        self._window.append((cue, cost))
+        self._size += cost
+        self._fresh += 1
+        return chunk
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        """结束写入，返回最后一个未满的块，没有新条目时返回None"""
+        chunk = self._make_chunk() if self._fresh else None
+        self._window.clear()
+        self._size = self._fresh = 0
+        return chunk
+
+    def _make_chunk(self) -> Dict[str, Any]:
+        cues = [cue for cue, _ in self._window]
+        chunk = {
+            'index': self.index,
+            'start': float(cues[0].get('from', 0)),
+            'end': max(float(cue.get('to', 0)) for cue in cues),
+            'size': self._size,
+            'text': format_subtitles(cues, self.fmt),
+        }
+        self.index += 1
+        return chunk
+
+
+def iter_chunks(cues: Iterable[Dict[str, Any]], max_size: int, overlap: int = 0,
+                unit: str = CHUNK_UNIT_TOKENS, fmt: str = FORMAT_PLAIN) -> Iterator[Dict[str, Any]]:
+    """将字幕条目切分为不超过预算的块，规则见SubtitleChunker
+
+    Args:
+        cues: 按时间排序的字幕（SubtitleTrack、字幕条目列表或流式产出的字幕条目）
+        max_size: 每块的预算（字符数或token数）
+        overlap: 相邻块之间重叠的预算
+        unit: 预算单位，chars或tokens
+        fmt: 块文本的输出格式
+
+    Yields:
+        dict: 块信息，包括index、start、end（秒）、size和text
+
+    Raises:
+        ValueError: 预算参数无效
+    """
+    chunker = SubtitleChunker(max_size, overlap, unit, fmt)
+    for cue in cues:
+        chunk = chunker.add(cue)
+        if chunk is not None:
+            yield chunk
+    chunk = chunker.finish()
+    if chunk is not None:
+        yield chunk
+
+
+def parse_chunk_size(value: Any) -> Optional[int]:
+    """解析分块大小参数，空值或0表示不分块
+
+    Raises:
+        ValueError: 不是非负整数
+    """
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        size = int(float(value))
+    except (TypeError, ValueError):
+        raise ValueError(f"无效的分块大小: {value}")
+    if size < 0:
+        raise ValueError(f"分块大小不能为负数: {value}")
+    return size or None
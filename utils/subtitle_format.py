@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕输出格式
+
+将字幕条目（from/to/content）序列化为纯文本、SRT、WebVTT或带时间戳的JSON Lines。
+序列化器只遍历一次字幕条目，直接写入缓冲区，不通过字符串反复拼接。
+"""
+
+import io
+import json
+from typing import Any, Dict, Iterable, Optional, TextIO
+
+
+# 支持的输出格式
+FORMAT_PLAIN = 'plain'
+FORMAT_SRT = 'srt'
+FORMAT_VTT = 'vtt'
+FORMAT_JSONL = 'jsonl'
+OUTPUT_FORMATS = (FORMAT_PLAIN, FORMAT_SRT, FORMAT_VTT, FORMAT_JSONL)
+
+
+def format_timestamp(seconds: float, separator: str = ',') -> str:
+    """将秒数格式化为HH:MM:SS,mmm（SRT）或HH:MM:SS.mmm（WebVTT）"""
+    millis = max(0, int(round(float(seconds) * 1000)))
+    hours, millis = divmod(millis, 3600 * 1000)
+    minutes, millis = divmod(millis, 60 * 1000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+class SubtitleWriter:
+    """流式字幕序列化器
+
+    示例::
+
+        writer = SubtitleWriter('srt')
+        writer.write_cues(body)
+        text = writer.getvalue()
+
+    多个分P可以写入同一个序列化器，每个分P前调用begin_part：
+    纯文本写入分P标题行，WebVTT写入NOTE块，SRT序号连续递增，JSON Lines每行带page字段。
+
+    流式输出时定期调用drain取出已写入的内容，所有drain的结果依次拼接后与getvalue()一致。
+    """
+
+    def __init__(self, fmt: str = FORMAT_PLAIN, out: Optional[TextIO] = None):
+        """
+        初始化序列化器
+
+        Args:
+            fmt: 输出格式，plain/srt/vtt/jsonl之一
+            out: 输出缓冲区，默认新建StringIO
+
+        Raises:
+            ValueError: 不支持的输出格式
+        """
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的字幕格式: {fmt}，可选: {', '.join(OUTPUT_FORMATS)}")
+        self.fmt = fmt
+        self.out = out if out is not None else io.StringIO()
+        self.count = 0
+        self._page: Optional[int] = None
+        self._parts = 0
+        # drain时暂不输出的末尾空白
+        self._pending = ''
+        if fmt == FORMAT_VTT:
+            self.out.write("WEBVTT\n\n")
+
+    def begin_part(self, page: Optional[int], title: str = '') -> None:
+        """开始写入一个分P"""
+        self._page = page
+        if self.fmt == FORMAT_PLAIN:
+            if self._parts:
+                self.out.write("\n")
+            self.out.write(f"P{page} {title}".rstrip() + "\n")
+        elif self.fmt == FORMAT_VTT:
+            self.out.write(f"NOTE P{page} {title}".rstrip() + "\n\n")
+        self._parts += 1
+
+    def write_cue(self, cue: Dict[str, Any]) -> None:
+        """写入一条字幕，空内容会被跳过"""
+        content = (cue.get('content') or '').strip()
+        if not content:
+            return
+
+        self.count += 1
+        out = self.out
+        if self.fmt == FORMAT_PLAIN:
+            out.write(content)
+            out.write("\n")
+        elif self.fmt == FORMAT_SRT:
+            out.write(f"{self.count}\n")
+            out.write(f"{format_timestamp(cue.get('from', 0))} --> {format_timestamp(cue.get('to', 0))}\n")
+            out.write(content)
+            out.write("\n\n")
+        elif self.fmt == FORMAT_VTT:
+            out.write(f"{format_timestamp(cue.get('from', 0), '.')} --> {format_timestamp(cue.get('to', 0), '.')}\n")
+            out.write(content)
+            out.write("\n\n")
+        else:
+            record = {'from': cue.get('from', 0), 'to': cue.get('to', 0), 'content': content}
+            if self._page is not None:
+                record['page'] = self._page
+            out.write(json.dumps(record, ensure_ascii=False))
+            out.write("\n")
+
+    def write_cues(self, cues: Iterable[Dict[str, Any]]) -> None:
+        """依次写入多条字幕"""
+        for cue in cues:
+            self.write_cue(cue)
+
+    def drain(self) -> str:
+        """取出上次drain之后写入的内容并清空缓冲区（仅适用于StringIO缓冲区）
+
+        末尾空白留到下次drain，只有后面还有内容时才输出，与getvalue()去掉末尾空白的行为一致
+        """
+        text = self._pending + self.out.getvalue()
+        self.out.seek(0)
+        self.out.truncate()
+        stripped = text.rstrip()
+        self._pending = text[len(stripped):]
+        return stripped
+
+    def getvalue(self) -> str:
+        """返回已写入的内容（仅适用于StringIO缓冲区），去掉末尾空白"""
+        return self.out.getvalue().rstrip()
+
+
+def format_subtitles(cues: Iterable[Dict[str, Any]], fmt: str = FORMAT_PLAIN) -> str:
+    """将字幕条目序列化为指定格式的字符串"""
+    writer = SubtitleWriter(fmt)
+    writer.write_cues(cues)
+    return writer.getvalue()
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕文件流式解析
+
+字幕文件是一个JSON对象，字幕条目位于其中的body数组。
+解析器按块接收响应内容，逐条解析body中的字幕条目，已解析的内容立即从缓冲区丢弃，
+不需要保留完整的响应文本和解析后的整个JSON对象，内存占用与字幕长度无关。
+"""
+
+import codecs
+import json
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List
+
+
+_WHITESPACE = ' \t\n\r'
+# 合法JSON中一个值之后可能出现的字符
+_VALUE_TERMINATORS = _WHITESPACE + ',:]}'
+
+# 解析器状态
+_EXPECT_OBJECT = 0
+_EXPECT_KEY = 1
+_EXPECT_COLON = 2
+_EXPECT_VALUE = 3
+_EXPECT_ARRAY = 4
+_EXPECT_ITEM = 5
+_DONE = 6
+
+
+class JsonArrayStreamParser:
+    """从JSON对象中增量解析指定键对应的数组元素
+
+    示例::
+
+        parser = JsonArrayStreamParser('body')
+        for chunk in response.iter_bytes():
+            for item in parser.feed(chunk):
+                ...
+        parser.close()
+
+    顶层对象中的其他字段会被解析后丢弃，目标数组的元素逐个返回。
+    """
+
+    def __init__(self, key: str = 'body'):
+        self.key = key
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._state = _EXPECT_OBJECT
+        self._current_key = None
+        self._found = False
+        # 对象和数组中下一个成员之前是否需要逗号
+        self._need_comma = False
+
+    def feed(self, data: bytes) -> List[Any]:
+        """输入一块响应内容，返回其中已完整解析的数组元素"""
+        self._buffer += self._text_decoder.decode(data)
+        return self._parse(final=False)
+
+    def close(self) -> List[Any]:
+        """输入结束，返回剩余的数组元素
+
+        Raises:
+            ValueError: 内容不完整或不是合法的JSON对象
+        """
+        self._buffer += self._text_decoder.decode(b'', final=True)
+        items = self._parse(final=True)
+        if self._state != _DONE:
+            raise ValueError("字幕内容不完整")
+        return items
+
+    @property
+    def found(self) -> bool:
+        """是否遇到了目标键"""
+        return self._found
+
+    def _decode_value(self, pos: int, final: bool):
+        """从pos处解析一个完整的JSON值，内容不足时返回None
+
+        数字可能在块边界处被截断（如"0.4"只收到"0."），
+        因此只有值后面紧跟分隔符或输入已结束时才接受。
+        """
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise ValueError(f"无效的字幕内容，位置: {pos}")
+            return None
+        if not final and (end >= len(self._buffer) or self._buffer[end] not in _VALUE_TERMINATORS):
+            return None
+        return value, end
+
+    def _parse(self, final: bool) -> List[Any]:
+        items = []
+        buffer = self._buffer
+        pos = 0
+        size = len(buffer)
+        while self._state != _DONE:
+            while pos < size and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos >= size:
+                break
+            char = buffer[pos]
+
+            if self._state == _EXPECT_OBJECT:
+                if char != '{':
+                    raise ValueError("字幕内容不是JSON对象")
+                pos += 1
+                self._state = _EXPECT_KEY
+            elif self._state == _EXPECT_KEY:
+                if char == '}':
+                    pos += 1
+                    self._state = _DONE
+                    continue
+                if self._need_comma:
+                    if char != ',':
+                        raise ValueError("字幕内容格式错误，缺少逗号")
+                    pos += 1
+                    self._need_comma = False
+                    continue
+                decoded = self._decode_value(pos, final)
+                if decoded is None:
+                    break
+                self._current_key, pos = decoded
+                self._state = _EXPECT_COLON
+            elif self._state == _EXPECT_COLON:
+                if char != ':':
+                    raise ValueError("字幕内容格式错误，缺少冒号")
+                pos += 1
+                self._state = _EXPECT_ARRAY if self._current_key == self.key else _EXPECT_VALUE
+            elif self._state == _EXPECT_VALUE:
+                # 其他字段只解析不保留
+                decoded = self._decode_value(pos, final)
+                if decoded is None:
+                    break
+                pos = decoded[1]
+                self._state = _EXPECT_KEY
+                self._need_comma = True
+            elif self._state == _EXPECT_ARRAY:
+                if char != '[':
+                    raise ValueError(f"字段{self.key}不是数组")
+                pos += 1
+                self._found = True
+                self._state = _EXPECT_ITEM
+                self._need_comma = False
+            else:
+                if char == ']':
+                    pos += 1
+                    self._state = _EXPECT_KEY
+                    self._need_comma = True
+                    continue
+                if self._need_comma:
+                    if char != ',':
+                        raise ValueError("字幕内容格式错误，缺少逗号")
+                    pos += 1
+                    self._need_comma = False
+                    continue
+                decoded = self._decode_value(pos, final)
+                if decoded is None:
+                    break
+                item, pos = decoded
+                items.append(item)
+                self._need_comma = True
+
+        # 丢弃已解析的内容
+        self._buffer = buffer[pos:]
+        return items
+
+
+def compact_cue(item: Dict[str, Any]) -> Dict[str, Any]:
+    """只保留字幕条目的时间和文本，丢弃sid、location等字段
+
+    Raises:
+        ValueError: 字幕条目不是JSON对象
+    """
+    if not isinstance(item, dict):
+        raise ValueError(f"无效的字幕条目: {item!r}")
+    return {'from': item.get('from', 0), 'to': item.get('to', 0), 'content': item.get('content', '')}
+
+
+def iter_subtitle_body(chunks: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """从字幕文件的字节流中逐条产出精简后的字幕条目
+
+    Raises:
+        ValueError: 字幕内容无效
+    """
+    parser = JsonArrayStreamParser('body')
+    for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield compact_cue(item)
+    for item in parser.close():
+        yield compact_cue(item)
+
+
+async def aiter_subtitle_body(chunks: AsyncIterable[bytes]) -> AsyncIterator[Dict[str, Any]]:
+    """iter_subtitle_body的异步版本"""
+    parser = JsonArrayStreamParser('body')
+    async for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield compact_cue(item)
+    for item in parser.close():
+        yield compact_cue(item)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+紧凑的字幕轨道表示
+
+开始、结束时间保存在两个array('d')中，所有字幕文本拼接为一个字符串并记录偏移量，
+相比每条字幕一个dict，内存占用小得多。支持按时间二分查找、切片和二进制序列化，
+可以直接写入缓存，读取时无需逐条解析JSON。
+"""
+
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+
+# 序列化格式：魔数、版本、条目数，随后依次为starts、ends、offsets数组和UTF-8文本（小端序）
+_MAGIC = b'BST'
+_VERSION = 1
+_HEADER = struct.Struct('<3sBI')
+
+
+class SubtitleTrack:
+    """不可变的字幕轨道
+
+    迭代和下标访问返回与接口返回格式一致的字幕条目dict（from/to/content），
+    因此可以直接交给SubtitleWriter、分块等按条目处理的代码使用。
+    字幕按开始时间排序（B站字幕文件本身即按时间排序）。
+    """
+
+    __slots__ = ('starts', 'ends', '_offsets', '_text', '_max_ends')
+
+    def __init__(self, starts: array, ends: array, offsets: array, text: str):
+        """
+        Args:
+            starts: 每条字幕的开始时间（秒）
+            ends: 每条字幕的结束时间（秒）
+            offsets: 每条字幕文本在text中的起始位置，最后一个元素为text的长度
+            text: 所有字幕文本拼接后的字符串
+        """
+        self.starts = starts
+        self.ends = ends
+        self._offsets = offsets
+        self._text = text
+        self._max_ends: Optional[array] = None
+
+    @classmethod
+    def from_cues(cls, cues: Iterable[Dict[str, Any]]) -> 'SubtitleTrack':
+        """从字幕条目构建，cues可以是生成器，构建过程中不保留原始条目"""
+        if isinstance(cues, SubtitleTrack):
+            return cues
+        builder = SubtitleTrackBuilder()
+        for cue in cues:
+            builder.append(cue)
+        return builder.build()
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def content(self, index: int) -> str:
+        """第index条字幕的文本"""
+        return self._text[self._offsets[index]:self._offsets[index + 1]]
+
+    def cue(self, index: int) -> Dict[str, Any]:
+        """第index条字幕"""
+        return {'from': self.starts[index], 'to': self.ends[index], 'content': self.content(index)}
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Dict[str, Any], 'SubtitleTrack']:
+        if isinstance(index, slice):
+            first, last, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("SubtitleTrack切片不支持步长")
+            return self.slice(first, last)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("SubtitleTrack下标越界")
+        return self.cue(index)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        starts, ends, offsets, text = self.starts, self.ends, self._offsets, self._text
+        for index in range(len(starts)):
+            yield {'from': starts[index], 'to': ends[index], 'content': text[offsets[index]:offsets[index + 1]]}
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, SubtitleTrack):
+            return NotImplemented
+        return self.starts == other.starts and self.ends == other.ends and list(self.contents()) == list(other.contents())
+
+    def __repr__(self) -> str:
+        return f"SubtitleTrack({len(self)} cues)"
+
+    def contents(self) -> Iterator[str]:
+        """依次返回每条字幕的文本"""
+        offsets, text = self._offsets, self._text
+        for index in range(len(self.starts)):
+            yield text[offsets[index]:offsets[index + 1]]
+
+    def slice(self, first: int, last: int) -> 'SubtitleTrack':
+        """返回[first, last)范围内的字幕，文本和时间数组只复制该范围"""
+        first = max(0, first)
+        last = min(len(self), last)
+        if last <= first:
+            return SubtitleTrack(array('d'), array('d'), array('q', [0]), '')
+        base = self._offsets[first]
+        offsets = array('q', (offset - base for offset in self._offsets[first:last + 1]))
+        return SubtitleTrack(self.starts[first:last], self.ends[first:last], offsets,
+                             self._text[base:self._offsets[last]])
+
+    @property
+    def max_ends(self) -> array:
+        """结束时间的前缀最大值，字幕时间可能重叠，用于按开始时间二分查找"""
+        if self._max_ends is None:
+            self._max_ends = array('d', accumulate(self.ends, max))
+        return self._max_ends
+
+    def window(self, start: Optional[float] = None, end: Optional[float] = None) -> 'SubtitleTrack':
+        """返回与[start, end)时间段重叠的字幕
+
+        Args:
+            start: 开始时间（秒），None表示从头开始
+            end: 结束时间（秒），None表示到结尾
+        """
+        first = 0 if start is None else bisect_right(self.max_ends, start)
+        last = len(self) if end is None else bisect_left(self.starts, end)
+        if start is None or last <= first:
+            return self.slice(first, last)
+        # 前缀最大值只保证first之前的字幕都已结束，范围内仍可能有提前结束的短字幕
+        keep = [index for index in range(first, last) if self.ends[index] > start]
+        if len(keep) == last - first:
+            return self.slice(first, last)
+        return SubtitleTrack.from_cues(self.cue(index) for index in keep)
+
+    def to_cues(self) -> List[Dict[str, Any]]:
+        """转换为字幕条目列表"""
+        return list(self)
+
+    def to_bytes(self) -> bytes:
+        """序列化为紧凑的二进制格式"""
+        starts, ends, offsets = array('d', self.starts), array('d', self.ends), array('q', self._offsets)
+        if sys.byteorder == 'big':
+            for values in (starts, ends, offsets):
+                values.byteswap()
+        return b''.join((
+            _HEADER.pack(_MAGIC, _VERSION, len(self)),
+            starts.tobytes(),
+            ends.tobytes(),
+            offsets.tobytes(),
+            self._text.encode('utf-8'),
+        ))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'SubtitleTrack':
+        """从to_bytes的结果恢复
+
+        Raises:
+            ValueError: 数据格式无效
+        """
+        if len(data) < _HEADER.size:
+            raise ValueError("字幕数据不完整")
+        magic, version, count = _HEADER.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("不支持的字幕数据格式")
+
+        position = _HEADER.size
+        starts, ends, offsets = array('d'), array('d'), array('q')
+        for values, length in ((starts, count), (ends, count), (offsets, count + 1)):
+            size = length * values.itemsize
+            if len(data) < position + size:
+                raise ValueError("字幕数据不完整")
+            values.frombytes(data[position:position + size])
+            position += size
+        if sys.byteorder == 'big':
+            for values in (starts, ends, offsets):
+                values.byteswap()
+
+        text = data[position:].decode('utf-8')
+        if offsets[-1] != len(text):
+            raise ValueError("字幕数据长度不一致")
+        return cls(starts, ends, offsets, text)
+
+
+class SubtitleTrackBuilder:
+    """逐条追加字幕条目构建SubtitleTrack，用于流式下载（包括异步迭代）
+
+    构建过程中可以按下标读取已追加的字幕，流式输出时不需要另外保存一份字幕条目。
+    """
+
+    def __init__(self, on_append: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            on_append: 每追加一条字幕后调用，用于通知等待新字幕的读取方
+        """
+        self._starts = array('d')
+        self._ends = array('d')
+        self._offsets = array('q', [0])
+        self._pieces: List[str] = []
+        self._position = 0
+        self._on_append = on_append
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def cue(self, index: int) -> Dict[str, Any]:
+        """第index条已追加的字幕，格式同SubtitleTrack.cue"""
+        return {'from': self._starts[index], 'to': self._ends[index], 'content': self._pieces[index]}
+
+    def append(self, cue: Dict[str, Any]) -> None:
+        """追加一条字幕"""
+        content = cue.get('content') or ''
+        self._starts.append(float(cue.get('from', 0)))
+        self._ends.append(float(cue.get('to', 0)))
+        self._pieces.append(content)
+        self._position += len(content)
+        self._offsets.append(self._position)
+        if self._on_append is not None:
+            self._on_append()
+
+    def build(self) -> SubtitleTrack:
+        """生成字幕轨道"""
+        return SubtitleTrack(self._starts, self._ends, self._offsets, ''.join(self._pieces))
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕时间段选择
+
+从按开始时间排序的字幕中选出与[start, end)时间段重叠的部分，
+由SubtitleTrack.window通过二分查找定位边界，长视频只返回需要的片段。
+"""
+
+import re
+from typing import Any, Dict, Iterable, Optional
+
+from subtitle_track import SubtitleTrack
+
+
+def parse_time_position(value: Any) -> Optional[float]:
+    """解析时间位置
+
+    Args:
+        value: 秒数（如90、"90.5"），或"MM:SS"、"HH:MM:SS"格式的字符串，空值返回None
+
+    Returns:
+        float: 秒数
+
+    Raises:
+        ValueError: 格式无效或为负数
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        text = str(value).strip()
+        if not text:
+            return None
+        if not re.match(r'^\d+(\.\d+)?$|^\d+(:\d{1,2}){1,2}(\.\d+)?$', text):
+            raise ValueError(f"无效的时间格式: {text}")
+        seconds = 0.0
+        for part in text.split(':'):
+            seconds = seconds * 60 + float(part)
+    if seconds < 0:
+        raise ValueError(f"时间不能为负数: {value}")
+    return seconds
+
+
+def cue_window(cues: Iterable[Dict[str, Any]], start: Optional[float] = None,
+               end: Optional[float] = None) -> SubtitleTrack:
+    """返回与[start, end)时间段重叠的字幕，cues需按from排序，可以是SubtitleTrack或字幕条目列表"""
+    track = SubtitleTrack.from_cues(cues)
+    if start is None and end is None:
+        return track
+    return track.window(start, end)
+
+
+def cue_overlaps(cue: Dict[str, Any], start: Optional[float] = None, end: Optional[float] = None) -> bool:
+    """单条字幕是否与[start, end)时间段重叠，与cue_window的选择结果一致，用于逐条处理流式下载的字幕"""
+    return (start is None or float(cue.get('to', 0)) > start) and (end is None or float(cue.get('from', 0)) < end)
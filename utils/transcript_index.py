@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕全文索引
+
+将提取过的字幕逐条写入本地SQLite的FTS5全文索引，按短语查询出现的位置（视频、分P、时间）和前后文，
+无需重新下载整份字幕。获取字幕时增量更新，同一分P的字幕轨道没有变化时不会重复写入。
+
+SQLite自带的分词器不能切分中文，写入和查询前在Python中分词：
+- 连续的中日韩文字切分为相邻两字的二元组（单字保留原字），按顺序写入bigrams列，支持短语查询
+- 每个中日韩文字另外写入unigrams列，用于单字查询
+- 其他字符按字母数字切分为小写单词
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from subtitle_cache import CACHE_DIR_ENV, DEFAULT_CACHE_DIR
+
+
+# 设置为0/false/off时禁用全文索引
+INDEX_ENABLED_ENV = "BILIBILI_SUBTITLE_INDEX"
+DEFAULT_INDEX_FILE = "transcript_index.sqlite3"
+
+# 查询结果数上限
+MAX_SEARCH_LIMIT = 200
+# 前后文条数上限
+MAX_CONTEXT_CUES = 10
+
+# 中日韩文字（假名、汉字、谚文）
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_RUN = re.compile(f'[{_CJK}]+|(?:(?![{_CJK}])[^\\W_])+')
+_CJK_RUN = re.compile(f'^[{_CJK}]+$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    track_id INTEGER PRIMARY KEY,
+    bvid TEXT NOT NULL,
+    cid INTEGER NOT NULL,
+    lan TEXT NOT NULL,
+    subtitle_id TEXT NOT NULL,
+    title TEXT NOT NULL,
+    page INTEGER,
+    part TEXT NOT NULL,
+    cue_count INTEGER NOT NULL,
+    indexed_at REAL NOT NULL,
+    UNIQUE (bvid, cid)
+);
+CREATE TABLE IF NOT EXISTS cues (
+    cue_id INTEGER PRIMARY KEY,
+    track_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cues_track ON cues (track_id, seq);
+CREATE VIRTUAL TABLE IF NOT EXISTS cue_fts USING fts5(bigrams, unigrams, content='', tokenize='unicode61');
+"""
+
+
+def _runs(text: str) -> List[str]:
+    """将文本切分为连续的中日韩文字片段和字母数字单词"""
+    return _RUN.findall(text or '')
+
+
+def _is_cjk(run: str) -> bool:
+    return bool(_CJK_RUN.match(run))
+
+
+def _run_tokens(run: str) -> List[str]:
+    """单个片段的bigrams列词元"""
+    if not _is_cjk(run):
+        return [run.lower()]
+    if len(run) == 1:
+        return [run]
+    return [run[index:index + 2] for index in range(len(run) - 1)]
+
+
+def tokenize(text: str) -> Tuple[str, str]:
+    """将字幕文本转换为写入索引的(bigrams, unigrams)两列，词元之间以空格分隔"""
+    runs = _runs(text)
+    bigrams = [token for run in runs for token in _run_tokens(run)]
+    unigrams = [char for run in runs if _is_cjk(run) for char in run]
+    return ' '.join(bigrams), ' '.join(unigrams)
+
+
+def build_match_query(query: str) -> str:
+    """将查询文本转换为FTS5查询表达式
+
+    以空白分隔的各部分都必须出现（AND），每部分按短语匹配；
+    单独的一个中日韩文字在unigrams列中查询，并与相邻部分分开匹配。
+
+    Returns:
+        str: FTS5查询表达式，查询中没有可检索的字符时返回空字符串
+    """
+    clauses = []
+    for term in (query or '').split():
+        runs = _runs(term)
+        if len(runs) > 1 and any(_is_cjk(run) and len(run) == 1 for run in runs):
+            groups = [[run] for run in runs]
+        else:
+            groups = [runs] if runs else []
+        for group in groups:
+            if len(group) == 1 and _is_cjk(group[0]) and len(group[0]) == 1:
+                clauses.append(f'unigrams : "{group[0]}"')
+            else:
+                tokens = [token for run in group for token in _run_tokens(run)]
+                clauses.append('bigrams : "' + ' '.join(tokens) + '"')
+    return ' AND '.join(clauses)
+
+
+class TranscriptIndex:
+    """基于SQLite FTS5的字幕全文索引（线程安全）
+
+    - tracks: 每个分P（bvid, cid）当前索引的字幕轨道，以及视频标题和分P信息
+    - cues: 每条字幕的时间和文本，用于返回命中位置的前后文
+    - cue_fts: 不保存原文的FTS5表，rowid与cues.cue_id一致
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化索引
+
+        Args:
+            path: SQLite文件路径，默认为缓存目录下的transcript_index.sqlite3
+        """
+        if path is None:
+            cache_dir = os.environ.get(CACHE_DIR_ENV) or DEFAULT_CACHE_DIR
+            os.makedirs(cache_dir, exist_ok=True)
+            path = os.path.join(cache_dir, DEFAULT_INDEX_FILE)
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def add_track(self, bvid: str, cid: int, subtitle: Dict[str, Any], cues: Iterable[Dict[str, Any]],
+                  title: str = '', page: Optional[int] = None, part: str = '') -> bool:
+        """索引一个分P的字幕，替换该分P之前索引的字幕轨道
+
+        Args:
+            bvid: 视频BV号
+            cid: 分P的cid
+            subtitle: 字幕轨道信息（播放器接口subtitles列表的元素）
+            cues: 字幕内容（SubtitleTrack或字幕条目列表）
+            title: 视频标题
+            page: 分P页码
+            part: 分P标题
+
+        Returns:
+            bool: 是否写入了索引，该分P已索引同一字幕轨道时返回False
+        """
+        lan = subtitle.get('lan') or ''
+        subtitle_id = str(subtitle.get('id') or subtitle.get('id_str') or '')
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT track_id, lan, subtitle_id FROM tracks WHERE bvid = ? AND cid = ?", (bvid, cid)
+            ).fetchone()
+            if row is not None and (row[1], row[2]) == (lan, subtitle_id):
+                return False
+
+        rows = [(seq, float(cue['from']), float(cue['to']), cue.get('content') or '') for seq, cue in enumerate(cues)]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_track(bvid, cid)
+                track_id = self._conn.execute(
+                    "INSERT INTO tracks (bvid, cid, lan, subtitle_id, title, page, part, cue_count, indexed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (bvid, cid, lan, subtitle_id, title or '', page, part or '', len(rows), time.time())
+                ).lastrowid
+                # 在写事务中分配连续的cue_id，批量写入字幕和全文索引
+                first_id = self._conn.execute("SELECT IFNULL(MAX(cue_id), 0) + 1 FROM cues").fetchone()[0]
+                self._conn.executemany(
+                    "INSERT INTO cues (cue_id, track_id, seq, start, end, content) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(first_id + seq, track_id, seq, start, end, content) for seq, start, end, content in rows]
+                )
+                self._conn.executemany(
+                    "INSERT INTO cue_fts (rowid, bigrams, unigrams) VALUES (?, ?, ?)",
+                    [(first_id + seq, *tokenize(content)) for seq, _, _, content in rows]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def _delete_track(self, bvid: str, cid: int) -> None:
+        """删除分P已索引的字幕（调用方需持有锁并开启事务）
+
+        不保存原文的FTS5表删除时需要提供写入时的列值，由cues中的原文重新分词得到
+        """
+        row = self._conn.execute("SELECT track_id FROM tracks WHERE bvid = ? AND cid = ?", (bvid, cid)).fetchone()
+        if row is None:
+            return
+        track_id = row[0]
+        for cue_id, content in self._conn.execute(
+                "SELECT cue_id, content FROM cues WHERE track_id = ?", (track_id,)).fetchall():
+            self._conn.execute(
+                "INSERT INTO cue_fts (cue_fts, rowid, bigrams, unigrams) VALUES ('delete', ?, ?, ?)",
+                (cue_id, *tokenize(content))
+            )
+        self._conn.execute("DELETE FROM cues WHERE track_id = ?", (track_id,))
+        self._conn.execute("DELETE FROM tracks WHERE track_id = ?", (track_id,))
+
+    def search(self, query: str, limit: int = 20, context: int = 1,
+               bvid: Optional[str] = None) -> List[Dict[str, Any]]:
+        """查询包含关键词的字幕
+
+        Args:
+            query: 查询文本，空白分隔的各部分都必须出现在同一条字幕中
+            limit: 返回的结果数，按相关度排序（只有单字时按写入时间从新到旧）
+            context: 每个结果前后各附带的字幕条数
+            bvid: 只在该视频中查询
+
+        Returns:
+            List: 每条命中字幕的bvid、cid、page、part、title、from、to、content，
+                以及前后文before、after（字幕条目列表）
+
+        Raises:
+            ValueError: 查询中没有可检索的字符
+        """
+        match = build_match_query(query)
+        if not match:
+            raise ValueError(f"查询中没有可检索的字符: {query}")
+        limit = min(max(1, int(limit)), MAX_SEARCH_LIMIT)
+        context = min(max(0, int(context)), MAX_CONTEXT_CUES)
+
+        sql = (
+            "SELECT c.track_id, c.seq, c.start, c.end, c.content, t.bvid, t.cid, t.page, t.part, t.title "
+            "FROM cue_fts JOIN cues c ON c.cue_id = cue_fts.rowid JOIN tracks t ON t.track_id = c.track_id "
+            "WHERE cue_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        if bvid:
+            sql += " AND t.bvid = ?"
+            params.append(bvid)
+        # 只有单字时命中的字幕很多，按相关度排序需要为每条命中计算得分，改为按写入顺序从新到旧返回
+        if 'bigrams :' in match:
+            sql += " ORDER BY cue_fts.rank LIMIT ?"
+        else:
+            sql += " ORDER BY cue_fts.rowid DESC LIMIT ?"
+        params.append(limit)
+
+        hits = []
+        with self._lock:
+            for track_id, seq, start, end, content, hit_bvid, cid, page, part, title in self._conn.execute(sql, params).fetchall():
+                nearby = self._conn.execute(
+                    "SELECT seq, start, end, content FROM cues WHERE track_id = ? AND seq BETWEEN ? AND ? ORDER BY seq",
+                    (track_id, seq - context, seq + context)
+                ).fetchall() if context else []
+                hits.append({
+                    'bvid': hit_bvid,
+                    'cid': cid,
+                    'page': page,
+                    'part': part,
+                    'title': title,
+                    'from': start,
+                    'to': end,
+                    'content': content,
+                    'before': [{'from': row[1], 'to': row[2], 'content': row[3]} for row in nearby if row[0] < seq],
+                    'after': [{'from': row[1], 'to': row[2], 'content': row[3]} for row in nearby if row[0] > seq],
+                })
+        return hits
+
+    def stats(self) -> Dict[str, int]:
+        """索引的视频数、分P数和字幕条数"""
+        with self._lock:
+            videos, tracks, cues = self._conn.execute(
+                "SELECT COUNT(DISTINCT bvid), COUNT(*), IFNULL(SUM(cue_count), 0) FROM tracks"
+            ).fetchone()
+        return {'videos': videos, 'tracks': tracks, 'cues': cues}
+
+    def clear(self) -> None:
+        """清空索引"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM tracks")
+                self._conn.execute("DELETE FROM cues")
+                self._conn.execute("INSERT INTO cue_fts (cue_fts) VALUES ('delete-all')")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+_default_index: Optional[TranscriptIndex] = None
+_default_index_lock = threading.Lock()
+_default_index_failed = False
+
+
+def get_default_index() -> Optional[TranscriptIndex]:
+    """获取进程内共享的默认索引
+
+    通过环境变量BILIBILI_SUBTITLE_INDEX=0禁用，索引目录不可写或SQLite不支持FTS5时返回None
+    """
+    global _default_index, _default_index_failed
+    if os.environ.get(INDEX_ENABLED_ENV, "1").strip().lower() in ("0", "false", "off", "no"):
+        return None
+    if _default_index is not None or _default_index_failed:
+        return _default_index
+
+    with _default_index_lock:
+        if _default_index is None and not _default_index_failed:
+            try:
+                _default_index = TranscriptIndex()
+            except (OSError, sqlite3.Error) as e:
+                print(f"字幕索引初始化失败，将不建立全文索引: {e}")
+                _default_index_failed = True
+        return _default_index
@@ -0,0 +1,621 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+B站字幕插件性能基准测试
+
+使用本地的B站API替身（httpx传输层）代替真实接口，不需要凭证和网络，结果可重复。
+替身返回nav、view、pagelist、player/wbi/v2和字幕文件的录制数据，可以配置响应延迟。
+对完整的工具调用路径（_invoke）测量：
+- 单次调用延迟（冷启动、进程内缓存命中、持久化缓存命中三种场景）
+- 每次调用的上游请求数（按接口统计）和新建的上游连接数（连接复用）
+- 并发调用的吞吐量
+- 单次调用的内存峰值（tracemalloc）
+- 字幕全文索引的写入耗时和查询延迟（--index-videos）
+- BV号/AV号批量互转的耗时，并与原实现逐个比对结果（--id-conversions）
+
+使用方法：
+    python working/benchmark.py
+    python working/benchmark.py --latency 0.05 --pages 3 --cues 3000 --concurrency 8
+    python working/benchmark.py --json result.json
+    python working/benchmark.py --baseline result.json   # 与上次结果比较，出现性能退化时返回1
+    python working/benchmark.py --index-videos 2000      # 同时测量2000个视频规模的全文索引
+    python working/benchmark.py --id-conversions 100000  # 同时测量10万个视频ID的批量互转
+
+录制的接口数据可以放在--fixtures目录中（nav.json、view.json、pagelist.json、player.json、subtitle.json），
+缺少的文件使用内置生成的数据。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# 添加项目根目录和utils目录到Python路径
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT_DIR)
+sys.path.append(os.path.join(ROOT_DIR, 'utils'))
+
+# 默认关闭持久化缓存，由需要的场景打开
+os.environ["BILIBILI_SUBTITLE_CACHE"] = "0"
+os.environ["BILIBILI_SUBTITLE_CACHE_DIR"] = tempfile.mkdtemp(prefix="bilibili_subtitle_benchmark_")
+
+from tools.bilibili_subtitle_plugin import BilibiliSubtitlePluginTool
+from bilibili_enhanced_tool import BV_MAX_AID, aids_to_bvids, bvid2aid, bvids_to_aids, wbi_key_cache
+from bilibili_http import close_http_client, configure_http_client
+from memory_cache import player_info_cache, video_info_cache, video_pages_cache
+from rate_limiter import rate_limiters
+from transcript_index import TranscriptIndex
+
+# 测试用的视频
+TEST_BVID = "BV1GJ411x7h7"
+TEST_AID = 170001
+
+# 替身返回的字幕文件地址，每个分P的字幕文件不同
+SUBTITLE_URL = "//aisubtitle.hdslb.com/bfs/ai_subtitle/prod/benchmark-{cid}.json"
+
+# 字幕文件分块返回的大小，用于覆盖流式解析路径
+RESPONSE_CHUNK_SIZE = 16 * 1024
+
+# 基准测试不测量限流器，使用足够大的速率
+UNLIMITED_RATE = 1e9
+
+# 全文索引测试的查询（二字词、短语、单字和多个词）
+INDEX_QUERIES = ("字幕", "性能优化", "聊", "视频 方法")
+
+
+def generate_fixtures(pages: int, cues: int) -> Dict[str, Any]:
+    """生成与B站接口返回结构一致的数据"""
+    rng = random.Random(42)
+    page_list = [
+        {"cid": 1000 + page, "page": page, "part": f"第{page}集", "duration": cues * 3}
+        for page in range(1, pages + 1)
+    ]
+    body = []
+    position = 0.0
+    for sid in range(1, cues + 1):
+        duration = round(rng.uniform(1.0, 4.0), 2)
+        body.append({
+            "from": round(position, 2),
+            "to": round(position + duration, 2),
+            "sid": sid,
+            "location": 2,
+            "content": "".join(rng.choice("我们今天来聊一聊视频字幕的提取方法和性能优化") for _ in range(rng.randint(6, 24))),
+            "music": 0.0,
+        })
+        position += duration + round(rng.uniform(0, 0.5), 2)
+
+    return {
+        "nav": {
+            "code": 0, "message": "0", "ttl": 1,
+            "data": {
+                "isLogin": True, "mid": 1, "uname": "benchmark",
+                "wbi_img": {
+                    "img_url": "https://i0.hdslb.com/bfs/wbi/7cd084941338484aae1ad9425b84077c.png",
+                    "sub_url": "https://i0.hdslb.com/bfs/wbi/4932caff0ff746eab6f01bf08b70ac45.png",
+                },
+            },
+        },
+        "view": {
+            "code": 0, "message": "0", "ttl": 1,
+            "data": {
+                "bvid": TEST_BVID, "aid": TEST_AID, "title": "基准测试视频", "desc": "",
+                "duration": cues * 3 * pages, "pubdate": 1700000000,
+                "owner": {"mid": 1, "name": "benchmark", "face": ""},
+                "stat": {"view": 1, "danmaku": 0, "reply": 0, "favorite": 0, "coin": 0, "share": 0, "like": 0},
+                "cid": page_list[0]["cid"], "pages": page_list,
+            },
+        },
+        "pagelist": {"code": 0, "message": "0", "ttl": 1, "data": page_list},
+        "player": {
+            "code": 0, "message": "0", "ttl": 1,
+            "data": {
+                "subtitle": {
+                    "allow_submit": False, "lan": "", "lan_doc": "",
+                    "subtitles": [{
+                        "id": 1, "id_str": "1", "lan": "ai-zh", "lan_doc": "中文（自动生成）",
+                        "is_lock": False, "subtitle_url": SUBTITLE_URL, "type": 1, "ai_type": 0, "ai_status": 2,
+                    }],
+                },
+            },
+        },
+        "subtitle": {
+            "font_size": 0.4, "font_color": "#FFFFFF", "background_alpha": 0.5,
+            "background_color": "#9C27B0", "Stroke": "none", "type": "AIsubtitle",
+            "lang": "zh", "version": "v1.6.0.4", "body": body,
+        },
+    }
+
+
+def load_fixtures(fixtures_dir: Optional[str], pages: int, cues: int) -> Dict[str, Any]:
+    """读取录制的接口数据，缺少的部分使用生成的数据"""
+    fixtures = generate_fixtures(pages, cues)
+    if fixtures_dir:
+        for name in fixtures:
+            path = os.path.join(fixtures_dir, f"{name}.json")
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    fixtures[name] = json.load(f)
+    return fixtures
+
+
+class BilibiliStandIn(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """B站API替身，同时支持同步和异步客户端
+
+    按路径返回录制数据，每个请求等待latency±jitter秒，并按接口统计请求数。
+    替身同时充当连接池：客户端关闭时会关闭它的传输层，之后的第一个请求计为一次新建连接，
+    额外等待connect_latency秒模拟TCP+TLS握手，用于发现调用之间没有复用连接的退化。
+    """
+
+    def __init__(self, fixtures: Dict[str, Any], latency: float = 0.0, jitter: float = 0.0,
+                 connect_latency: float = 0.0):
+        self.payloads = {name: json.dumps(data, ensure_ascii=False).encode() for name, data in fixtures.items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.connect_latency = connect_latency
+        self.counts: Counter = Counter()
+        self.connections = 0
+        self._connected = set()  # 已建立连接的客户端类型（sync/async）
+        self._lock = threading.Lock()
+
+    def route(self, request: httpx.Request) -> Optional[str]:
+        path = request.url.path
+        if path.endswith("/x/web-interface/nav"):
+            return "nav"
+        if path.endswith("/x/web-interface/view"):
+            return "view"
+        if path.endswith("/x/player/pagelist"):
+            return "pagelist"
+        if path.endswith("/x/player/wbi/v2") or path.endswith("/x/player/v2"):
+            return "player"
+        if path.endswith(".json"):
+            return "subtitle"
+        return None
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def reset_counts(self) -> Counter:
+        with self._lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+    def reset_connections(self) -> int:
+        with self._lock:
+            connections, self.connections = self.connections, 0
+        return connections
+
+    def _connect(self, kind: str) -> float:
+        """返回请求前需要额外等待的握手时间，连接已建立时为0"""
+        with self._lock:
+            if kind in self._connected:
+                return 0.0
+            self._connected.add(kind)
+            self.connections += 1
+        return self.connect_latency
+
+    def close(self) -> None:
+        with self._lock:
+            self._connected.discard("sync")
+
+    async def aclose(self) -> None:
+        with self._lock:
+            self._connected.discard("async")
+
+    def _prepare(self, request: httpx.Request) -> Optional[bytes]:
+        name = self.route(request)
+        with self._lock:
+            self.counts[name or "unknown"] += 1
+        if name == "player":
+            return self.payloads["player"].replace(b"{cid}", request.url.params.get("cid", "").encode())
+        return self.payloads.get(name) if name else None
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        time.sleep(self._connect("sync") + self.delay())
+        payload = self._prepare(request)
+        if payload is None:
+            return httpx.Response(404, request=request)
+        chunks = (payload[i:i + RESPONSE_CHUNK_SIZE] for i in range(0, len(payload), RESPONSE_CHUNK_SIZE))
+        return httpx.Response(200, headers={"content-type": "application/json"}, content=chunks, request=request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(self._connect("async") + self.delay())
+        payload = self._prepare(request)
+        if payload is None:
+            return httpx.Response(404, request=request)
+
+        async def chunks():
+            for i in range(0, len(payload), RESPONSE_CHUNK_SIZE):
+                yield payload[i:i + RESPONSE_CHUNK_SIZE]
+
+        return httpx.Response(200, headers={"content-type": "application/json"}, content=chunks(), request=request)
+
+
+# 模拟运行时环境
+class MockRuntime:
+    def __init__(self, credentials):
+        self.credentials = credentials
+
+class MockSession:
+    def __init__(self):
+        pass
+
+
+def reset_state(keep_memory_cache: bool = False) -> None:
+    """重置进程内状态，使每次调用都从相同的条件开始"""
+    if not keep_memory_cache:
+        video_info_cache.clear()
+        video_pages_cache.clear()
+        player_info_cache.clear()
+        wbi_key_cache.invalidate()
+
+
+def invoke(params: Dict[str, Any]) -> bool:
+    """执行一次完整的工具调用，返回是否成功"""
+    runtime = MockRuntime({"sessdata": "benchmark", "bili_jct": "benchmark", "buvid3": "benchmark"})
+    tool = BilibiliSubtitlePluginTool(runtime=runtime, session=MockSession())
+    succeeded = False
+    for message in tool._invoke(params):
+        text = getattr(message.message, "text", None)
+        if text and text.startswith("Successfully"):
+            succeeded = True
+    return succeeded
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """延迟统计（毫秒）"""
+    ordered = sorted(samples)
+    return {
+        "min_ms": ordered[0] * 1000,
+        "p50_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def bench_latency(stand_in: BilibiliStandIn, params: Dict[str, Any], scenario: str, iterations: int) -> Dict[str, Any]:
+    """测量单次调用延迟和每次调用的请求数
+
+    场景：
+        cold: 每次调用前清空进程内缓存，不使用持久化缓存
+        memory: 进程内缓存已预热
+        disk: 每次调用前清空进程内缓存，持久化缓存已预热
+    """
+    os.environ["BILIBILI_SUBTITLE_CACHE"] = "1" if scenario == "disk" else "0"
+    reset_state()
+    if scenario != "cold":
+        invoke(params)
+
+    samples = []
+    failures = 0
+    stand_in.reset_counts()
+    stand_in.reset_connections()
+    for _ in range(iterations):
+        reset_state(keep_memory_cache=scenario == "memory")
+        started = time.perf_counter()
+        if not invoke(params):
+            failures += 1
+        samples.append(time.perf_counter() - started)
+    counts = stand_in.reset_counts()
+    connections = stand_in.reset_connections()
+
+    return {
+        "scenario": scenario,
+        "iterations": iterations,
+        "failures": failures,
+        **summarize(samples),
+        "requests_per_invocation": sum(counts.values()) / iterations,
+        "connections_per_invocation": connections / iterations,
+        "requests_by_endpoint": {name: count / iterations for name, count in sorted(counts.items())},
+    }
+
+
+def bench_throughput(stand_in: BilibiliStandIn, params: Dict[str, Any], concurrency: int, total: int) -> Dict[str, Any]:
+    """测量并发调用的吞吐量（冷启动，请求合并可能让并发调用共享上游请求）"""
+    os.environ["BILIBILI_SUBTITLE_CACHE"] = "0"
+    reset_state()
+    stand_in.reset_counts()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: invoke(params), range(total)))
+    elapsed = time.perf_counter() - started
+    counts = stand_in.reset_counts()
+    return {
+        "concurrency": concurrency,
+        "invocations": total,
+        "failures": results.count(False),
+        "elapsed_s": elapsed,
+        "invocations_per_s": total / elapsed,
+        "requests_per_invocation": sum(counts.values()) / total,
+    }
+
+
+def bench_memory(params: Dict[str, Any]) -> Dict[str, Any]:
+    """测量一次冷启动调用的Python内存峰值"""
+    os.environ["BILIBILI_SUBTITLE_CACHE"] = "0"
+    reset_state()
+    tracemalloc.start()
+    try:
+        succeeded = invoke(params)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"succeeded": succeeded, "peak_mb": peak / 1024 / 1024, "retained_mb": current / 1024 / 1024}
+
+
+def bench_index(fixtures: Dict[str, Any], videos: int, iterations: int) -> Dict[str, Any]:
+    """测量全文索引的写入耗时和查询延迟
+
+    每个视频使用录制字幕的条目，文本按视频打乱，索引规模为videos个视频
+    """
+    rng = random.Random(7)
+    body = fixtures["subtitle"]["body"]
+    subtitle = fixtures["player"]["data"]["subtitle"]["subtitles"][0]
+    index = TranscriptIndex(os.path.join(os.environ["BILIBILI_SUBTITLE_CACHE_DIR"], "benchmark_index.sqlite3"))
+    try:
+        started = time.perf_counter()
+        for number in range(videos):
+            contents = [cue["content"] for cue in body]
+            rng.shuffle(contents)
+            cues = [{**cue, "content": content} for cue, content in zip(body, contents)]
+            index.add_track(f"BV{number:010d}", number, subtitle, cues, f"视频{number}", 1, "")
+        build_s = time.perf_counter() - started
+
+        queries = []
+        for query in INDEX_QUERIES:
+            samples = []
+            hits = 0
+            for _ in range(iterations):
+                started = time.perf_counter()
+                hits = len(index.search(query, limit=20, context=2))
+                samples.append(time.perf_counter() - started)
+            queries.append({"query": query, "hits": hits, **summarize(samples)})
+        return {"videos": videos, "cues": index.stats()["cues"], "build_s": build_s, "queries": queries}
+    finally:
+        index.close()
+
+
+def legacy_bvid2aid(bvid: str) -> int:
+    """每次调用重建编码表的原BV号转AV号实现，作为比对和耗时基准"""
+    XOR_CODE = 23442827791579
+    MASK_CODE = 2251799813685247
+    BASE = 58
+
+    data = [
+        b"F", b"c", b"w", b"A", b"P", b"N", b"K", b"T", b"M", b"u", b"g", b"3", b"G", b"V", b"5", b"L",
+        b"j", b"7", b"E", b"J", b"n", b"H", b"p", b"W", b"s", b"x", b"4", b"t", b"b", b"8", b"h", b"a",
+        b"Y", b"e", b"v", b"i", b"q", b"B", b"z", b"6", b"r", b"k", b"C", b"y", b"1", b"2", b"m", b"U",
+        b"S", b"D", b"Q", b"X", b"9", b"R", b"d", b"o", b"Z", b"f"
+    ]
+
+    bvid = list(bvid)
+    bvid[3], bvid[9] = bvid[9], bvid[3]
+    bvid[4], bvid[7] = bvid[7], bvid[4]
+    bvid = bvid[3:]
+    tmp = 0
+    for i in bvid:
+        idx = data.index(i.encode())
+        tmp = tmp * BASE + idx
+    return (tmp & MASK_CODE) ^ XOR_CODE
+
+
+def legacy_aid2bvid(aid: int) -> str:
+    """每次调用重建编码表的原AV号转BV号实现，作为比对和耗时基准"""
+    XOR_CODE = 23442827791579
+    MAX_AID = 1 << 51
+    BASE = 58
+    BV_LEN = 12
+
+    data = [
+        b"F", b"c", b"w", b"A", b"P", b"N", b"K", b"T", b"M", b"u", b"g", b"3", b"G", b"V", b"5", b"L",
+        b"j", b"7", b"E", b"J", b"n", b"H", b"p", b"W", b"s", b"x", b"4", b"t", b"b", b"8", b"h", b"a",
+        b"Y", b"e", b"v", b"i", b"q", b"B", b"z", b"6", b"r", b"k", b"C", b"y", b"1", b"2", b"m", b"U",
+        b"S", b"D", b"Q", b"X", b"9", b"R", b"d", b"o", b"Z", b"f"
+    ]
+
+    bytes_list = [b"B", b"V", b"1", b"0", b"0", b"0", b"0", b"0", b"0", b"0", b"0", b"0"]
+    bv_idx = BV_LEN - 1
+    tmp = (MAX_AID | aid) ^ XOR_CODE
+    while int(tmp) != 0:
+        bytes_list[bv_idx] = data[int(tmp % BASE)]
+        tmp //= BASE
+        bv_idx -= 1
+    bytes_list[3], bytes_list[9] = bytes_list[9], bytes_list[3]
+    bytes_list[4], bytes_list[7] = bytes_list[7], bytes_list[4]
+    return "".join([i.decode() for i in bytes_list])
+
+
+def bench_id_conversion(count: int) -> Dict[str, Any]:
+    """测量BV号/AV号批量互转的耗时，并验证与原实现一致、互转后还原
+
+    AV号在有效范围内随机生成，另外包含范围两端的值
+    """
+    rng = random.Random(11)
+    aids = [1, 2, BV_MAX_AID - 1] + [rng.randrange(1, BV_MAX_AID) for _ in range(max(0, count - 3))]
+    aids = aids[:count]
+
+    started = time.perf_counter()
+    legacy_bvids = [legacy_aid2bvid(aid) for aid in aids]
+    legacy_encode_s = time.perf_counter() - started
+    started = time.perf_counter()
+    bvids = aids_to_bvids(aids)
+    encode_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    legacy_aids = [legacy_bvid2aid(bvid) for bvid in legacy_bvids]
+    legacy_decode_s = time.perf_counter() - started
+    started = time.perf_counter()
+    decoded = bvids_to_aids(bvids)
+    decode_s = time.perf_counter() - started
+
+    mismatches = sum(
+        1 for aid, bvid, legacy_bvid, back, legacy_back in zip(aids, bvids, legacy_bvids, decoded, legacy_aids)
+        if bvid != legacy_bvid or back != aid or legacy_back != aid or bvid2aid(legacy_bvid) != aid
+    )
+    return {
+        "count": len(aids),
+        "encode_ms": encode_s * 1000,
+        "legacy_encode_ms": legacy_encode_s * 1000,
+        "decode_ms": decode_s * 1000,
+        "legacy_decode_ms": legacy_decode_s * 1000,
+        "mismatches": mismatches,
+    }
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """与基线比较，返回性能退化的描述"""
+    regressions = []
+    if baseline.get("config") != result["config"]:
+        print("\n注意: 基线的测试配置与本次不同，比较结果仅供参考")
+    baseline_latency = {item["scenario"]: item for item in baseline.get("latency", [])}
+    for item in result["latency"]:
+        old = baseline_latency.get(item["scenario"])
+        if not old:
+            continue
+        if item["requests_per_invocation"] > old["requests_per_invocation"]:
+            regressions.append(
+                f"{item['scenario']}: 每次调用请求数 {old['requests_per_invocation']:.2f} -> {item['requests_per_invocation']:.2f}"
+            )
+        if item.get("connections_per_invocation", 0) > old.get("connections_per_invocation", 0):
+            regressions.append(
+                f"{item['scenario']}: 每次调用新建连接数 {old.get('connections_per_invocation', 0):.2f} -> "
+                f"{item['connections_per_invocation']:.2f}"
+            )
+        if item["p50_ms"] > old["p50_ms"] * (1 + tolerance):
+            regressions.append(f"{item['scenario']}: p50延迟 {old['p50_ms']:.1f}ms -> {item['p50_ms']:.1f}ms")
+
+    old_throughput = baseline.get("throughput", {}).get("invocations_per_s")
+    if old_throughput and result["throughput"]["invocations_per_s"] < old_throughput * (1 - tolerance):
+        regressions.append(f"吞吐量 {old_throughput:.1f}/s -> {result['throughput']['invocations_per_s']:.1f}/s")
+
+    old_peak = baseline.get("memory", {}).get("peak_mb")
+    if old_peak and result["memory"]["peak_mb"] > old_peak * (1 + tolerance):
+        regressions.append(f"内存峰值 {old_peak:.2f}MB -> {result['memory']['peak_mb']:.2f}MB")
+    return regressions
+
+
+def print_report(result: Dict[str, Any]) -> None:
+    config = result["config"]
+    print("===== B站字幕插件性能基准测试 =====\n")
+    print(f"分P数: {config['pages']}  字幕条数: {config['cues']}  分P选择: {config['page_selection'] or '第1P'}  "
+          f"输出格式: {config['output_format']}  模拟延迟: {config['latency'] * 1000:.0f}ms  "
+          f"模拟握手: {config.get('connect_latency', 0) * 1000:.0f}ms\n")
+
+    print(f"{'场景':<8}{'p50(ms)':>10}{'p95(ms)':>10}{'max(ms)':>10}{'请求数/次':>12}{'新建连接/次':>12}  按接口")
+    for item in result["latency"]:
+        endpoints = ", ".join(f"{name}={count:g}" for name, count in item["requests_by_endpoint"].items()) or "-"
+        print(f"{item['scenario']:<8}{item['p50_ms']:>10.1f}{item['p95_ms']:>10.1f}{item['max_ms']:>10.1f}"
+              f"{item['requests_per_invocation']:>12.2f}{item.get('connections_per_invocation', 0):>12.2f}  {endpoints}")
+        if item["failures"]:
+            print(f"  警告: {item['failures']}次调用失败")
+
+    throughput = result["throughput"]
+    print(f"\n并发吞吐量: {throughput['invocations_per_s']:.1f} 次/秒 "
+          f"(并发 {throughput['concurrency']}, 共 {throughput['invocations']} 次, "
+          f"请求数/次 {throughput['requests_per_invocation']:.2f}, 失败 {throughput['failures']})")
+
+    memory = result["memory"]
+    print(f"内存峰值: {memory['peak_mb']:.2f}MB (调用结束后保留 {memory['retained_mb']:.2f}MB)")
+
+    index = result.get("index")
+    if index:
+        print(f"\n全文索引: {index['videos']}个视频 {index['cues']}条字幕，写入 {index['build_s']:.2f}s")
+        for item in index["queries"]:
+            print(f"  查询 {item['query']:<8} p50 {item['p50_ms']:.2f}ms  p95 {item['p95_ms']:.2f}ms  结果 {item['hits']}条")
+
+    conversion = result.get("id_conversion")
+    if conversion:
+        print(f"\n视频ID互转: {conversion['count']}个")
+        print(f"  AV号转BV号 {conversion['encode_ms']:.1f}ms (原实现 {conversion['legacy_encode_ms']:.1f}ms)")
+        print(f"  BV号转AV号 {conversion['decode_ms']:.1f}ms (原实现 {conversion['legacy_decode_ms']:.1f}ms)")
+        if conversion["mismatches"]:
+            print(f"  错误: {conversion['mismatches']}个ID的转换结果与原实现不一致或无法还原")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="B站字幕插件离线性能基准测试")
+    parser.add_argument("--fixtures", help="录制的接口数据目录")
+    parser.add_argument("--pages", type=int, default=1, help="视频分P数")
+    parser.add_argument("--cues", type=int, default=1000, help="每个分P的字幕条数")
+    parser.add_argument("--page-selection", default="", help="工具的pages参数，如all或1-3")
+    parser.add_argument("--output-format", default="plain", help="工具的output_format参数")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟的接口延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机波动（秒）")
+    parser.add_argument("--connect-latency", type=float, default=0.03, help="模拟的新建连接（TCP+TLS握手）耗时（秒）")
+    parser.add_argument("--iterations", type=int, default=20, help="每个场景的调用次数")
+    parser.add_argument("--concurrency", type=int, default=8, help="吞吐量测试的并发数")
+    parser.add_argument("--throughput-invocations", type=int, default=64, help="吞吐量测试的总调用次数")
+    parser.add_argument("--rate-limit", action="store_true", help="保留默认的客户端限流（默认关闭以测量代码路径本身）")
+    parser.add_argument("--index-videos", type=int, default=0, help="全文索引测试的视频数，0表示不测试")
+    parser.add_argument("--id-conversions", type=int, default=0, help="视频ID互转测试的ID数，0表示不测试")
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    parser.add_argument("--baseline", help="与之前--json输出的结果比较")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="与基线比较时允许的相对波动")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures, args.pages, args.cues)
+    stand_in = BilibiliStandIn(fixtures, args.latency, args.jitter, args.connect_latency)
+    configure_http_client(transport=stand_in)
+    if not args.rate_limit:
+        rate_limiters.configure(rate=UNLIMITED_RATE, burst=UNLIMITED_RATE, max_rate=UNLIMITED_RATE)
+
+    params = {"video_id": TEST_BVID, "pages": args.page_selection, "output_format": args.output_format}
+    try:
+        result = {
+            "config": {
+                "pages": args.pages,
+                "cues": args.cues,
+                "page_selection": args.page_selection,
+                "output_format": args.output_format,
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "connect_latency": args.connect_latency,
+            },
+            "latency": [bench_latency(stand_in, params, scenario, args.iterations) for scenario in ("cold", "memory", "disk")],
+            "throughput": bench_throughput(stand_in, params, args.concurrency, args.throughput_invocations),
+            "memory": bench_memory(params),
+        }
+        if args.index_videos > 0:
+            result["index"] = bench_index(fixtures, args.index_videos, args.iterations)
+        if args.id_conversions > 0:
+            result["id_conversion"] = bench_id_conversion(args.id_conversions)
+    finally:
+        close_http_client()
+
+    print_report(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        if regressions:
+            print("\n发现性能退化:")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("\n与基线相比未发现性能退化")
+    if result.get("id_conversion", {}).get("mismatches"):
+        return 1
+    return 0
+
+
+# 程序入口
+if __name__ == "__main__":
+    sys.exit(main())